@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Per-chart summary index of Scores/, queried without parsing any chart.
+# Usage: python CatalogueIndex.py --update                      (re-summarises only the charts that changed)
+#        python CatalogueIndex.py --where "music_difficulty = master" "play_level > 30" \
+#                                 --any "bpm_changes > 5" "max_window_notes > 150" --order-by play_level --descending
+#        python CatalogueIndex.py --aggregate avg base_score --group-by play_level
+# --where conditions all hold, and at least one --any condition when given.
+
+import argparse
+import os
+import sys
+import time
+
+from util_index import AGGREGATE_FUNCTIONS, INDEX_COLUMNS, CatalogueIndex
+from util_metadata import MetadataProvider, get_score_kwargs_list
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Build and query a per-chart summary index of Scores/')
+    parser.add_argument('--index', default='catalogue.sqlite', help='index file')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--update', action='store_true', help='summarise the new and changed charts and drop the removed ones first')
+    parser.add_argument('--where', nargs='+', default=[], metavar='CONDITION', help='"<column> <op> <value>" conditions that all hold')
+    parser.add_argument('--any', nargs='+', default=[], metavar='CONDITION', help='conditions of which at least one holds')
+    parser.add_argument('--columns', nargs='+', default=['music_id', 'music_difficulty', 'play_level'], help='columns to print')
+    parser.add_argument('--order-by', default=None, metavar='COLUMN', help='sort by this column')
+    parser.add_argument('--descending', action='store_true', help='sort from the largest --order-by value')
+    parser.add_argument('--limit', type=int, default=None, help='print at most this many charts')
+    parser.add_argument('--aggregate', nargs=2, default=None, metavar=('FUNCTION', 'COLUMN'),
+                        help=f'print FUNCTION ({", ".join(AGGREGATE_FUNCTIONS)}) of COLUMN (or *) over the matching charts instead')
+    parser.add_argument('--group-by', default=None, metavar='COLUMN', help='one --aggregate value per value of this column')
+    parser.add_argument('--list-columns', action='store_true', help='print the columns of the index')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='index every .sus file in --folders, play levels and note counts are then 0')
+    args = parser.parse_args()
+
+    if args.list_columns:
+        for column, column_type in INDEX_COLUMNS.items():
+            print(f'{column} {column_type}')
+        sys.exit(0)
+
+    with CatalogueIndex(args.index) as index:
+        if args.update:
+            metadata_provider = None
+            if not args.no_metadata:
+                metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+            start_time = time.perf_counter()
+            counts, errors = index.update(get_score_kwargs_list(args.folders, metadata_provider), num_workers=args.workers)
+            for key, error in errors:
+                print(f'Error: Score {key} Is Skipped!')
+                print(error)
+            print(f'Indexed {len(index)} Charts In {time.perf_counter() - start_time:.3f}s: ' + \
+                  ', '.join(f'{name} {count}' for name, count in counts.items()))
+
+        try:
+            if args.aggregate is not None:
+                function, column = args.aggregate
+                result = index.aggregate(function, column, args.where, args.any, args.group_by)
+                if args.group_by is None:
+                    print(result)
+                else:
+                    for group, value in result.items():
+                        print(f'{group}\t{value}')
+            elif args.where or args.any or not args.update:
+                rows = index.select(args.where, args.any, args.columns, args.order_by, args.descending, args.limit)
+                print('\t'.join(args.columns))
+                for row in rows:
+                    print('\t'.join(str(row[column]) for column in args.columns))
+                print(f'{len(rows)} Charts')
+        except ValueError as e:
+            parser.error(str(e))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Charts that changed between two snapshots of the game, e.g. the Scores/ folders of two versions.
+# Usage: python ChartDiff.py OLD NEW [--verbose] [--json FILENAME]
+# OLD and NEW are both Scores/ style folders, or both files written by util_binary.BinaryScoreWriter.
+# Exits with 1 when any chart was added, removed or changed, as diff does.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from util_diff import diff_binary_files, diff_folders
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='List the charts that changed between two snapshots')
+    parser.add_argument('old', help='older Scores/ folder or binary score file')
+    parser.add_argument('new', help='newer Scores/ folder or binary score file')
+    parser.add_argument('--verbose', action='store_true', help='print every changed note, BPM change and skill note move')
+    parser.add_argument('--json', metavar='FILENAME', default=None, help='also write the full differences to this file')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if os.path.isdir(args.old) and os.path.isdir(args.new):
+        added, removed, results = diff_folders(args.old, args.new, num_workers=args.workers)
+    elif os.path.isfile(args.old) and os.path.isfile(args.new):
+        from util_binary import BinaryScores
+        added, removed, results = diff_binary_files(BinaryScores(args.old), BinaryScores(args.new))
+    else:
+        parser.error('OLD and NEW must both be folders or both be binary score files')
+
+    for key in added:
+        print(f'Added: {key}')
+    for key in removed:
+        print(f'Removed: {key}')
+    for key, score_diff, error in results:
+        if score_diff is None:
+            print(f'Error: Score {key} Is Skipped!')
+            print(error)
+            continue
+        print(f'Changed: {key} {score_diff.get_summary()}')
+        if args.verbose:
+            diff_json = score_diff.to_json()
+            for name in ['added_notes', 'removed_notes', 'changed_notes', 'added_bpm_events', 'removed_bpm_events',
+                         'changed_bpm_events', 'skill_note_moves', 'prepare_note_moves']:
+                for item in diff_json[name]:
+                    print(f'    {name}: {item}')
+
+    if args.json is not None:
+        with open(args.json + '.tmp', 'w') as f:
+            json.dump({
+                'added': [list(key) for key in added],
+                'removed': [list(key) for key in removed],
+                'changed': [score_diff.to_json() for _, score_diff, _ in results if score_diff is not None],
+                'errors': [{'music_id': key[0], 'music_difficulty': key[1], 'error': error} for key, score_diff, error in results if score_diff is None]
+            }, f, indent=2)
+        os.replace(args.json + '.tmp', args.json)
+
+    print(f'{len(added)} Added, {len(removed)} Removed, {len(results)} Changed In {time.perf_counter() - start_time:.3f}s')
+    sys.exit(1 if added or removed or results else 0)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Difficulty features of every chart as one CSV table, see util_features.FEATURE_COLUMNS.
+# Usage: python FeatureTable.py [--binary scores.bin] [--output features.csv]
+# With --binary the features come straight from a file written by WeightCalculator.py --binary, without parsing.
+
+import argparse
+import csv
+import os
+import time
+
+from util_batch import iter_scores
+from util_features import FEATURE_COLUMNS, get_binary_feature_table, get_feature_table, get_score_columns, iter_feature_rows
+from util_metadata import MetadataProvider, get_score_kwargs_list
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Write the difficulty features of every chart to a CSV file')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--binary', metavar='FILENAME', default=None, help='read the charts from this binary score file instead')
+    parser.add_argument('--output', default='features.csv', help='CSV file to write')
+    parser.add_argument('--cache-dir', default='.score_cache', help='directory of cached Scores, keyed by .sus content hash')
+    parser.add_argument('--no-cache', action='store_true', help='parse every chart and leave the cache untouched')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='read every .sus file in --folders, play levels are then 0')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.binary is not None:
+        from util_binary import BinaryScores
+        features = get_binary_feature_table(BinaryScores(args.binary))
+    else:
+        # Same kwargs as WeightCalculator, so both share the entries of the Score cache
+        metadata_provider = None
+        if not args.no_metadata:
+            metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+        score_kwargs_list = get_score_kwargs_list(args.folders, metadata_provider)
+        charts = []
+        for result in iter_scores(score_kwargs_list, num_workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir):
+            key = (result.kwargs['music_id'], result.kwargs['music_difficulty'])
+            if result.score is None:
+                print(f'Error: Score {key} Is Skipped!')
+                print(result.error)
+                continue
+            charts.append((key, get_score_columns(result.score)))
+        features = get_feature_table(charts)
+
+    rows = list(iter_feature_rows(features))
+    with open(args.output + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FEATURE_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(args.output + '.tmp', args.output)
+    print(f'Wrote Features Of {len(rows)} Charts To {args.output} In {time.perf_counter() - start_time:.3f}s')
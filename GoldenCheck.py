@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Golden comparison of every chart in Scores/ against a recorded run.
+#   python GoldenCheck.py --record   before a parser change, records golden_scores.ndjson
+#   python GoldenCheck.py            after it, exits 1 if any chart's output changed
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+from util_batch import iter_scores
+from util_output import iter_ndjson_records
+
+
+def get_golden_record(result):
+
+    # Scores are compared exactly, so Fractions are kept as strings
+    record = {'music_id': result.kwargs['music_id'], 'music_difficulty': result.kwargs['music_difficulty']}
+    if result.score is None:
+        record['error'] = result.error.split(' (in ')[0]
+        return record
+    record['score'] = result.score.to_json()
+    record['solo_base_score'] = str(result.score.get_solo_base_scores())
+    record['solo_skill_scores_coverages'] = [str(coverage) for coverage in result.score.get_solo_skill_scores_coverages()]
+    return record
+
+
+def find_difference(golden, record):
+
+    for key in ['error', 'solo_base_score', 'solo_skill_scores_coverages']:
+        if golden.get(key) != record.get(key):
+            return key
+    for key, value in golden.get('score', {}).items():
+        if value != record['score'][key]:
+            if isinstance(value, list):
+                for i, (golden_item, item) in enumerate(zip(value, record['score'][key])):
+                    if golden_item != item:
+                        return f'{key}[{i}]: {golden_item} != {item}'
+                return f'{key}: {len(value)} != {len(record["score"][key])} items'
+            return key
+    return None
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare every chart in Scores/ with a recorded golden run')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--golden', default='golden_scores.ndjson', help='golden file to record or compare with')
+    parser.add_argument('--record', action='store_true', help='record the golden file instead of comparing')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    args = parser.parse_args()
+
+    score_kwargs_list = []
+    for filename in sorted(glob.glob(os.path.join(args.folders, '*', '*.sus'))):
+        score_kwargs_list.append({
+            'filename': filename,
+            'music_id': int(os.path.basename(os.path.dirname(filename))),
+            'music_difficulty': os.path.splitext(os.path.basename(filename))[0],
+            # Any level above 5 exercises the play level multiplier
+            'play_level': 30,
+            'note_count': 0
+        })
+    records = (get_golden_record(result) for result in iter_scores(score_kwargs_list, num_workers=args.workers))
+
+    if args.record:
+        with open(args.golden, 'w') as f:
+            count = 0
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+                count += 1
+        print(f'Recorded {count} Charts to {args.golden}')
+        sys.exit(0)
+
+    goldens = {(golden['music_id'], golden['music_difficulty']): golden for golden in iter_ndjson_records(args.golden)}
+    changed, missing = 0, 0
+    for record in records:
+        key = (record['music_id'], record['music_difficulty'])
+        if key not in goldens:
+            print(f'New Chart {key} Has No Golden Record')
+            missing += 1
+            continue
+        difference = find_difference(goldens.pop(key), json.loads(json.dumps(record)))
+        if difference is not None:
+            print(f'Chart {key} Changed: {difference}')
+            changed += 1
+    for key in goldens:
+        print(f'Golden Chart {key} Is Missing From {args.folders}')
+    missing += len(goldens)
+
+    print(f'Changed: {changed}, Missing: {missing}')
+    sys.exit(1 if changed or missing else 0)
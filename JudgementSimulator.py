@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Distribution of the score of every chart in Scores/ when notes are not all PERFECT: each trial judges
+# every note at random with the given rates, and the percentiles of the base score and of the skill coverages are printed.
+# Usage: python JudgementSimulator.py --rates 0.9 0.07 0.015 0.005 0.01 [--trials 20000] [--seed 0] [--score-ups 100 80 120 100 90 100]
+# The rates are PERFECT, GREAT, GOOD, BAD and MISS, in any scale.
+
+import argparse
+import json
+import os
+import time
+
+from util_metadata import MetadataProvider, get_score_kwargs_list
+from util_simulation import DEFAULT_PERCENTILES, DEFAULT_RATES, JUDGEMENTS, iter_simulations
+
+
+def format_stats(stats):
+
+    return ' '.join(f'{name} {value:.5f}' for name, value in stats.items())
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Simulate random judgements over every chart and print score percentiles')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--rates', type=float, nargs=len(JUDGEMENTS), default=DEFAULT_RATES, help='rate of ' + ', '.join(JUDGEMENTS))
+    parser.add_argument('--trials', type=int, default=10000, help='number of simulated plays per chart')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random judgements, the same seed gives the same results')
+    parser.add_argument('--skill-times', type=float, nargs='+', default=[5, 5, 5, 5, 5, 5], help='duration of the skill on every skill note in seconds')
+    parser.add_argument('--score-ups', type=int, nargs='+', default=None, help='score up of the skill on every skill note in percent, to also simulate the skill bonus')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=DEFAULT_PERCENTILES, help='percentiles to report')
+    parser.add_argument('--batch-size', type=int, default=1024, help='trials judged at once, bounds the memory of the random matrices')
+    parser.add_argument('--json', action='store_true', help='print one JSON object per chart instead')
+    parser.add_argument('--cache-dir', default='.score_cache', help='directory of cached Scores, keyed by .sus content hash')
+    parser.add_argument('--no-cache', action='store_true', help='parse every chart and leave the cache untouched')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='simulate every .sus file in --folders, play levels are then 0')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    args = parser.parse_args()
+
+    if min(args.rates) < 0 or sum(args.rates) <= 0:
+        parser.error('--rates must not be negative and must not all be 0')
+    if args.trials <= 0 or args.batch_size <= 0:
+        parser.error('--trials and --batch-size must be positive')
+
+    # Play levels from the metadata, so the scores compare with get_solo_base_scores and WeightCalculator's
+    metadata_provider = None
+    if not args.no_metadata:
+        metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+    score_kwargs_list = get_score_kwargs_list(args.folders, metadata_provider)
+
+    simulated = 0
+    start_time = time.perf_counter()
+    for result in iter_simulations(score_kwargs_list, args.rates, trials=args.trials, seed=args.seed, skill_times=args.skill_times,
+                                   score_ups=args.score_ups, percentiles=args.percentiles, batch_size=args.batch_size,
+                                   num_workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir):
+        key = (result.kwargs['music_id'], result.kwargs['music_difficulty'])
+        if result.summary is None:
+            print(f'Error: Score {key} Is Skipped!')
+            print(result.error)
+            continue
+        simulated += 1
+
+        if args.json:
+            print(json.dumps({'music_id': key[0], 'music_difficulty': key[1], 'trials': result.trials, **result.summary}))
+            continue
+        print(f'{key}:')
+        print(f'    base score   {format_stats(result.summary["base_score"])}')
+        for slot, stats in enumerate(result.summary['coverages']):
+            print(f'    coverage {slot}   {format_stats(stats)}')
+        if result.summary['skill_bonus'] is not None:
+            print(f'    skill bonus  {format_stats(result.summary["skill_bonus"])}')
+
+    print(f'Simulated {simulated} Charts x {args.trials} Trials In {time.perf_counter() - start_time:.3f}s')
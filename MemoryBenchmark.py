@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Memory used by the whole catalogue of Scores, with note objects and with NoteColumns.
+# Usage: python MemoryBenchmark.py [--limit N]
+
+import argparse
+import gc
+import glob
+import os
+import time
+import tracemalloc
+
+from util_object import Score
+
+
+def load_catalogue(filenames, compact):
+
+    scores = []
+    for filename in filenames:
+        music_id = int(os.path.basename(os.path.dirname(filename)))
+        music_difficulty = os.path.splitext(os.path.basename(filename))[0]
+        try:
+            score = Score(filename=filename, music_id=music_id, music_difficulty=music_difficulty, play_level=0, note_count=0, lazy=False)
+        except Exception as e:
+            print(f'Skipped {filename}: {type(e).__name__}')
+            continue
+        scores.append(score.compact() if compact else score)
+    return scores
+
+
+def measure(filenames, compact):
+
+    gc.collect()
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    scores = load_catalogue(filenames, compact)
+    elapsed = time.perf_counter() - start_time
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    note_count = sum(len(score.playable_notes) for score in scores)
+    del scores
+    return current, peak, elapsed, note_count
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Measure the memory held by every parsed chart in Scores/')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--limit', type=int, default=None, help='only load the first N charts')
+    args = parser.parse_args()
+
+    filenames = sorted(glob.glob(os.path.join(args.folders, '*', '*.sus')))[:args.limit]
+    print(f'Charts: {len(filenames)}')
+
+    results = {}
+    for label, compact in [('objects', False), ('columns', True)]:
+        current, peak, elapsed, note_count = measure(filenames, compact)
+        results[label] = current
+        print(f'{label:>8}: retained {current / 2**20:8.1f} MB, peak {peak / 2**20:8.1f} MB, ' + \
+              f'{current / max(1, note_count):6.1f} B/playable note, load {elapsed:.1f}s')
+
+    print(f'Columns retain {results["columns"] / max(1, results["objects"]):.1%} of the object layout')
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Time of every Score pipeline stage on a fixed corpus, with a regression check against earlier runs.
+# The corpus is the synthetic charts of util_synthetic plus whatever is in Scores/.
+# Usage: python PipelineBenchmark.py [--repeat N] [--threshold 1.25] [--no-record]
+# Exits 1 if a stage got slower (or the peak memory grew) past the threshold since the last passing run on the same corpus.
+
+import argparse
+import datetime
+import gc
+import glob
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from util_object import Score
+from util_synthetic import write_synthetic_corpus
+
+# Stages of Score.STAGES, then what WeightCalculator runs on a built Score
+SCORE_METHODS = ['get_solo_base_scores', 'get_solo_skill_scores_coverages', 'to_json']
+STAGES = Score.STAGES + SCORE_METHODS
+# Stages faster than this over the whole corpus are too noisy to compare
+MIN_COMPARED_SECONDS = 0.005
+
+
+def get_score(filename):
+
+    music_id = int(os.path.basename(os.path.dirname(filename)))
+    music_difficulty = os.path.splitext(os.path.basename(filename))[0]
+    return Score(filename=filename, music_id=music_id, music_difficulty=music_difficulty, play_level=30, note_count=0)
+
+
+def time_stages(filename, repeat):
+
+    # stage -> best time over repeat runs, every run on a fresh Score
+    stage_times = {stage: float('inf') for stage in STAGES}
+    for _ in range(repeat):
+        score = get_score(filename)
+        for stage in STAGES:
+            start_time = time.perf_counter()
+            getattr(score, stage)()
+            stage_times[stage] = min(stage_times[stage], time.perf_counter() - start_time)
+    return stage_times
+
+
+def measure_peak_memory(filename):
+
+    gc.collect()
+    tracemalloc.start()
+    score = get_score(filename)
+    for stage in STAGES:
+        getattr(score, stage)()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def get_corpus_hash(filenames):
+
+    # Runs are only compared on the same charts
+    corpus_hash = hashlib.sha256()
+    for filename in filenames:
+        with open(filename, 'rb') as f:
+            corpus_hash.update(hashlib.sha256(f.read()).digest())
+    return corpus_hash.hexdigest()
+
+
+def find_regressions(baseline, result, threshold):
+
+    regressions = []
+    for stage in STAGES + ['total']:
+        before, after = baseline['stages'].get(stage), result['stages'][stage]
+        if before is not None and max(before, after) >= MIN_COMPARED_SECONDS and after > before * threshold:
+            regressions.append(f'{stage}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({after / before:.2f}x)')
+    before, after = baseline['peak_memory'], result['peak_memory']
+    if after > before * threshold:
+        regressions.append(f'peak memory: {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB ({after / before:.2f}x)')
+    return regressions
+
+
+def run_benchmark(chart_names, repeat):
+
+    # chart_names: filename -> name the chart is reported and recorded under
+    stages = {stage: 0 for stage in STAGES}
+    charts = {}
+    for filename, name in chart_names.items():
+        try:
+            stage_times = time_stages(filename, repeat)
+            peak = measure_peak_memory(filename)
+        except Exception as e:
+            print(f'Skipped {name}: {type(e).__name__}')
+            continue
+        for stage in STAGES:
+            stages[stage] += stage_times[stage]
+        charts[name] = {'total': sum(stage_times.values()), 'peak_memory': peak}
+        print(f'{name}: {charts[name]["total"] * 1000:8.1f} ms, peak {peak / 2**20:6.1f} MB')
+    stages['total'] = sum(stages.values())
+    return {
+        'stages': stages,
+        'peak_memory': max([chart['peak_memory'] for chart in charts.values()], default=0),
+        'charts': charts
+    }
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Time every Score pipeline stage and compare with earlier runs')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus, added to the synthetic charts')
+    parser.add_argument('--no-synthetic', action='store_true', help='leave the synthetic charts out of the corpus')
+    parser.add_argument('--repeat', type=int, default=5, help='best of this many runs per stage')
+    parser.add_argument('--history', default='benchmark_history.json', help='JSON file every run is appended to')
+    parser.add_argument('--threshold', type=float, default=1.25, help='fail if a stage takes longer than this times the last passing run')
+    parser.add_argument('--no-record', action='store_true', help='compare with the history without appending this run')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as synthetic_folders:
+        chart_names = {filename: filename for filename in sorted(glob.glob(os.path.join(args.folders, '*', '*.sus')))}
+        if not args.no_synthetic:
+            # Written to a temporary directory, so reported by their path inside it
+            for filename in write_synthetic_corpus(synthetic_folders):
+                chart_names[filename] = os.path.join('synthetic', os.path.relpath(filename, synthetic_folders))
+        if not chart_names:
+            print('No Charts To Benchmark')
+            sys.exit(1)
+
+        corpus_hash = get_corpus_hash(chart_names)
+        print(f'Charts: {len(chart_names)}, Corpus: {corpus_hash[:12]}')
+        result = run_benchmark(chart_names, args.repeat)
+
+    for stage in STAGES + ['total']:
+        print(f'{stage:>32}: {result["stages"][stage] * 1000:9.1f} ms')
+    print(f'{"peak memory":>32}: {result["peak_memory"] / 2**20:9.1f} MB')
+
+    result.update({
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'corpus': corpus_hash,
+        'repeat': args.repeat
+    })
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history, 'r') as f:
+            history = json.load(f)
+    # A run that regressed is recorded but never becomes the baseline, so the regression keeps failing
+    baselines = [entry for entry in history if entry['corpus'] == corpus_hash and not entry['regressions']]
+
+    regressions = []
+    if baselines:
+        regressions = find_regressions(baselines[-1], result, args.threshold)
+        print(f'Compared With The Run Of {baselines[-1]["time"]}: {len(regressions)} Regressions')
+        for regression in regressions:
+            print(f'Regression: {regression}')
+    else:
+        print('No Earlier Run On This Corpus To Compare With')
+
+    if not args.no_record:
+        result['regressions'] = regressions
+        history.append(result)
+        temp_path = f'{args.history}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(history, f, indent=4)
+        os.replace(temp_path, args.history)
+
+    sys.exit(1 if regressions else 0)
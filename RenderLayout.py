@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Writes Scores/<music_id>/<difficulty>.layout.json next to every .sus: the chart already split into
+# fixed-height tiles of measures, with note sprites, hold paths, BPM markers and combo labels placed,
+# so the image renderer can draw every tile on its own instead of analysing the .sus again.
+# Usage: python RenderLayout.py [--pixels-per-beat N] [--force]
+
+import argparse
+import json
+import os
+import time
+
+from util_batch import iter_scores
+from util_metadata import MetadataProvider, get_score_kwargs_list
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Write a render-ready tile layout of every chart')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--pixels-per-beat', type=float, default=None, help='vertical scale, by default from the most frequent BPM as sus.js does')
+    parser.add_argument('--force', action='store_true', help='also rewrite layouts that are newer than their .sus file')
+    parser.add_argument('--cache-dir', default='.score_cache', help='directory of cached Scores, keyed by .sus content hash')
+    parser.add_argument('--no-cache', action='store_true', help='parse every chart and leave the cache untouched')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='lay out every .sus file in --folders, play levels are then 0')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    args = parser.parse_args()
+
+    # Same kwargs as WeightCalculator, so both share the entries of the Score cache
+    metadata_provider = None
+    if not args.no_metadata:
+        metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+    score_kwargs_list = []
+    for score_kwargs in get_score_kwargs_list(args.folders, metadata_provider):
+        filename = score_kwargs['filename']
+        layout_filename = os.path.splitext(filename)[0] + '.layout.json'
+        if not args.force and os.path.exists(filename) and os.path.exists(layout_filename) and \
+                os.path.getmtime(layout_filename) >= os.path.getmtime(filename):
+            continue
+        score_kwargs_list.append(score_kwargs)
+
+    written = 0
+    start_time = time.perf_counter()
+    for result in iter_scores(score_kwargs_list, num_workers=args.workers, cache_dir=None if args.no_cache else args.cache_dir):
+        key = (result.kwargs['music_id'], result.kwargs['music_difficulty'])
+        if result.score is None:
+            print(f'Error: Score {key} Is Skipped!')
+            print(result.error)
+            continue
+
+        layout_filename = os.path.splitext(result.kwargs['filename'])[0] + '.layout.json'
+        with open(layout_filename + '.tmp', 'w') as f:
+            json.dump(result.score.get_render_layout(args.pixels_per_beat), f, separators=(',', ':'))
+        os.replace(layout_filename + '.tmp', layout_filename)
+        written += 1
+    print(f'Wrote {written} Layouts In {time.perf_counter() - start_time:.3f}s')
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Long-running chart analysis service, so the site does not start WeightCalculator.py cold for every request.
+# Usage: python ScoreService.py [--port 8000 | --unix-socket PATH] [--max-memory MB]
+#   curl http://127.0.0.1:8000/scores/1/master
+#   curl 'http://127.0.0.1:8000/scores/1/master/coverages?skill_times=5,5,5,5,5,5&mode=solo'
+#   curl http://127.0.0.1:8000/stats
+
+import argparse
+
+from util_metadata import MetadataProvider
+from util_service import ScoreStore, make_server
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve Score analysis of the charts in Scores/ over HTTP')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8000, help='port to listen on')
+    parser.add_argument('--unix-socket', metavar='PATH', default=None, help='listen on this Unix socket instead of a TCP port')
+    parser.add_argument('--max-memory', metavar='MB', type=float, default=512, help='approximate memory cap of the parsed charts')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on start')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='skip the metadata, play levels and note counts are then 0')
+    args = parser.parse_args()
+
+    metadata_provider = None
+    if not args.no_metadata:
+        # Loaded once, here, rather than on the first request
+        metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+        print(f'Loaded Metadata Of {len(metadata_provider.music_difficulties_by_key)} Charts')
+
+    store = ScoreStore(args.folders, int(args.max_memory * 2**20), metadata_provider)
+    server = make_server(store, args.host, args.port, args.unix_socket)
+    print(f'Serving {args.folders} On ' + (args.unix_socket if args.unix_socket is not None else f'http://{args.host}:{server.server_address[1]}'))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
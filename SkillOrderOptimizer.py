@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Best order of a team's skills over the skill notes of every chart in Scores/.
+# Usage: python SkillOrderOptimizer.py --skill-times 5 5 5 5 5 --score-ups 100 80 120 100 90 [--leader 0] [--top N] [--check]
+# A skill is a (duration, score up) pair, the i-th --skill-times goes with the i-th --score-ups.
+
+import argparse
+import os
+import sys
+import time
+
+from itertools import permutations
+
+from util_metadata import MetadataProvider, get_score_kwargs_list
+from util_object import Score
+from util_scoring import SCORING_MODES
+from util_skill_order import iter_skill_orders, rank_skill_orders_brute_force
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Rank the orders of skills over the skill notes of every chart')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--skill-times', type=float, nargs='+', default=[5, 5, 5, 5, 5], help='duration of every skill in seconds')
+    parser.add_argument('--score-ups', type=int, nargs='+', default=[100, 100, 100, 100, 100], help='score up of every skill in percent')
+    parser.add_argument('--leader', type=int, default=None, help='index of the skill that also takes the skill note after the others, as the leader does')
+    parser.add_argument('--mode', choices=sorted(SCORING_MODES), default='solo', help='live mode the skills are scored in')
+    parser.add_argument('--top', type=int, default=3, help='number of best orders to print per chart')
+    parser.add_argument('--check', action='store_true', help='compare every ranking with one get_solo_skill_scores_coverages call per order (solo only)')
+    parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musicDifficulties.json from here instead of the network')
+    parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+    parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+    parser.add_argument('--no-metadata', action='store_true', help='rank every .sus file in --folders, play levels are then 0')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+    args = parser.parse_args()
+
+    if len(args.skill_times) != len(args.score_ups):
+        parser.error('--skill-times and --score-ups need the same number of values')
+    if args.check and args.mode != 'solo':
+        parser.error('--check compares with the solo reference, so needs --mode solo')
+
+    # Every order of the skills by default, with the leader's skill appended when it has one
+    candidates = None
+    if args.leader is not None:
+        candidates = [order + (args.leader,) for order in permutations(range(len(args.skill_times)))]
+
+    # Play levels from the metadata, so the values match WeightCalculator's scores
+    metadata_provider = None
+    if not args.no_metadata:
+        metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+    score_kwargs_list = get_score_kwargs_list(args.folders, metadata_provider)
+
+    mismatches = 0
+    start_time = time.perf_counter()
+    for result in iter_skill_orders(score_kwargs_list, args.skill_times, args.score_ups, candidates=candidates,
+                                    top=args.top, mode=args.mode, num_workers=args.workers):
+        key = (result.kwargs['music_id'], result.kwargs['music_difficulty'])
+        if result.assignments is None:
+            print(f'Error: Score {key} Is Skipped!')
+            print(result.error)
+            continue
+
+        print(f'{key}:')
+        for assignment in result.assignments:
+            print(f'    {float(assignment.value):9.5f} order {assignment.order}, skill times {assignment.skill_times}')
+
+        if args.check:
+            score = Score(**result.kwargs)
+            brute_force = rank_skill_orders_brute_force(score, args.skill_times, args.score_ups, candidates, args.top)
+            if [(a.order, a.value) for a in brute_force] != [(a.order, a.value) for a in result.assignments]:
+                print(f'Mismatch: Score {key} Is Ranked Differently By The Brute Force')
+                mismatches += 1
+
+    print(f'Ranked {len(score_kwargs_list)} Charts In {time.perf_counter() - start_time:.3f}s' + \
+          (f', Mismatches: {mismatches}' if args.check else ''))
+    sys.exit(1 if mismatches else 0)
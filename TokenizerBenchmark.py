@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Parse time of util_tokenizer against the line by line regex parser, on the largest charts.
+# Usage: python TokenizerBenchmark.py [--count N] [--repeat N]
+
+import argparse
+import glob
+import os
+import timeit
+
+from util_object import Score
+from util_tokenizer import read_sus, tokenize_sus
+
+
+def get_parse_result(score):
+
+    raw_notes = [(raw_note.measure, raw_note.note_class, raw_note.start_pos, raw_note.note_property,
+                  raw_note.width, raw_note.scaling, raw_note.note_order, raw_note.long_note_id) for raw_note in score.raw_notes]
+    # Unsorted, in file order, as parse_lines leaves them
+    bpm_events = [(event.measure, event.scaling, event.event_order, event.bpm_key) for event in score._bpm_events]
+    return raw_notes, bpm_events, score.bpm_lookup_table
+
+
+def time_parser(score, parse, repeat):
+
+    def run():
+        score.reset_stages()
+        parse()
+
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Compare the .sus tokenizer with the reference parser')
+    parser.add_argument('--folders', default='Scores', help='directory holding <music_id>/<difficulty>.sus')
+    parser.add_argument('--count', type=int, default=10, help='number of largest charts to parse')
+    parser.add_argument('--repeat', type=int, default=5, help='best of this many runs per chart')
+    args = parser.parse_args()
+
+    filenames = sorted(glob.glob(os.path.join(args.folders, '*', '*.sus')), key=os.path.getsize, reverse=True)[:args.count]
+
+    total_reference, total_tokenizer = 0, 0
+    for filename in filenames:
+        music_id = int(os.path.basename(os.path.dirname(filename)))
+        music_difficulty = os.path.splitext(os.path.basename(filename))[0]
+        score = Score(filename=filename, music_id=music_id, music_difficulty=music_difficulty, play_level=0, note_count=0)
+
+        reference_time = time_parser(score, score.parse_lines_reference, args.repeat)
+        reference_result = get_parse_result(score)
+        tokenizer_time = time_parser(score, score.parse_lines, args.repeat)
+        assert get_parse_result(score) == reference_result, f'{filename}: tokenizer output differs from the reference parser'
+        # Without building RawNote and BPMChangeEvent objects
+        tuples_time = min(timeit.repeat(lambda: tokenize_sus(read_sus(filename)), number=1, repeat=args.repeat))
+
+        total_reference += reference_time
+        total_tokenizer += tokenizer_time
+        print(f'{filename}: {os.path.getsize(filename) / 1024:7.1f} KB, {len(score.raw_notes):5d} raw notes, ' + \
+              f'reference {reference_time * 1000:7.2f} ms, tokenizer {tokenizer_time * 1000:7.2f} ms ' + \
+              f'({tuples_time * 1000:6.2f} ms as tuples), ' + \
+              f'{reference_time / tokenizer_time:4.1f}x')
+
+    print(f'Total: reference {total_reference * 1000:.1f} ms, tokenizer {total_tokenizer * 1000:.1f} ms, ' + \
+          f'{total_reference / max(total_tokenizer, 1e-9):.1f}x')
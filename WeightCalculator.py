@@ -4,17 +4,43 @@
 # In[1]:
 
 
+import argparse
 import glob
-import json
 import os
-import requests
+import time
 
-from util_object import Score
+from util_batch import iter_scores
+from util_cache import ScoreCache
+from util_ingest import IngestStats, iter_ingested_scores
+from util_metadata import MetadataProvider
+from util_output import NDJSONWriter, PrettyJSONWriter
+from util_profile import PrometheusTextSink
 
 
 # In[2]:
 
 
+parser = argparse.ArgumentParser(description='Calculate weights from .sus files')
+parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(), help='number of worker processes, 1 to run in-process')
+parser.add_argument('--chunksize', type=int, default=1, help='charts handed to a worker at a time (without prefetching)')
+parser.add_argument('--prefetch-threads', type=int, default=8, help='threads reading .sus files ahead of the workers, 0 to let every worker read its own')
+parser.add_argument('--prefetch-queue', type=int, default=64, help='most charts read ahead of the parsing')
+parser.add_argument('--cache-dir', default='.score_cache', help='directory of cached Scores, keyed by .sus content hash')
+parser.add_argument('--no-cache', action='store_true', help='parse every chart and leave the cache untouched')
+parser.add_argument('--format', choices=['ndjson', 'json'], default='ndjson',
+                    help='ndjson: one compact record per chart in scores.ndjson plus a byte offset index, json: the indented scores.json list')
+parser.add_argument('--binary', metavar='FILENAME', default=None, help='also write a memory-mappable columnar file (needs numpy)')
+parser.add_argument('--metadata-snapshot', metavar='DIRECTORY', default=None, help='read musics.json and musicDifficulties.json from here instead of the network')
+parser.add_argument('--metadata-cache', metavar='DIRECTORY', default='.metadata_cache', help='local copy of the metadata, revalidated on every run')
+parser.add_argument('--offline', action='store_true', help='use the snapshot or the cached metadata without any network request')
+parser.add_argument('-v', '--verbose', action='store_true', help='print the time spent on every chart')
+parser.add_argument('--slowest', metavar='N', type=int, default=0, help='print the N slowest charts with a per-stage breakdown')
+parser.add_argument('--metrics', metavar='FILENAME', default=None, help='write per-stage totals in Prometheus text format')
+args, _ = parser.parse_known_args()
+cache_dir = None if args.no_cache else args.cache_dir
+# Stages are only timed when something reads the timings
+profile = args.slowest > 0 or args.metrics is not None
+
 folders = r'Scores'
 filenames = glob.glob(os.path.join(folders, '*', '*'))
 
@@ -22,51 +48,125 @@ filenames = glob.glob(os.path.join(folders, '*', '*'))
 # In[3]:
 
 
-music_difficulties_metadatas = requests.get('https://raw.githubusercontent.com/Sekai-World/sekai-master-db-diff/master/musicDifficulties.json')
-music_difficulties_metadatas = json.loads(music_difficulties_metadatas.text)
+# Worker processes may re-import this file (spawn start method), so only the main process does the work
+if __name__ == '__main__':
 
-musics_metadatas = requests.get('https://raw.githubusercontent.com/Sekai-World/sekai-master-db-diff/master/musics.json')
-musics_metadatas = json.loads(musics_metadatas.text)
+    metadata_provider = MetadataProvider(snapshot_dir=args.metadata_snapshot, cache_dir=args.metadata_cache, offline=args.offline)
+    music_difficulties_metadatas = metadata_provider.music_difficulties
 
-musicid_to_title = {musics_metadata['id']: musics_metadata['title'] for musics_metadata in musics_metadatas}
+    musicid_to_title = {music_id: musics_metadata['title'] for music_id, musics_metadata in metadata_provider.musics_by_id.items()}
 
 
 # In[4]:
 
 
-scores = {}
-score_jsons = []
-for music_difficulties_metadata in music_difficulties_metadatas:
-    
-    music_id = music_difficulties_metadata['musicId']
-    music_difficulty = music_difficulties_metadata['musicDifficulty']
-    play_level = music_difficulties_metadata['playLevel']
-    note_count = music_difficulties_metadata['noteCount']
-    
-    filename = os.path.join(folders, f'{music_id:04d}', f'{music_difficulty}.sus')
-
-    score = Score(filename=filename, music_id=music_id, music_difficulty=music_difficulty, play_level=play_level, note_count=note_count)
-    if note_count != len(score.playable_notes):
-        print(f'Warning: Note Count of Score ({music_id, music_difficulty}) Is Inconsistent!')
-        print(f'Counted: {len(score.playable_notes)}, Should Be: {note_count}')
-        
-    if len(score.skill_notes) != 6:
-        print(f'Warning: SKill Note Count of Score ({music_id, music_difficulty}) Is Not 6!')
-        print(f'Counted: {len(score.skill_notes)}')
-    
-    if len(score.prepare_notes) != 2:
-        print(f'Warning: SKill Note Count of Score ({music_id, music_difficulty}) Is Not 2!')
-        print(f'Counted: {len(score.prepare_notes)}')
-        
-    scores[(music_id, music_difficulty)] = score
-    score_jsons.append(score.to_json())
-
-
-# In[8]:
-
-
-with open('scores.json', 'w+') as f:
-    json.dump(score_jsons, f, indent=4)
+if __name__ == '__main__':
+
+    score_kwargs_list = []
+    for music_difficulties_metadata in music_difficulties_metadatas:
+
+        music_id = music_difficulties_metadata['musicId']
+        music_difficulty = music_difficulties_metadata['musicDifficulty']
+        play_level = music_difficulties_metadata['playLevel']
+        note_count = music_difficulties_metadata['noteCount']
+
+        filename = os.path.join(folders, f'{music_id:04d}', f'{music_difficulty}.sus')
+        score_kwargs_list.append({
+            'filename': filename,
+            'music_id': music_id,
+            'music_difficulty': music_difficulty,
+            'play_level': play_level,
+            'note_count': note_count,
+            'profile': profile
+        })
+
+    if args.format == 'ndjson':
+        score_writer = NDJSONWriter('scores.ndjson', 'scores.ndjson.index.json')
+    else:
+        score_writer = PrettyJSONWriter('scores.json')
+    if args.binary is not None:
+        from util_binary import BinaryScoreWriter
+        binary_writer = BinaryScoreWriter(args.binary)
+    if args.metrics is not None:
+        metrics_sink = PrometheusTextSink(args.metrics)
+
+    # Scores are dropped once written, only their keys are kept for the cache eviction
+    built_keys = set()
+    failures = []
+    chart_times = []
+    # (elapsed, (music_id, music_difficulty), profile), profile is None for cached charts
+    chart_profiles = []
+    cache_hits = 0
+    start_time = time.perf_counter()
+    ingest_stats = IngestStats()
+    if args.prefetch_threads > 0:
+        results = iter_ingested_scores(score_kwargs_list, num_workers=args.workers, num_threads=args.prefetch_threads,
+                                       queue_size=args.prefetch_queue, cache_dir=cache_dir, stats=ingest_stats)
+    else:
+        results = iter_scores(score_kwargs_list, num_workers=args.workers, chunksize=args.chunksize, cache_dir=cache_dir)
+    for result in results:
+
+        music_id = result.kwargs['music_id']
+        music_difficulty = result.kwargs['music_difficulty']
+        note_count = result.kwargs['note_count']
+        chart_times.append(result.elapsed)
+        cache_hits += result.cached
+        if args.verbose:
+            print(f'{result.elapsed:8.3f}s {music_id, music_difficulty}' + (' (cached)' if result.cached else ''))
+
+        score = result.score
+        if score is None:
+            print(f'Error: Score ({music_id, music_difficulty}) Is Skipped!')
+            print(result.error)
+            failures.append((music_id, music_difficulty))
+            continue
+
+        if note_count != len(score.playable_notes):
+            print(f'Warning: Note Count of Score ({music_id, music_difficulty}) Is Inconsistent!')
+            print(f'Counted: {len(score.playable_notes)}, Should Be: {note_count}')
+
+        if len(score.skill_notes) != 6:
+            print(f'Warning: SKill Note Count of Score ({music_id, music_difficulty}) Is Not 6!')
+            print(f'Counted: {len(score.skill_notes)}')
+
+        if len(score.prepare_notes) != 2:
+            print(f'Warning: SKill Note Count of Score ({music_id, music_difficulty}) Is Not 2!')
+            print(f'Counted: {len(score.prepare_notes)}')
+
+        built_keys.add((music_id, music_difficulty))
+        if profile:
+            chart_profiles.append((result.elapsed, (music_id, music_difficulty), score.profile))
+            if args.metrics is not None and score.profile is not None:
+                metrics_sink.observe(score.profile)
+        score_writer.write(score.to_json())
+        if args.binary is not None:
+            binary_writer.write(score)
+    score_writer.close()
+    if args.binary is not None:
+        binary_writer.close()
+    if args.metrics is not None:
+        metrics_sink.write()
+    wall_time = time.perf_counter() - start_time
+
+    if cache_dir is not None:
+        # Keep only the entries of charts that were just built or loaded
+        evicted = ScoreCache(cache_dir).evict(built_keys)
+        print(f'Cache Hits: {cache_hits}, Evicted: {evicted}')
+
+    chart_time = sum(chart_times)
+    print(f'Built {len(built_keys)} Scores, Skipped {len(failures)}, Workers: {args.workers}')
+    print(f'Wall Time: {wall_time:.3f}s, Chart Time: {chart_time:.3f}s ' + \
+          f'(mean {chart_time / max(1, len(chart_times)):.3f}s, max {max(chart_times, default=0):.3f}s), ' + \
+          f'Speedup: {chart_time / wall_time if wall_time else 0:.2f}x')
+    if args.prefetch_threads > 0:
+        print(f'I/O: {ingest_stats.files} Files, {ingest_stats.read_bytes / 2**20:.1f} MB Read In {ingest_stats.read_seconds:.3f}s ' + \
+              f'On {args.prefetch_threads} Threads, Waited {ingest_stats.io_wait_seconds:.3f}s ({ingest_stats.io_wait_seconds / wall_time if wall_time else 0:.1%} of Wall Time); ' + \
+              f'CPU: {ingest_stats.cpu_seconds:.3f}s')
+
+    if args.slowest > 0:
+        print(f'Slowest {args.slowest} Charts:')
+        for elapsed, key, score_profile in sorted(chart_profiles, key=lambda x: x[0], reverse=True)[:args.slowest]:
+            print(f'{elapsed:8.3f}s {key}: ' + ('cached' if score_profile is None else score_profile.get_breakdown()))
 
 
 # In[ ]:
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to the scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from util_object import Score
+from util_synthetic import SYNTHETIC_MUSIC_ID, get_synthetic_chart
+
+# name -> get_synthetic_chart arguments, small enough for the Fraction reference paths
+TEST_CHARTS = {
+    'typical': (120, 8, 3, 0),
+    'dense': (60, 48, 8, 1),
+    'bpm_changes': (80, 12, 200, 2),
+    'single_bpm': (40, 16, 0, 3)
+}
+
+
+@pytest.fixture(params=sorted(TEST_CHARTS))
+def chart_content(request):
+
+    return request.param, get_synthetic_chart(*TEST_CHARTS[request.param])
+
+
+@pytest.fixture
+def make_score(chart_content):
+
+    # A new Score of the same chart on every call, play level above 5 for the play level multiplier
+    name, content = chart_content
+
+    def make(play_level=30):
+        return Score(filename=f'{name}.sus', music_id=SYNTHETIC_MUSIC_ID, music_difficulty=name,
+                     play_level=play_level, note_count=0, content=content)
+
+    return make
@@ -0,0 +1,67 @@
+import random
+
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from util_diff import diff_scores, get_score_view, merge_join
+
+
+def merge_join_reference(old_items, new_items, match_length):
+
+    # Groups both sides by prefix, cancels equal items as multisets, then pairs the rest in sorted order
+    old_groups, new_groups = {}, {}
+    for groups, items in [(old_groups, old_items), (new_groups, new_items)]:
+        for item in items:
+            groups.setdefault(item[:match_length], []).append(item)
+
+    added, removed, changed = [], [], []
+    for key in sorted(old_groups.keys() | new_groups.keys()):
+        old_counter, new_counter = Counter(old_groups.get(key, [])), Counter(new_groups.get(key, []))
+        old_left, new_left = sorted((old_counter - new_counter).elements()), sorted((new_counter - old_counter).elements())
+        changed.extend(zip(old_left, new_left))
+        removed.extend(old_left[len(new_left):])
+        added.extend(new_left[len(old_left):])
+    return added, removed, changed
+
+
+def get_random_items(rng, count):
+
+    return sorted((Fraction(rng.randrange(8), 4), rng.randrange(2, 5), rng.randrange(5, 7), rng.choice('ABC')) for _ in range(count))
+
+
+def test_removal_inside_a_run_is_not_a_change():
+
+    a, b = (Fraction(1), 2, 3, 'A'), (Fraction(1), 2, 3, 'B')
+    assert merge_join([a, b], [b], 3) == ([], [a], [])
+    assert merge_join([b], [a, b], 3) == ([a], [], [])
+    assert merge_join([a, a, b], [a, b, b], 3) == ([], [], [(a, b)])
+
+
+def test_class_change_inside_a_run():
+
+    a, b, c = (Fraction(1), 2, 3, 'A'), (Fraction(1), 2, 3, 'B'), (Fraction(1), 2, 3, 'C')
+    assert merge_join([a, b], [a, c], 3) == ([], [], [(b, c)])
+    assert merge_join([a, b], [c], 3) == ([], [b], [(a, c)])
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_merge_join_matches_reference(seed):
+
+    rng = random.Random(seed)
+    old_items, new_items = get_random_items(rng, rng.randrange(30)), get_random_items(rng, rng.randrange(30))
+    assert merge_join(old_items, new_items, 3) == merge_join_reference(old_items, new_items, 3)
+    assert merge_join(old_items, old_items, 3) == ([], [], [])
+
+
+def test_diff_scores(make_score):
+
+    old_score, new_score = make_score(), make_score()
+    assert not diff_scores(old_score, new_score)
+
+    # Dropping one note of a run of notes on the same tick and lanes is a removal only
+    new_view = get_score_view(new_score)
+    removed_note = new_view['notes'].pop(len(new_view['notes']) // 2)
+    added, removed, changed = merge_join(get_score_view(old_score)['notes'], new_view['notes'], 3)
+    assert (added, removed, changed) == ([], [removed_note], [])
@@ -0,0 +1,55 @@
+import random
+
+from collections import namedtuple
+
+import pytest
+
+from util_hold import HoldIndex
+
+# Enough of a Hold for HoldIndex
+IntervalHold = namedtuple('IntervalHold', ['start_time_tick', 'end_time_tick', 'timebase'])
+IntervalTimebase = namedtuple('IntervalTimebase', ['time_ticks_per_second'])
+
+
+def get_overlapping_reference(holds, start_time_tick, end_time_tick):
+
+    return sorted((hold for hold in holds if hold.start_time_tick < end_time_tick and hold.end_time_tick > start_time_tick),
+                  key=lambda x: (x.start_time_tick, x.end_time_tick))
+
+
+def get_random_holds(rng, count):
+
+    # Short and long intervals on few distinct ticks, so they nest, repeat and share ends
+    holds = []
+    for _ in range(count):
+        start_time_tick = rng.randrange(100)
+        holds.append(IntervalHold(start_time_tick, start_time_tick + rng.choice([1, 2, 5, 20, 80]), IntervalTimebase(10)))
+    return holds
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_hold_index_matches_linear_scan(seed):
+
+    rng = random.Random(seed)
+    holds = get_random_holds(rng, rng.randrange(60))
+    index = HoldIndex(holds)
+    for time_tick in range(-2, 190):
+        assert index.count_active(time_tick) == len(get_overlapping_reference(holds, time_tick, time_tick + 1))
+        assert index.get_active(time_tick) == get_overlapping_reference(holds, time_tick, time_tick + 1)
+    for _ in range(100):
+        start_time_tick = rng.randrange(-10, 190)
+        end_time_tick = start_time_tick + rng.randrange(30)
+        assert index.get_overlapping(start_time_tick, end_time_tick) == get_overlapping_reference(holds, start_time_tick, end_time_tick)
+
+
+def test_hold_index_of_chart_matches_linear_scan(make_score):
+
+    score = make_score()
+    index = score.get_hold_index()
+    assert len(index) == len(score.holds)
+    for skill_note in score.skill_notes:
+        window_end = skill_note.time_tick + 5 * score.timebase.time_ticks_per_second
+        assert index.get_skill_window_holds(skill_note) == get_overlapping_reference(score.holds, skill_note.time_tick, window_end)
+    for note in score.playable_notes[::7]:
+        assert index.count_active(note.time_tick) == len(index.get_active(note.time_tick)) == \
+               len(get_overlapping_reference(score.holds, note.time_tick, note.time_tick + 1))
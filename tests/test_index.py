@@ -0,0 +1,96 @@
+from collections import Counter
+
+import pytest
+
+from conftest import TEST_CHARTS
+from util_index import AGGREGATE_FUNCTIONS, NOTE_CLASS_COLUMNS, SUMMARY_SKILL_TIME, CatalogueIndex
+from util_object import Score
+from util_synthetic import SYNTHETIC_MUSIC_ID, get_synthetic_chart
+
+CONDITIONS = [[], ['play_level >= 28'], ['playable_note_count < 1500', 'bpm_changes > 0'], [('music_difficulty', '!=', 'dense')]]
+
+
+@pytest.fixture(scope='module')
+def catalogue(tmp_path_factory):
+
+    # Every test chart under two music ids at different play levels, and the Scores it was built from
+    folders = tmp_path_factory.mktemp('index')
+    score_kwargs_list, scores = [], {}
+    for music_id in [SYNTHETIC_MUSIC_ID, SYNTHETIC_MUSIC_ID + 1]:
+        for play_level, name in enumerate(sorted(TEST_CHARTS), start=music_id - SYNTHETIC_MUSIC_ID + 26):
+            filename = folders / f'{music_id}_{name}.sus'
+            filename.write_text(get_synthetic_chart(*TEST_CHARTS[name]))
+            score_kwargs = {'filename': str(filename), 'music_id': music_id, 'music_difficulty': name, 'play_level': play_level, 'note_count': 0}
+            score_kwargs_list.append(score_kwargs)
+            scores[(music_id, name)] = Score(**score_kwargs)
+
+    index = CatalogueIndex(str(folders / 'index.sqlite'))
+    counts, errors = index.update(score_kwargs_list, num_workers=1, num_threads=2)
+    assert counts['updated'] == len(score_kwargs_list) and not errors
+    yield index, scores
+    index.close()
+
+
+def matches(row, condition):
+
+    column, op, value = condition if isinstance(condition, tuple) else condition.split()
+    value = type(row[column])(value)
+    return {'<': row[column] < value, '<=': row[column] <= value, '>': row[column] > value, '>=': row[column] >= value,
+            '=': row[column] == value, '!=': row[column] != value}[op]
+
+
+def test_summary_matches_score(catalogue):
+
+    index, scores = catalogue
+    for row in index.select():
+        score = scores[(row['music_id'], row['music_difficulty'])]
+        assert row['play_level'] == score.play_level
+        assert row['playable_note_count'] == len(score.playable_notes)
+        assert row['skill_note_count'] == len(score.skill_notes)
+        note_class_counts = Counter(note.note_class_code for note in score.playable_notes)
+        assert [row[column] for column in NOTE_CLASS_COLUMNS] == [note_class_counts[code] for code in range(len(NOTE_CLASS_COLUMNS))]
+        assert row['base_score'] == pytest.approx(float(score.get_solo_base_scores()))
+
+        seconds = Counter(note.time_tick // score.timebase.time_ticks_per_second for note in score.playable_notes)
+        assert row['nps_max'] == max(seconds.values())
+        window_notes = []
+        for slot, skill_note in enumerate(sorted(score.skill_notes, key=lambda x: x.time_tick)):
+            window_end = skill_note.time_tick + SUMMARY_SKILL_TIME * score.timebase.time_ticks_per_second
+            window_notes.append(sum(skill_note.time_tick <= note.time_tick < window_end for note in score.playable_notes))
+            assert row[f'window_notes_{slot + 1}'] == window_notes[-1]
+        assert row['max_window_notes'] == max(window_notes)
+
+
+@pytest.mark.parametrize('where', CONDITIONS)
+def test_select_matches_python_filter(catalogue, where):
+
+    index, _ = catalogue
+    rows = index.select()
+    expected = [row for row in rows if all(matches(row, condition) for condition in where)]
+    assert index.select(where) == expected
+    assert index.select(where, order_by='base_score', descending=True, limit=3) == \
+           sorted(expected, key=lambda x: x['base_score'], reverse=True)[:3]
+    any_of = ['play_level = 26', 'music_difficulty = typical']
+    assert index.select(where, any_of) == [row for row in expected if any(matches(row, condition) for condition in any_of)]
+
+
+@pytest.mark.parametrize('where', CONDITIONS)
+@pytest.mark.parametrize('function', AGGREGATE_FUNCTIONS)
+def test_aggregate_matches_python(catalogue, where, function):
+
+    index, _ = catalogue
+    rows = [row for row in index.select() if all(matches(row, condition) for condition in where)]
+
+    def aggregate(values):
+        if function == 'count':
+            return len(values)
+        if not values:
+            return None
+        return {'sum': sum, 'avg': lambda x: sum(x) / len(x), 'min': min, 'max': max}[function](values)
+
+    assert index.aggregate(function, 'base_score', where) == pytest.approx(aggregate([row['base_score'] for row in rows]))
+    groups = {}
+    for row in rows:
+        groups.setdefault(row['music_difficulty'], []).append(row['playable_note_count'])
+    assert index.aggregate(function, 'playable_note_count', where, group_by='music_difficulty') == \
+           pytest.approx({group: aggregate(values) for group, values in sorted(groups.items())})
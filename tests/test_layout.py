@@ -0,0 +1,28 @@
+from util_object import FLICK_DIRECTIONS
+
+
+def test_flick_directions_survive_compact(make_score):
+
+    score = make_score()
+    directions = [note.flick_direction for note in score.playable_notes]
+    assert any(direction in ['left', 'right'] for direction in directions)
+    for note, direction in zip(score.playable_notes, directions):
+        assert (direction is not None) == note.is_flick
+    assert [note.flick_direction for note in make_score().compact().playable_notes] == directions
+
+
+def test_flick_direction_matches_raw_note_on_the_same_range(make_score):
+
+    score = make_score()
+    raw_directions = {}
+    for raw_note in score.raw_notes:
+        if raw_note.note_description in FLICK_DIRECTIONS:
+            raw_directions[(raw_note.tick, raw_note.start_pos, raw_note.width)] = FLICK_DIRECTIONS[raw_note.note_description]
+    for note in score.playable_notes:
+        if (note.tick, note.start_pos, note.width) in raw_directions:
+            assert note.flick_direction == raw_directions[(note.tick, note.start_pos, note.width)]
+
+
+def test_layout_of_compacted_score_is_the_same(make_score):
+
+    assert make_score().compact().get_render_layout() == make_score().get_render_layout()
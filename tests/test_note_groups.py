@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from util_object import Score
+from util_synthetic import SYNTHETIC_CHARTS, get_pairs, get_synthetic_chart
+
+
+def get_overlapping_chart(seed):
+
+    # Taps of random widths on a few shared ticks, so ranges nest, overlap partially and repeat
+    rng = random.Random(seed)
+    lines = ['#00002: 4', '#BPM01: 120', '#00008: 01']
+    for measure in range(1, 40):
+        for _ in range(6):
+            start_pos = rng.randrange(2, 14)
+            width = rng.randint(1, 14 - start_pos)
+            lines.append(f'#{measure:03d}1{start_pos:x}:' + get_pairs(4, {i: f'{rng.choice("123")}{width:x}' for i in rng.sample(range(4), 2)}))
+            if rng.random() < 0.3:
+                lines.append(f'#{measure:03d}5{start_pos:x}:' + get_pairs(4, {rng.randrange(4): f'{rng.choice("134")}{width:x}'}))
+    rng.shuffle(lines)
+    return '\n'.join(lines) + '\n'
+
+
+def iter_note_groups_reference(raw_notes):
+
+    # The pairwise coverage check the sweep in Score.iter_note_groups replaced: a range belongs to the
+    # first kept range (left start first, right end first) that contains it, or is kept itself
+    raw_notes = sorted(raw_notes, key=lambda x: (x.tick, x.start_pos))
+    tick_to_positions = {}
+    for raw_note in raw_notes:
+        tick_to_positions.setdefault(raw_note.tick, set()).add((raw_note.start_pos, raw_note.width))
+
+    covered_by = {}
+    for tick, positions in tick_to_positions.items():
+        valid_positions = []
+        for start_pos, width in sorted(positions, key=lambda x: (x[0], -(x[0]+x[1]))):
+            for valid_start_pos, valid_width in valid_positions:
+                if start_pos >= valid_start_pos and start_pos + width <= valid_start_pos + valid_width:
+                    covered_by[(tick, start_pos, width)] = (tick, valid_start_pos, valid_width)
+                    break
+            else:
+                valid_positions.append((start_pos, width))
+                covered_by[(tick, start_pos, width)] = (tick, start_pos, width)
+
+    groups = {}
+    for raw_note in raw_notes:
+        groups.setdefault(covered_by[(raw_note.tick, raw_note.start_pos, raw_note.width)], []).append(raw_note)
+    return list(groups.items())
+
+
+@pytest.fixture(params=['typical', 'overlapping_0', 'overlapping_1'])
+def grouped_score(request):
+
+    if request.param in SYNTHETIC_CHARTS:
+        content = get_synthetic_chart(*SYNTHETIC_CHARTS[request.param])
+    else:
+        content = get_overlapping_chart(int(request.param.split('_')[1]))
+    return lambda: Score(filename=f'{request.param}.sus', music_id=0, music_difficulty=request.param, play_level=30, note_count=0, content=content)
+
+
+def test_note_groups_match_pairwise_reference(grouped_score):
+
+    score = grouped_score()
+    reference = iter_note_groups_reference(score.raw_notes)
+    groups = list(score.iter_note_groups())
+    assert [(position, [id(note) for note in notes]) for position, notes in groups] == \
+           [(position, [id(note) for note in notes]) for position, notes in reference]
+    # Some ranges must actually have been merged into a wider one
+    assert any(len({(note.start_pos, note.width) for note in notes}) > 1 for _, notes in groups)
+
+
+def test_converted_notes_match_pairwise_reference(grouped_score):
+
+    score = grouped_score()
+    reference = grouped_score()
+    reference.run_stages('parse_lines')
+    reference.iter_note_groups = lambda: iter(iter_note_groups_reference(reference._raw_notes))
+    assert reference.to_json() == score.to_json()
+    assert [hold.to_json() for hold in reference.holds] == [hold.to_json() for hold in score.holds]
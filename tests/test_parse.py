@@ -0,0 +1,34 @@
+def get_parse_result(score):
+
+    raw_notes = [(raw_note.measure, raw_note.note_class, raw_note.start_pos, raw_note.note_property,
+                  raw_note.width, raw_note.scaling, raw_note.note_order, raw_note.long_note_id) for raw_note in score.raw_notes]
+    # Unsorted, in file order, as both parsers leave them
+    bpm_events = [(event.measure, event.scaling, event.event_order, event.bpm_key) for event in score._bpm_events]
+    return raw_notes, bpm_events, score.bpm_lookup_table, score.timebase.ticks_per_measure
+
+
+def test_tokenizer_matches_regex_parser(make_score):
+
+    score = make_score()
+    score.parse_lines()
+    reference = make_score()
+    reference.parse_lines_reference()
+    assert get_parse_result(score) == get_parse_result(reference)
+
+
+def test_scores_match_after_regex_parse(make_score):
+
+    # The rest of the pipeline runs on the reference parser's raw notes as well
+    score = make_score()
+    reference = make_score()
+    reference.parse_lines_reference()
+    assert reference.to_json() == score.to_json()
+    assert reference.get_solo_base_scores() == score.get_solo_base_scores()
+
+
+def test_content_is_dropped_once_parsed(make_score):
+
+    score = make_score()
+    assert score.content is not None
+    score.run_stages('parse_lines')
+    assert score.content is None
@@ -0,0 +1,65 @@
+from fractions import Fraction
+
+import pytest
+
+from util_object import PLAYABLE_NOTE_CLASSES
+from util_scoring import ScoringEngine, ScoringMode
+
+SKILL_TIMES = [(5, 5, 5, 5, 5, 5), (3, 4.5, 6, 7, 8, 9), (Fraction(13, 3),) * 6]
+
+
+def test_columnar_score_matches_object_score(make_score):
+
+    score = make_score()
+    compact = make_score().compact()
+    assert compact.to_json() == score.to_json()
+    assert compact.get_solo_base_scores() == score.get_solo_base_scores()
+    for skill_times in SKILL_TIMES:
+        assert compact.get_solo_skill_scores_coverages(skill_times) == score.get_solo_skill_scores_coverages(skill_times)
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_scoring_engine_matches_reference(make_score, compact):
+
+    score = make_score()
+    engine = ScoringEngine(make_score().compact() if compact else make_score())
+    assert engine.get_base_score('solo') == score.get_solo_base_scores()
+    for skill_times in SKILL_TIMES:
+        # The reference sums into an int 0 for an empty window
+        assert engine.get_skill_coverages('solo', skill_times) == [Fraction(coverage) for coverage in score.get_solo_skill_scores_coverages(skill_times)]
+
+
+def test_score_arrays_match_reference(make_score):
+
+    score = make_score()
+    arrays = score.get_score_arrays()
+    assert arrays.get_solo_base_scores() == pytest.approx(float(score.get_solo_base_scores()), abs=1e-12)
+    for skill_times in SKILL_TIMES:
+        assert arrays.get_reference_error(score, [float(skill_time) for skill_time in skill_times]) < 1e-12
+
+
+def get_reference_mode_score(score, mode):
+
+    # Per-note Fraction sum of a custom mode: its own weights, optional combo bonus, fever in [prepare start, prepare end)
+    notes = sorted(score.playable_notes, key=lambda x: x.time_tick)
+    fever_start = min(note.time_tick for note in score.prepare_notes if note.is_start)
+    fever_end = max(note.time_tick for note in score.prepare_notes if not note.is_start)
+    total = 0
+    for note in notes:
+        value = mode.weights[note.note_class_code]
+        if mode.combo_bonus:
+            value *= Fraction(100 + min(10, (note.combo_number - 1) // 100), 100)
+        if mode.fever_multiplier is not None and fever_start <= note.time_tick < fever_end:
+            value *= mode.fever_multiplier
+        total += value
+    weight_sum = sum(mode.weights[note.note_class_code] for note in notes)
+    return total / weight_sum * Fraction(max(0, score.play_level - 5) + 200, 200)
+
+
+@pytest.mark.parametrize('combo_bonus,fever_multiplier', [(True, None), (False, None), (True, Fraction(3, 2)), (False, Fraction(7, 4))])
+def test_custom_mode_matches_reference(make_score, combo_bonus, fever_multiplier):
+
+    score = make_score()
+    weights = [Fraction(i + 1, 3) for i in range(len(PLAYABLE_NOTE_CLASSES))]
+    mode = ScoringMode('test', weights, combo_bonus=combo_bonus, fever_multiplier=fever_multiplier)
+    assert ScoringEngine(score).get_base_score(mode) == get_reference_mode_score(score, mode)
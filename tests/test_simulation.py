@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from util_scoring import ScoringEngine
+from util_simulation import COMBO_BREAKING, JUDGEMENT_MULTIPLIERS, MISS, PERFECT, JudgementSimulator, iter_simulations, simulate_chart
+from util_synthetic import SYNTHETIC_MUSIC_ID
+
+RATES = [0.6, 0.2, 0.1, 0.05, 0.05]
+
+
+def simulate_reference(simulator, rates, draws):
+
+    # One note at a time, with the combo counted as the game does
+    rates = np.asarray(rates, dtype=np.float64) / np.sum(rates)
+    cumulative_rates = np.cumsum(rates)[:-1]
+    base_scores, coverages = [], []
+    for row in draws:
+        combo = 0
+        note_scores = []
+        for draw, weight, is_tick in zip(row, simulator.weights, simulator.is_tick):
+            if is_tick:
+                judgement = MISS if draw >= 1 - rates[MISS] else PERFECT
+            else:
+                judgement = int(np.sum(cumulative_rates <= draw))
+            combo = 0 if COMBO_BREAKING[judgement] else combo + 1
+            note_scores.append(weight * JUDGEMENT_MULTIPLIERS[judgement] * (100 + min(10, max(0, (combo - 1) // 100))) / 100)
+        base_scores.append(sum(note_scores) * simulator.scale)
+        coverages.append([sum(note_scores[first:last]) * simulator.scale for first, last in zip(simulator.window_firsts, simulator.window_lasts)])
+    return np.array(base_scores), np.array(coverages)
+
+
+@pytest.fixture
+def score_kwargs(chart_content, tmp_path):
+
+    name, content = chart_content
+    filename = tmp_path / f'{name}.sus'
+    filename.write_text(content)
+    return {'filename': str(filename), 'music_id': SYNTHETIC_MUSIC_ID, 'music_difficulty': name, 'play_level': 30, 'note_count': 0}
+
+
+def test_simulation_matches_per_note_reference(make_score):
+
+    simulator = JudgementSimulator(make_score())
+    base_scores, coverages = simulator.simulate(RATES, 20, np.random.default_rng(1))
+    reference_base_scores, reference_coverages = simulate_reference(simulator, RATES, np.random.default_rng(1).random((20, len(simulator.weights))))
+    assert base_scores == pytest.approx(reference_base_scores)
+    assert coverages == pytest.approx(reference_coverages)
+
+
+def test_all_perfect_matches_scoring_engine(make_score):
+
+    score = make_score()
+    engine = ScoringEngine(score)
+    base_scores, coverages = JudgementSimulator(score).simulate([1, 0, 0, 0, 0], 3, np.random.default_rng(0))
+    assert base_scores == pytest.approx([float(engine.get_base_score('solo'))] * 3)
+    assert coverages == pytest.approx(np.array([[float(coverage) for coverage in engine.get_skill_coverages('solo')]] * 3))
+
+
+def test_batch_size_does_not_change_results(make_score):
+
+    simulator = JudgementSimulator(make_score())
+    results = [simulator.simulate(RATES, 50, np.random.default_rng(7), batch_size) for batch_size in [1, 7, 50, 1024]]
+    for base_scores, coverages in results[1:]:
+        assert np.array_equal(base_scores, results[0][0])
+        assert np.array_equal(coverages, results[0][1])
+
+
+def test_seed_reproducibility(score_kwargs, tmp_path):
+
+    first, second, other_seed = [simulate_chart(score_kwargs, RATES, 200, seed=seed) for seed in [3, 3, 4]]
+    assert first.error is None
+    assert first.summary == second.summary
+    assert first.summary != other_seed.summary
+
+    # The plays of a chart do not depend on the charts simulated with it
+    (tmp_path / 'other.sus').write_text(open(score_kwargs['filename']).read())
+    other_kwargs = dict(score_kwargs, filename=str(tmp_path / 'other.sus'), music_id=SYNTHETIC_MUSIC_ID + 1)
+    results = list(iter_simulations([other_kwargs, score_kwargs], RATES, trials=200, seed=3, num_workers=1))
+    assert results[1].summary == first.summary
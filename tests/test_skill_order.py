@@ -0,0 +1,31 @@
+from itertools import permutations
+
+import pytest
+
+from util_skill_order import rank_skill_orders, rank_skill_orders_brute_force
+
+SKILLS = [
+    ([5, 5, 5, 5, 5], [100, 100, 100, 100, 100]),
+    ([5, 6, 7, 8, 9], [100, 80, 120, 100, 90]),
+    ([3, 9, 4.5, 6, 5], [60, 130, 110, 70, 90])
+]
+
+
+@pytest.mark.parametrize('skill_times,score_ups', SKILLS)
+def test_ranking_matches_brute_force(make_score, skill_times, score_ups):
+
+    score = make_score()
+    ranked = rank_skill_orders(score, skill_times, score_ups, top=10)
+    brute_force = rank_skill_orders_brute_force(score, skill_times, score_ups, top=10)
+    assert [(a.order, a.value) for a in ranked] == [(a.order, a.value) for a in brute_force]
+
+
+def test_ranking_with_leader_matches_brute_force(make_score):
+
+    score = make_score()
+    skill_times, score_ups = SKILLS[2]
+    # The leader's skill also takes the sixth skill note
+    candidates = [order + (1,) for order in permutations(range(len(skill_times)))]
+    ranked = rank_skill_orders(score, skill_times, score_ups, candidates, top=5)
+    brute_force = rank_skill_orders_brute_force(score, skill_times, score_ups, candidates, top=5)
+    assert [(a.order, a.value) for a in ranked] == [(a.order, a.value) for a in brute_force]
@@ -0,0 +1,52 @@
+from fractions import Fraction
+
+import pytest
+
+from util_stream import EVENT_KINDS
+
+
+def get_events_reference(score, start_seconds=0):
+
+    # Every event at or after start_seconds, by time and then EVENT_KINDS order, sorted in one go
+    events = []
+    for kind_order, (kind, source) in enumerate(zip(EVENT_KINDS, [score.bpm_events, score.prepare_notes, score.skill_notes, score.playable_notes])):
+        events.extend((event.time_tick, kind_order, kind, event) for event in source)
+    events.sort(key=lambda x: (x[0], x[1]))
+    start_time_tick = Fraction(start_seconds) * score.timebase.time_ticks_per_second
+    return [(time_tick, kind, event) for time_tick, _, kind, event in events if time_tick >= start_time_tick]
+
+
+def get_stream_events(events):
+
+    return [(event.time_tick, event.kind, event.event) for event in events]
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_event_stream_matches_sorted_merge(make_score, compact):
+
+    score = make_score().compact() if compact else make_score()
+    # Notes of a compacted Score are rebuilt on every access, so compare them by value
+    reference = [(time_tick, kind, repr(event)) for time_tick, kind, event in get_events_reference(score)]
+    assert [(time_tick, kind, repr(event)) for time_tick, kind, event in get_stream_events(score.get_event_stream())] == reference
+
+    duration = reference[-1][0] / score.timebase.time_ticks_per_second
+    for start_seconds in [0, Fraction(1, 3), 7.25, duration / 2, duration, duration + 1]:
+        stream = score.get_event_stream(start_seconds)
+        expected = [(time_tick, kind, repr(event)) for time_tick, kind, event in get_events_reference(score, start_seconds)]
+        assert [(time_tick, kind, repr(event)) for time_tick, kind, event in get_stream_events(stream)] == expected
+
+
+def test_poll_and_lookahead_match_sorted_merge(make_score):
+
+    score = make_score()
+    reference = get_events_reference(score)
+    time_ticks_per_second = score.timebase.time_ticks_per_second
+    stream = score.get_event_stream()
+    polled = []
+    for seconds in range(1, int(reference[-1][0] / time_ticks_per_second) + 3):
+        ahead = get_stream_events(stream.lookahead(2))
+        assert ahead == [event for event in reference[len(polled):] if event[0] < (seconds + 1) * time_ticks_per_second]
+        polled.extend(get_stream_events(stream.poll(seconds)))
+        assert polled == [event for event in reference if event[0] < seconds * time_ticks_per_second]
+    assert polled == reference
+    assert stream.peek() is None
@@ -0,0 +1,41 @@
+from bisect import bisect_right
+from fractions import Fraction
+
+
+def get_reference_seconds(bpm_events, offset):
+
+    # Seconds at a Fraction measure offset, walking the BPM segments in Fractions; a measure lasts 240 / bpm seconds
+    offsets = [event.offset for event in bpm_events]
+    last = max(0, bisect_right(offsets, offset) - 1)
+    seconds = Fraction(0)
+    for i in range(last):
+        seconds += (offsets[i+1] - offsets[i]) * Fraction(240, bpm_events[i].bpm)
+    return seconds + (offset - offsets[last]) * Fraction(240, bpm_events[last].bpm)
+
+
+def test_raw_note_ticks_match_fraction_offsets(make_score):
+
+    score = make_score()
+    # Filled in by parse_lines, which the first raw_notes access runs
+    raw_notes = score.raw_notes
+    ticks_per_measure = score.timebase.ticks_per_measure
+    assert ticks_per_measure is not None
+    for raw_note in raw_notes:
+        assert Fraction(raw_note.tick, ticks_per_measure) == raw_note.offset
+    for event in score.bpm_events:
+        assert Fraction(event.tick, ticks_per_measure) == event.offset
+
+
+def test_time_ticks_match_fraction_seconds(make_score):
+
+    score = make_score()
+    bpm_events = sorted(score.bpm_events, key=lambda x: x.offset)
+    for notes in [score.playable_notes, score.skill_notes, score.prepare_notes]:
+        for note in notes:
+            assert note.time_offset == get_reference_seconds(bpm_events, note.offset)
+            assert note.get_time_offset_float() == float(note.time_offset)
+    for event in bpm_events:
+        assert event.time_offset == get_reference_seconds(bpm_events, event.offset)
+    for hold in score.holds:
+        for tick, time_tick in zip(hold.ticks, hold.time_ticks):
+            assert score.measure_to_seconds(Fraction(tick, score.timebase.ticks_per_measure)) == Fraction(time_tick, score.timebase.time_ticks_per_second)
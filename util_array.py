@@ -0,0 +1,59 @@
+import numpy as np
+
+# Note times are rounded to float, so window edges are nudged by this much to keep
+# notes that sit exactly on an edge on the same side as the exact Fraction comparison
+TIME_EPSILON = 1e-6
+
+
+class ScoreArrays:
+
+    # Float copy of a Score's playable notes for repeated skill window queries.
+    # Score.get_solo_base_scores and Score.get_solo_skill_scores_coverages stay the exact reference.
+    def __init__(self, score):
+
+        self.music_id = score.music_id
+        self.music_difficulty = score.music_difficulty
+
+        self.note_times = np.array([note.get_time_offset_float() for note in score.playable_notes], dtype=np.float64)
+        self.note_weights = np.array([note.weight for note in score.playable_notes], dtype=np.float64)
+        combo_numbers = np.array([note.combo_number for note in score.playable_notes], dtype=np.int64)
+        self.combo_multipliers = (np.minimum(10, (combo_numbers - 1) // 100) + 100) / 100
+
+        # Playable notes are sorted by offset, so their times are already ascending
+        order = np.argsort(self.note_times, kind='stable')
+        self.note_times = self.note_times[order]
+        self.note_weights = self.note_weights[order]
+        self.combo_multipliers = self.combo_multipliers[order]
+
+        # combo_weight_prefix[i] = sum of the first i combo-weighted notes
+        self.combo_weight_prefix = np.concatenate(([0.0], np.cumsum(self.note_weights * self.combo_multipliers)))
+        self.weight_sum = self.note_weights.sum()
+        self.play_level_multiplier = (max(0, score.play_level - 5) + 200) / 200
+
+        self.skill_note_times = np.sort(np.array([note.get_time_offset_float() for note in score.skill_notes], dtype=np.float64))
+
+    def get_solo_base_scores(self):
+
+        return self.combo_weight_prefix[-1] / self.weight_sum * self.play_level_multiplier
+
+    def get_solo_skill_scores_coverages(self, skill_times=(5, 5, 5, 5, 5, 5)):
+
+        # skill_times is one tuple of durations, or a matrix with one candidate tuple per row.
+        # As in the reference, the k-th duration goes to the k-th skill note and extras are dropped.
+        skill_times = np.asarray(skill_times, dtype=np.float64)
+        skill_count = min(skill_times.shape[-1], len(self.skill_note_times))
+        skill_times = skill_times[..., :skill_count]
+
+        # Cover notes in [start, start + skill_time)
+        window_starts = np.broadcast_to(self.skill_note_times[:skill_count], skill_times.shape)
+        first = np.searchsorted(self.note_times, window_starts - TIME_EPSILON, side='left')
+        last = np.searchsorted(self.note_times, window_starts + skill_times - TIME_EPSILON, side='left')
+
+        scores_coverages = self.combo_weight_prefix[last] - self.combo_weight_prefix[first]
+        return scores_coverages / self.weight_sum * self.play_level_multiplier
+
+    def get_reference_error(self, score, skill_times=(5, 5, 5, 5, 5, 5)):
+
+        # Largest absolute difference against the exact Fraction implementation for one skill_times tuple
+        reference = np.array([float(coverage) for coverage in score.get_solo_skill_scores_coverages(skill_times)])
+        return float(np.max(np.abs(self.get_solo_skill_scores_coverages(skill_times) - reference), initial=0))
@@ -0,0 +1,78 @@
+import os
+import time
+import traceback
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from util_cache import ScoreCache
+from util_object import Score
+
+# kwargs: keyword arguments the Score was built from
+# score: the built Score, or None if it failed
+# elapsed: seconds spent on this chart inside the worker
+# error: short description of the failure, or None
+# cached: whether the Score was loaded from the cache instead of parsed
+ScoreResult = namedtuple('ScoreResult', ['kwargs', 'score', 'elapsed', 'error', 'cached'], defaults=(False,))
+
+
+def describe_exception(exception):
+
+    # Bare asserts carry no message, so point at the line that raised instead
+    frame = traceback.extract_tb(exception.__traceback__)[-1]
+    message = f'{type(exception).__name__}'
+    if str(exception):
+        message += f': {exception}'
+    return message + f' (in {frame.name}, {os.path.basename(frame.filename)}:{frame.lineno})'
+
+
+def build_score(score_kwargs, cache_dir=None, content=None):
+
+    # Runs inside the worker process, so a broken chart only loses itself
+    # content: the .sus file's bytes if they were already read, see util_ingest
+    start_time = time.perf_counter()
+    try:
+        if cache_dir is None:
+            score = Score(**score_kwargs, content=content).run_stages()
+            cached = False
+        else:
+            score, cached = build_score_with_cache(score_kwargs, ScoreCache(cache_dir), content)
+        error = None
+    except Exception as e:
+        score = None
+        cached = False
+        error = describe_exception(e)
+    return ScoreResult(score_kwargs, score, time.perf_counter() - start_time, error, cached)
+
+
+def build_score_with_cache(score_kwargs, score_cache, content=None):
+
+    if content is None:
+        with open(score_kwargs['filename'], 'rb') as f:
+            content = f.read()
+    cache_key = score_cache.get_cache_key(content, score_kwargs['play_level'], score_kwargs['note_count'])
+
+    score = score_cache.load(score_kwargs['music_id'], score_kwargs['music_difficulty'], cache_key)
+    if score is not None:
+        # No stage ran this time, so there is nothing to profile
+        score.profile = None
+        return score, True
+
+    # Compacted, so an entry holds neither the parsing intermediates nor note objects and loads in a few ms;
+    # a miss returns the same shape of Score as a hit
+    score = Score(**score_kwargs, content=content).run_stages().compact()
+    score_cache.save(score, cache_key)
+    return score, False
+
+
+def iter_scores(score_kwargs_list, num_workers=None, chunksize=1, cache_dir=None):
+
+    # Yields a ScoreResult per entry, in the same order as score_kwargs_list
+    build = partial(build_score, cache_dir=cache_dir)
+    if num_workers == 1:
+        yield from map(build, score_kwargs_list)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        yield from executor.map(build, score_kwargs_list, chunksize=chunksize)
@@ -0,0 +1,202 @@
+import struct
+
+import numpy as np
+
+from util_object import PLAYABLE_NOTE_CLASSES
+
+# File layout (little endian, every block starts on an 8 byte boundary)
+#   file header: FILE_HEADER (magic, version, chart count, byte offset of the chart header table)
+#   per chart: a notes block then a BPM block, each one column after another
+#   chart header table: chart_count records of CHART_HEADER_DTYPE
+#
+# A chart's notes block holds its playable notes in combo order, then its skill notes,
+# then its prepare notes, told apart by note_class_code (NOTE_CLASS_NAMES)
+FILE_MAGIC = b'SEKAICOL'
+FILE_VERSION = 1
+FILE_HEADER = struct.Struct('<8sIIQ')
+
+NOTE_CLASS_NAMES = [note_description for _, note_description, _ in PLAYABLE_NOTE_CLASSES] + ['Skill', 'Prepare Start', 'Prepare End']
+SKILL_NOTE_CLASS_CODE = NOTE_CLASS_NAMES.index('Skill')
+PREPARE_START_CLASS_CODE = NOTE_CLASS_NAMES.index('Prepare Start')
+PREPARE_END_CLASS_CODE = NOTE_CLASS_NAMES.index('Prepare End')
+
+NOTE_COLUMNS = [
+    ('offset_numerator', np.dtype('<i8')),
+    ('offset_denominator', np.dtype('<i8')),
+    ('time_offset', np.dtype('<f8')),
+    ('combo_number', np.dtype('<i4')),
+    ('start_pos', np.dtype('i1')),
+    ('end_pos', np.dtype('i1')),
+    ('note_class_code', np.dtype('u1')),
+    ('weight', np.dtype('u1'))
+]
+BPM_COLUMNS = [
+    ('offset_numerator', np.dtype('<i8')),
+    ('offset_denominator', np.dtype('<i8')),
+    ('time_offset', np.dtype('<f8')),
+    ('bpm', np.dtype('<i4'))
+]
+CHART_HEADER_DTYPE = np.dtype([
+    ('music_id', '<i4'),
+    ('music_difficulty', 'S16'),
+    ('play_level', '<i4'),
+    ('note_count', '<i4'),
+    ('playable_note_count', '<i4'),
+    ('note_rows', '<i4'),
+    ('bpm_rows', '<i4'),
+    ('notes_offset', '<i8'),
+    ('bpm_offset', '<i8')
+])
+
+
+def align(position):
+
+    return (position + 7) // 8 * 8
+
+
+def get_column_offsets(columns, rows, block_offset):
+
+    # column name -> byte offset of that column in a block of the given row count
+    offsets = {}
+    position = block_offset
+    for name, dtype in columns:
+        offsets[name] = position
+        position = align(position + dtype.itemsize * rows)
+    return offsets, position
+
+
+def get_note_columns(score):
+
+    playable_notes = list(score.playable_notes)
+    skill_notes = list(score.skill_notes)
+    prepare_notes = list(score.prepare_notes)
+    notes = playable_notes + skill_notes + prepare_notes
+
+    note_class_codes = [note.note_class_code for note in playable_notes] + \
+                       [SKILL_NOTE_CLASS_CODE] * len(skill_notes) + \
+                       [PREPARE_START_CLASS_CODE if note.is_start else PREPARE_END_CLASS_CODE for note in prepare_notes]
+    return {
+        'offset_numerator': [note.offset.numerator for note in notes],
+        'offset_denominator': [note.offset.denominator for note in notes],
+        'time_offset': [note.get_time_offset_float() for note in notes],
+        'combo_number': [note.combo_number for note in playable_notes] + [0] * (len(skill_notes) + len(prepare_notes)),
+        'start_pos': [note.start_pos for note in notes],
+        'end_pos': [note.start_pos + note.width - 1 for note in notes],
+        'note_class_code': note_class_codes,
+        'weight': [note.weight for note in playable_notes] + [0] * (len(skill_notes) + len(prepare_notes))
+    }, len(playable_notes)
+
+
+def get_bpm_columns(score):
+
+    return {
+        'offset_numerator': [event.offset.numerator for event in score.bpm_events],
+        'offset_denominator': [event.offset.denominator for event in score.bpm_events],
+        'time_offset': [event.time_tick / event.timebase.time_ticks_per_second for event in score.bpm_events],
+        'bpm': [event.bpm for event in score.bpm_events]
+    }
+
+
+class BinaryScoreWriter:
+
+    # Same write(score) / close() interface as the writers in util_output, but takes the Score itself
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.headers = []
+        self.f = open(filename, 'wb')
+        self.f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, 0, 0))
+
+    def write_block(self, columns, values, rows):
+
+        block_offset = self.f.tell()
+        offsets, end = get_column_offsets(columns, rows, block_offset)
+        for name, dtype in columns:
+            self.f.seek(offsets[name])
+            self.f.write(np.asarray(values[name], dtype=dtype).tobytes())
+        self.f.write(b'\0' * (end - self.f.tell()))
+        return block_offset
+
+    def write(self, score):
+
+        note_values, playable_note_count = get_note_columns(score)
+        note_rows = len(note_values['note_class_code'])
+        bpm_values = get_bpm_columns(score)
+        bpm_rows = len(bpm_values['bpm'])
+
+        notes_offset = self.write_block(NOTE_COLUMNS, note_values, note_rows)
+        bpm_offset = self.write_block(BPM_COLUMNS, bpm_values, bpm_rows)
+        self.headers.append((score.music_id, score.music_difficulty.encode('utf-8'), score.play_level, score.note_count,
+                             playable_note_count, note_rows, bpm_rows, notes_offset, bpm_offset))
+
+    def close(self):
+
+        header_table_offset = self.f.tell()
+        self.f.write(np.array(self.headers, dtype=CHART_HEADER_DTYPE).tobytes())
+        self.f.seek(0)
+        self.f.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(self.headers), header_table_offset))
+        self.f.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+
+class BinaryScores:
+
+    # Memory-maps a file written by BinaryScoreWriter. Column arrays are zero-copy views
+    # into the map, so worker processes opening the same file share the pages.
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+
+        magic, version, chart_count, header_table_offset = FILE_HEADER.unpack_from(self.buffer, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise ValueError(f'{filename} is not a version {FILE_VERSION} binary score file')
+        self.headers = np.frombuffer(self.buffer, dtype=CHART_HEADER_DTYPE, count=chart_count, offset=header_table_offset)
+        self.chart_index = {(int(header['music_id']), header['music_difficulty'].decode('utf-8')): i
+                            for i, header in enumerate(self.headers)}
+
+    def __reduce__(self):
+
+        # Pickle by filename, the receiving process maps the file itself
+        return (BinaryScores, (self.filename,))
+
+    def __len__(self):
+
+        return len(self.headers)
+
+    def keys(self):
+
+        return self.chart_index.keys()
+
+    def get_header(self, music_id, music_difficulty):
+
+        return self.headers[self.chart_index[(music_id, music_difficulty)]]
+
+    def read_block(self, columns, rows, block_offset):
+
+        offsets, _ = get_column_offsets(columns, rows, block_offset)
+        return {name: np.frombuffer(self.buffer, dtype=dtype, count=rows, offset=offsets[name]) for name, dtype in columns}
+
+    def get_notes(self, music_id, music_difficulty):
+
+        # column name -> array, rows [0, playable_note_count) are the playable notes
+        header = self.get_header(music_id, music_difficulty)
+        return self.read_block(NOTE_COLUMNS, int(header['note_rows']), int(header['notes_offset']))
+
+    def get_playable_notes(self, music_id, music_difficulty):
+
+        header = self.get_header(music_id, music_difficulty)
+        playable_note_count = int(header['playable_note_count'])
+        return {name: column[:playable_note_count] for name, column in self.get_notes(music_id, music_difficulty).items()}
+
+    def get_bpm_events(self, music_id, music_difficulty):
+
+        header = self.get_header(music_id, music_difficulty)
+        return self.read_block(BPM_COLUMNS, int(header['bpm_rows']), int(header['bpm_offset']))
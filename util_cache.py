@@ -0,0 +1,79 @@
+import hashlib
+import os
+import pickle
+import re
+
+from util_object import PARSER_VERSION
+
+# Names of the entries get_path and save write, including temporaries left by an interrupted save
+CACHE_ENTRY_PATTERN = re.compile(r'\d{4,}_[^.]+\.pickle(\.\d+\.tmp)?')
+
+
+class ScoreCache:
+
+    # One pickle per chart, holding the cache key it was built under and the compacted Score:
+    # Scores/0001/master.sus -> <cache_dir>/0001_master.pickle
+    def __init__(self, cache_dir):
+
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get_cache_key(self, content, play_level, note_count):
+
+        # content is the raw bytes of the .sus file
+        hasher = hashlib.sha256(content)
+        hasher.update(f'|{play_level}|{note_count}|{PARSER_VERSION}'.encode('utf-8'))
+        return hasher.hexdigest()
+
+    def get_path(self, music_id, music_difficulty):
+
+        return os.path.join(self.cache_dir, f'{music_id:04d}_{music_difficulty}.pickle')
+
+    def load(self, music_id, music_difficulty, cache_key):
+
+        path = self.get_path(music_id, music_difficulty)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Unreadable entries (interrupted writes, old class layouts) are rebuilt
+            self.remove(path)
+            return None
+
+        if entry['cache_key'] != cache_key:
+            # Stale: the chart, its metadata or the parser changed since
+            self.remove(path)
+            return None
+        return entry['score']
+
+    def save(self, score, cache_key):
+
+        path = self.get_path(score.music_id, score.music_difficulty)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as f:
+            pickle.dump({'cache_key': cache_key, 'score': score}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    def remove(self, path):
+
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep):
+
+        # Drop entries of charts that are not in keep, an iterable of (music_id, music_difficulty).
+        # Files that are not cache entries are left alone, so cache_dir may be shared
+        keep_paths = {self.get_path(music_id, music_difficulty) for music_id, music_difficulty in keep}
+        evicted = 0
+        for name in os.listdir(self.cache_dir):
+            if not CACHE_ENTRY_PATTERN.fullmatch(name):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            if path not in keep_paths:
+                self.remove(path)
+                evicted += 1
+        return evicted
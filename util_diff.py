@@ -0,0 +1,228 @@
+import glob
+import hashlib
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+from util_batch import describe_exception
+from util_object import Score
+
+# A chart is compared through a view of sorted tuples, built from a Score or from a BinaryScores file:
+#   notes: (offset, start_pos, end_pos, note_class) of every playable note
+#   skill_notes: offset of every skill note
+#   prepare_notes: (offset, is_start) of every prepare note
+#   bpm_events: (offset, bpm) of every BPM change
+# Offsets are exact Fractions, so charts with different timebases compare correctly.
+
+
+def get_score_view(score):
+
+    return {
+        'notes': sorted((note.offset, note.start_pos, note.start_pos + note.width - 1, note.note_description) for note in score.playable_notes),
+        'skill_notes': sorted(note.offset for note in score.skill_notes),
+        'prepare_notes': sorted((note.offset, note.is_start) for note in score.prepare_notes),
+        'bpm_events': sorted((event.offset, event.bpm) for event in score.bpm_events)
+    }
+
+
+def get_binary_view(binary_scores, music_id, music_difficulty):
+
+    from util_binary import NOTE_CLASS_NAMES, PREPARE_START_CLASS_CODE, SKILL_NOTE_CLASS_CODE
+
+    notes = binary_scores.get_notes(music_id, music_difficulty)
+    rows = zip(notes['offset_numerator'].tolist(), notes['offset_denominator'].tolist(), notes['start_pos'].tolist(),
+               notes['end_pos'].tolist(), notes['note_class_code'].tolist())
+    view = {'notes': [], 'skill_notes': [], 'prepare_notes': [], 'bpm_events': []}
+    for numerator, denominator, start_pos, end_pos, note_class_code in rows:
+        offset = Fraction(numerator, denominator)
+        if note_class_code == SKILL_NOTE_CLASS_CODE:
+            view['skill_notes'].append(offset)
+        elif note_class_code > SKILL_NOTE_CLASS_CODE:
+            view['prepare_notes'].append((offset, note_class_code == PREPARE_START_CLASS_CODE))
+        else:
+            view['notes'].append((offset, start_pos, end_pos, NOTE_CLASS_NAMES[note_class_code]))
+    bpm_events = binary_scores.get_bpm_events(music_id, music_difficulty)
+    view['bpm_events'] = [(Fraction(numerator, denominator), bpm) for numerator, denominator, bpm in
+                          zip(bpm_events['offset_numerator'].tolist(), bpm_events['offset_denominator'].tolist(), bpm_events['bpm'].tolist())]
+    for items in view.values():
+        items.sort()
+    return view
+
+
+def merge_join(old_items, new_items, match_length):
+
+    # One pass over two sorted lists, one run of items sharing their first match_length fields at a time.
+    # Inside a run, equal items are matched first; what is left of both sides is then paired in order as
+    # changed, and the surplus of either side is removed (only in old) or added (only in new).
+    # Returns (added, removed, changed), changed as (old_item, new_item) pairs.
+    added, removed, changed = [], [], []
+    i, j = 0, 0
+    while i < len(old_items) or j < len(new_items):
+        if j == len(new_items) or (i < len(old_items) and old_items[i][:match_length] <= new_items[j][:match_length]):
+            key = old_items[i][:match_length]
+        else:
+            key = new_items[j][:match_length]
+        old_end, new_end = i, j
+        while old_end < len(old_items) and old_items[old_end][:match_length] == key:
+            old_end += 1
+        while new_end < len(new_items) and new_items[new_end][:match_length] == key:
+            new_end += 1
+
+        # Both runs are sorted, so their equal items are found by merging them
+        old_left, new_left = [], []
+        while i < old_end and j < new_end:
+            if old_items[i] == new_items[j]:
+                i += 1
+                j += 1
+            elif old_items[i] < new_items[j]:
+                old_left.append(old_items[i])
+                i += 1
+            else:
+                new_left.append(new_items[j])
+                j += 1
+        old_left.extend(old_items[i:old_end])
+        new_left.extend(new_items[j:new_end])
+        i, j = old_end, new_end
+
+        changed.extend(zip(old_left, new_left))
+        removed.extend(old_left[len(new_left):])
+        added.extend(new_left[len(old_left):])
+    return added, removed, changed
+
+
+class ScoreDiff:
+
+    # Differences between two versions of one chart, notes matched on (offset, lane range, class).
+    # A note whose class changed in place is in changed_notes; moved skill / prepare notes are
+    # reported by index, as (index, old offset, new offset), None when one side has fewer of them.
+    def __init__(self, music_id, music_difficulty, old_view, new_view):
+
+        self.music_id = music_id
+        self.music_difficulty = music_difficulty
+        self.added_notes, self.removed_notes, self.changed_notes = merge_join(old_view['notes'], new_view['notes'], 3)
+        self.added_bpm_events, self.removed_bpm_events, self.changed_bpm_events = merge_join(old_view['bpm_events'], new_view['bpm_events'], 1)
+        self.skill_note_moves = self.get_moves(old_view['skill_notes'], new_view['skill_notes'])
+        self.prepare_note_moves = self.get_moves(old_view['prepare_notes'], new_view['prepare_notes'])
+
+    @staticmethod
+    def get_moves(old_items, new_items):
+
+        moves = []
+        for i in range(max(len(old_items), len(new_items))):
+            old_item = old_items[i] if i < len(old_items) else None
+            new_item = new_items[i] if i < len(new_items) else None
+            if old_item != new_item:
+                moves.append((i, old_item, new_item))
+        return moves
+
+    def __bool__(self):
+
+        return bool(self.added_notes or self.removed_notes or self.changed_notes or
+                    self.added_bpm_events or self.removed_bpm_events or self.changed_bpm_events or
+                    self.skill_note_moves or self.prepare_note_moves)
+
+    def get_summary(self):
+
+        return f"notes +{len(self.added_notes)} -{len(self.removed_notes)} ~{len(self.changed_notes)}, " + \
+               f"bpm +{len(self.added_bpm_events)} -{len(self.removed_bpm_events)} ~{len(self.changed_bpm_events)}, " + \
+               f"skill moves {len(self.skill_note_moves)}, prepare moves {len(self.prepare_note_moves)}"
+
+    def __repr__(self):
+
+        return f"ScoreDiff(music_id={self.music_id}, music_difficulty={self.music_difficulty}, {self.get_summary()})"
+
+    def to_json(self):
+
+        def get_note_json(note):
+            offset, start_pos, end_pos, note_class = note
+            return {'measure_offset': float(offset), 'note_range': [start_pos, end_pos], 'note_class': note_class}
+
+        def get_offset_json(offset):
+            return None if offset is None else float(offset if not isinstance(offset, tuple) else offset[0])
+
+        return {
+            'music_id': self.music_id,
+            'music_difficulty': self.music_difficulty,
+            'added_notes': [get_note_json(note) for note in self.added_notes],
+            'removed_notes': [get_note_json(note) for note in self.removed_notes],
+            'changed_notes': [[get_note_json(old_note), get_note_json(new_note)] for old_note, new_note in self.changed_notes],
+            'added_bpm_events': [[float(offset), bpm] for offset, bpm in self.added_bpm_events],
+            'removed_bpm_events': [[float(offset), bpm] for offset, bpm in self.removed_bpm_events],
+            'changed_bpm_events': [[float(offset), old_bpm, new_bpm] for (offset, old_bpm), (_, new_bpm) in self.changed_bpm_events],
+            'skill_note_moves': [[i, get_offset_json(old), get_offset_json(new)] for i, old, new in self.skill_note_moves],
+            'prepare_note_moves': [[i, get_offset_json(old), get_offset_json(new)] for i, old, new in self.prepare_note_moves]
+        }
+
+
+def diff_scores(old_score, new_score):
+
+    return ScoreDiff(new_score.music_id, new_score.music_difficulty, get_score_view(old_score), get_score_view(new_score))
+
+
+def get_chart_keys(folders):
+
+    # (music_id, music_difficulty) -> filename of every chart in a Scores/ style folder
+    chart_keys = {}
+    for filename in glob.glob(os.path.join(folders, '*', '*.sus')):
+        chart_keys[(int(os.path.basename(os.path.dirname(filename))), os.path.splitext(os.path.basename(filename))[0])] = filename
+    return chart_keys
+
+
+def get_file_hash(filename):
+
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def diff_files(key, old_filename, new_filename):
+
+    # Runs inside the worker process; returns (key, ScoreDiff or None, error)
+    music_id, music_difficulty = key
+    try:
+        scores = [Score(filename=filename, music_id=music_id, music_difficulty=music_difficulty, play_level=0, note_count=0)
+                  for filename in [old_filename, new_filename]]
+        return key, diff_scores(*scores), None
+    except Exception as e:
+        return key, None, describe_exception(e)
+
+
+def diff_folders(old_folders, new_folders, num_workers=None):
+
+    # Compares two Scores/ snapshots. Charts with byte-identical files are skipped without parsing,
+    # the rest are parsed and diffed on worker processes.
+    # Returns (added chart keys, removed chart keys, [(key, ScoreDiff or None, error)] of changed charts only)
+    old_charts, new_charts = get_chart_keys(old_folders), get_chart_keys(new_folders)
+    added = sorted(new_charts.keys() - old_charts.keys())
+    removed = sorted(old_charts.keys() - new_charts.keys())
+    candidates = [key for key in sorted(old_charts.keys() & new_charts.keys())
+                  if get_file_hash(old_charts[key]) != get_file_hash(new_charts[key])]
+
+    args = ([key for key in candidates], [old_charts[key] for key in candidates], [new_charts[key] for key in candidates])
+    if num_workers == 1:
+        results = list(map(diff_files, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            results = list(executor.map(diff_files, *args))
+    # A file can change without changing the chart, e.g. a comment or line order
+    return added, removed, [result for result in results if result[1] is None or result[1]]
+
+
+def diff_binary_files(old_binary, new_binary):
+
+    # Same as diff_folders, for two files written by util_binary.BinaryScoreWriter.
+    # Charts whose columns are bitwise equal are skipped without building their views.
+    import numpy as np
+
+    added = sorted(new_binary.keys() - old_binary.keys())
+    removed = sorted(old_binary.keys() - new_binary.keys())
+    results = []
+    for key in sorted(old_binary.keys() & new_binary.keys()):
+        old_columns = [old_binary.get_notes(*key), old_binary.get_bpm_events(*key)]
+        new_columns = [new_binary.get_notes(*key), new_binary.get_bpm_events(*key)]
+        if all(np.array_equal(old_block[name], new_block[name]) for old_block, new_block in zip(old_columns, new_columns) for name in old_block):
+            continue
+        score_diff = ScoreDiff(*key, get_binary_view(old_binary, *key), get_binary_view(new_binary, *key))
+        if score_diff:
+            results.append((key, score_diff, None))
+    return added, removed, results
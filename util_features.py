@@ -0,0 +1,140 @@
+import numpy as np
+
+from util_array import TIME_EPSILON
+from util_object import PLAYABLE_NOTE_CLASSES
+
+# Sliding window lengths in seconds of the peak_nps_<w>s columns
+FEATURE_WINDOWS = [1, 5]
+
+# One row per chart
+#   notes: playable notes but Long Auto ones, which are combo ticks rather than something to hit;
+#          every other column but hold_coverage is over these notes too
+#   duration: seconds from the first to the last note
+#   peak_nps_<w>s: most notes in any [t, t + w) window, divided by w
+#   lane_switch_distance: mean lane distance between the centres of consecutive notes, in time then lane order
+#   flick_ratio, critical_ratio: share of the notes that are flicks / criticals
+#   hold_coverage: share of the duration during which at least one long note is held
+FEATURE_COLUMNS = ['music_id', 'music_difficulty', 'notes', 'duration'] + \
+                  [f'peak_nps_{window}s' for window in FEATURE_WINDOWS] + \
+                  ['mean_nps', 'lane_switch_distance', 'flick_ratio', 'critical_ratio', 'hold_coverage']
+
+
+def get_class_mask(flag_index):
+
+    # note_class_code -> whether the flag_index-th note property flag is set
+    return np.array([note_property_string[flag_index] == '1' for note_property_string, _, _ in PLAYABLE_NOTE_CLASSES], dtype=bool)
+
+
+IS_CRITICAL = get_class_mask(0)
+IS_FLICK = get_class_mask(1)
+IS_LONG_START = get_class_mask(2)
+IS_LONG_END = get_class_mask(3)
+IS_LONG_AUTO = get_class_mask(4)
+
+
+def get_score_columns(score):
+
+    # Same column names as util_binary.BinaryScores.get_playable_notes
+    notes = score.playable_notes
+    return {
+        'time_offset': np.array([note.get_time_offset_float() for note in notes], dtype=np.float64),
+        'start_pos': np.array([note.start_pos for note in notes], dtype=np.int64),
+        'end_pos': np.array([note.start_pos + note.width - 1 for note in notes], dtype=np.int64),
+        'note_class_code': np.array([note.note_class_code for note in notes], dtype=np.int64)
+    }
+
+
+def segment_reduce(ufunc, values, counts, initial):
+
+    # ufunc over each run of counts[i] consecutive values, initial for empty runs
+    result = np.full(len(counts), initial, dtype=np.float64)
+    nonempty = counts > 0
+    if values.size:
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[nonempty]
+        result[nonempty] = ufunc.reduceat(values, starts)
+    return result
+
+
+def get_feature_table(charts):
+
+    # charts: [((music_id, music_difficulty), columns)], columns as from get_score_columns.
+    # Every chart's notes go into one set of arrays, tagged with their chart's index and shifted in
+    # time so that no window reaches into the next chart; each feature is then a single vectorized pass.
+    # Returns FEATURE_COLUMNS -> array, one entry per chart in the order given.
+    chart_count = len(charts)
+    chart_ids = np.concatenate([np.full(len(columns['time_offset']), i, dtype=np.int64) for i, (_, columns) in enumerate(charts)] +
+                               [np.zeros(0, dtype=np.int64)])
+    times = np.concatenate([np.asarray(columns['time_offset'], dtype=np.float64) for _, columns in charts] + [np.zeros(0)])
+    start_pos = np.concatenate([np.asarray(columns['start_pos'], dtype=np.int64) for _, columns in charts] + [np.zeros(0, dtype=np.int64)])
+    end_pos = np.concatenate([np.asarray(columns['end_pos'], dtype=np.int64) for _, columns in charts] + [np.zeros(0, dtype=np.int64)])
+    note_class_codes = np.concatenate([np.asarray(columns['note_class_code'], dtype=np.int64) for _, columns in charts] +
+                                      [np.zeros(0, dtype=np.int64)])
+
+    # Hold coverage: +1 at every long start and -1 at every long end, a hold is active where the running sum is positive
+    order = np.lexsort((times, chart_ids))
+    hold_deltas = IS_LONG_START[note_class_codes[order]].astype(np.int64) - IS_LONG_END[note_class_codes[order]]
+    is_hold_event = hold_deltas != 0
+    hold_chart_ids, hold_times, hold_deltas = chart_ids[order][is_hold_event], times[order][is_hold_event], hold_deltas[is_hold_event]
+    depths = np.cumsum(hold_deltas)
+    hold_counts = np.bincount(hold_chart_ids, minlength=chart_count)
+    # Running sums restart at every chart, even if an earlier one left a hold open
+    depths -= np.repeat(np.concatenate(([0], depths))[np.concatenate(([0], np.cumsum(hold_counts)[:-1]))], hold_counts)
+    is_held = (depths[:-1] > 0) & (hold_chart_ids[1:] == hold_chart_ids[:-1])
+    held_seconds = np.bincount(hold_chart_ids[:-1][is_held], weights=np.diff(hold_times)[is_held], minlength=chart_count)
+
+    # The other features skip the Long Auto combo ticks
+    is_note = ~IS_LONG_AUTO[note_class_codes]
+    chart_ids, times, start_pos, end_pos, note_class_codes = \
+        chart_ids[is_note], times[is_note], start_pos[is_note], end_pos[is_note], note_class_codes[is_note]
+    order = np.lexsort((start_pos, times, chart_ids))
+    chart_ids, times, start_pos, end_pos, note_class_codes = \
+        chart_ids[order], times[order], start_pos[order], end_pos[order], note_class_codes[order]
+    counts = np.bincount(chart_ids, minlength=chart_count)
+
+    features = {
+        'music_id': np.array([music_id for (music_id, _), _ in charts], dtype=np.int64),
+        'music_difficulty': np.array([music_difficulty for (_, music_difficulty), _ in charts], dtype=object),
+        'notes': counts
+    }
+    first_times = segment_reduce(np.minimum, times, counts, 0.0)
+    durations = segment_reduce(np.maximum, times, counts, 0.0) - first_times
+    features['duration'] = durations
+
+    # Windows [t, t + w) from every note, by one searchsorted over the shifted times
+    span = (times.max() if times.size else 0.0) + max(FEATURE_WINDOWS) + 1
+    shifted_times = times + chart_ids * span
+    indices = np.arange(len(shifted_times))
+    for window in FEATURE_WINDOWS:
+        window_counts = np.searchsorted(shifted_times, shifted_times + window - TIME_EPSILON, side='left') - indices
+        features[f'peak_nps_{window}s'] = segment_reduce(np.maximum, window_counts.astype(np.float64), counts, 0.0) / window
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features['mean_nps'] = np.where(durations > 0, counts / durations, 0.0)
+
+        centres = (start_pos + end_pos) / 2
+        is_same_chart = chart_ids[1:] == chart_ids[:-1]
+        lane_switch_totals = np.bincount(chart_ids[1:][is_same_chart], weights=np.abs(np.diff(centres))[is_same_chart], minlength=chart_count)
+        features['lane_switch_distance'] = np.where(counts > 1, lane_switch_totals / np.maximum(counts - 1, 1), 0.0)
+
+        features['flick_ratio'] = np.where(counts > 0, np.bincount(chart_ids, weights=IS_FLICK[note_class_codes], minlength=chart_count) / np.maximum(counts, 1), 0.0)
+        features['critical_ratio'] = np.where(counts > 0, np.bincount(chart_ids, weights=IS_CRITICAL[note_class_codes], minlength=chart_count) / np.maximum(counts, 1), 0.0)
+        features['hold_coverage'] = np.where(durations > 0, np.minimum(held_seconds / durations, 1.0), 0.0)
+    return features
+
+
+def iter_feature_rows(features):
+
+    # One dict per chart, with plain Python values
+    for i in range(len(features['music_id'])):
+        yield {column: features[column][i].item() if hasattr(features[column][i], 'item') else features[column][i] for column in FEATURE_COLUMNS}
+
+
+def get_score_features(score):
+
+    return next(iter_feature_rows(get_feature_table([((score.music_id, score.music_difficulty), get_score_columns(score))])))
+
+
+def get_binary_feature_table(binary_scores):
+
+    # Features of every chart of a util_binary.BinaryScores file, straight from its memory-mapped columns
+    return get_feature_table([(key, binary_scores.get_playable_notes(*key)) for key in sorted(binary_scores.keys())])
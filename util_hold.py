@@ -0,0 +1,89 @@
+import math
+
+from bisect import bisect_right
+from fractions import Fraction
+
+import numpy as np
+
+from util_object import LONG_AUTO_NOTES_PER_MEASURE
+
+
+def get_long_auto_counts(holds):
+
+    # Long auto notes of every hold at once, the closed form of Hold.long_auto_count over arrays
+    if not holds:
+        return np.zeros(0, dtype=np.int64)
+    long_auto_step = holds[0].timebase.ticks_per_measure // LONG_AUTO_NOTES_PER_MEASURE
+    start_ticks = np.array([hold.start_tick for hold in holds], dtype=np.int64)
+    end_ticks = np.array([hold.end_tick for hold in holds], dtype=np.int64)
+    return np.maximum(0, (end_ticks - 1) // long_auto_step - start_ticks // long_auto_step)
+
+
+class HoldIndex:
+
+    # Holds of one chart as [start_time_tick, end_time_tick) intervals, for questions like
+    # "how many holds are active at t" or "which holds overlap this skill window".
+    # Holds are sorted by start and laid out as an implicit binary search tree (the middle of every range is
+    # its root), each node keeping the latest end in its subtree. A subtree is skipped once every hold in it
+    # ended before the query or starts after it, so a query finding k holds visits O(min(n, (k + 1) log n)) nodes.
+    def __init__(self, holds):
+
+        self.holds = sorted(holds, key=lambda x: (x.start_time_tick, x.end_time_tick))
+        self.starts = [hold.start_time_tick for hold in self.holds]
+        self.ends = [hold.end_time_tick for hold in self.holds]
+        self.sorted_ends = sorted(self.ends)
+        self.time_ticks_per_second = self.holds[0].timebase.time_ticks_per_second if self.holds else None
+
+        # max_ends[mid] = latest end among the holds of the subtree rooted at mid
+        self.max_ends = list(self.ends)
+        self.build_max_ends(0, len(self.holds))
+
+    def build_max_ends(self, lo, hi):
+
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        for max_end in [self.build_max_ends(lo, mid), self.build_max_ends(mid + 1, hi)]:
+            if max_end is not None and max_end > self.max_ends[mid]:
+                self.max_ends[mid] = max_end
+        return self.max_ends[mid]
+
+    def __len__(self):
+
+        return len(self.holds)
+
+    def count_active(self, time_tick):
+
+        # Holds with start <= time_tick < end, in O(log n) without listing them
+        return bisect_right(self.starts, time_tick) - bisect_right(self.sorted_ends, time_tick)
+
+    def get_overlapping(self, start_time_tick, end_time_tick):
+
+        # Holds overlapping [start_time_tick, end_time_tick), i.e. start < end_time_tick and end > start_time_tick, by start
+        found = []
+        stack = [(0, len(self.holds))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self.max_ends[mid] <= start_time_tick:
+                # Every hold below here ended already
+                continue
+            if self.starts[mid] < end_time_tick:
+                if self.ends[mid] > start_time_tick:
+                    found.append(mid)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+        return [self.holds[i] for i in sorted(found)]
+
+    def get_active(self, time_tick):
+
+        # Holds with start <= time_tick < end
+        return self.get_overlapping(time_tick, time_tick + 1)
+
+    def get_skill_window_holds(self, skill_note, skill_time=5):
+
+        # Holds overlapping the window a skill_note lasting skill_time seconds covers, the same window as ScoringEngine
+        window_end = skill_note.time_tick + math.ceil(Fraction(skill_time) * self.time_ticks_per_second) if self.holds else 0
+        return self.get_overlapping(skill_note.time_tick, window_end)
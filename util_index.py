@@ -0,0 +1,276 @@
+import hashlib
+import re
+import sqlite3
+
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from util_batch import describe_exception
+from util_ingest import iter_prefetched_contents
+from util_object import PARSER_VERSION, PLAYABLE_NOTE_CLASSES, Score
+from util_scoring import ScoringEngine
+
+# Bumped whenever the summary columns or how they are computed change, which rebuilds every row
+INDEX_VERSION = 1
+
+# Skill windows are summarised for this many slots of SUMMARY_SKILL_TIME seconds, solo scoring
+SUMMARY_SKILL_TIME = 5
+SUMMARY_SKILL_SLOTS = 6
+# Notes per second over one-second bins of the chart, at these percentiles
+DENSITY_PERCENTILES = [50, 90, 99]
+
+NOTE_CLASS_COLUMNS = ['count_' + note_description.lower().replace(' ', '_') for _, note_description, _ in PLAYABLE_NOTE_CLASSES]
+
+# Column name -> SQLite type of the per-chart summary
+#   source_key: hash of the .sus file, its metadata and the parser version, see get_source_key
+#   duration: seconds from the chart start to the last playable note
+#   bpm_changes: BPM events that change the BPM, the initial BPM not included
+#   nps_p<N>, nps_max: notes per second over one-second bins, N-th percentile and maximum
+#   coverage_<k>, window_notes_<k>: solo skill coverage and notes covered by the k-th skill note
+INDEX_COLUMNS = dict(
+    [('music_id', 'INTEGER'), ('music_difficulty', 'TEXT'), ('source_key', 'TEXT'), ('play_level', 'INTEGER'),
+     ('note_count', 'INTEGER'), ('playable_note_count', 'INTEGER'), ('skill_note_count', 'INTEGER')] +
+    [(column, 'INTEGER') for column in NOTE_CLASS_COLUMNS] +
+    [('duration', 'REAL'), ('bpm_min', 'REAL'), ('bpm_max', 'REAL'), ('bpm_changes', 'INTEGER')] +
+    [(f'nps_p{percentile}', 'INTEGER') for percentile in DENSITY_PERCENTILES] + [('nps_max', 'INTEGER')] +
+    [('base_score', 'REAL')] +
+    [(f'coverage_{slot + 1}', 'REAL') for slot in range(SUMMARY_SKILL_SLOTS)] +
+    [(f'window_notes_{slot + 1}', 'INTEGER') for slot in range(SUMMARY_SKILL_SLOTS)] +
+    [('max_window_notes', 'INTEGER')]
+)
+
+AGGREGATE_FUNCTIONS = ['count', 'sum', 'avg', 'min', 'max']
+CONDITION_PATTERN = re.compile(r'^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.+?)\s*$')
+
+
+def get_source_key(content, play_level, note_count):
+
+    # content is the raw bytes of the .sus file
+    hasher = hashlib.sha256(content)
+    hasher.update(f'|{play_level}|{note_count}|{PARSER_VERSION}|{INDEX_VERSION}'.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def get_percentile(sorted_values, percentile):
+
+    # Nearest rank, so the result is always one of the values
+    if not sorted_values:
+        return 0
+    return sorted_values[max(0, -(-percentile * len(sorted_values) // 100) - 1)]
+
+
+def get_summary(score):
+
+    # Summary row of one chart, every INDEX_COLUMNS entry but source_key
+    engine = ScoringEngine(score)
+    time_ticks_per_second = engine.time_ticks_per_second
+
+    summary = {
+        'music_id': score.music_id,
+        'music_difficulty': score.music_difficulty,
+        'play_level': score.play_level,
+        'note_count': score.note_count,
+        'playable_note_count': len(score.playable_notes),
+        'skill_note_count': len(score.skill_notes)
+    }
+    note_class_counts = Counter(engine.note_class_codes)
+    for code, column in enumerate(NOTE_CLASS_COLUMNS):
+        summary[column] = note_class_counts[code]
+
+    summary['duration'] = engine.note_time_ticks[-1] / time_ticks_per_second if engine.note_time_ticks else 0.0
+    bpms = [event.bpm for event in sorted(score.bpm_events, key=lambda x: x.tick)]
+    summary['bpm_min'] = min(bpms, default=None)
+    summary['bpm_max'] = max(bpms, default=None)
+    summary['bpm_changes'] = sum(bpm != previous_bpm for previous_bpm, bpm in zip(bpms, bpms[1:]))
+
+    # Empty seconds inside the chart count as zero density
+    seconds = Counter(time_tick // time_ticks_per_second for time_tick in engine.note_time_ticks)
+    densities = sorted(seconds[second] for second in range(max(seconds, default=-1) + 1))
+    for percentile in DENSITY_PERCENTILES:
+        summary[f'nps_p{percentile}'] = get_percentile(densities, percentile)
+    summary['nps_max'] = densities[-1] if densities else 0
+
+    summary['base_score'] = float(engine.get_base_score('solo'))
+    coverages = engine.get_skill_coverages('solo', [SUMMARY_SKILL_TIME] * SUMMARY_SKILL_SLOTS)
+    for slot in range(SUMMARY_SKILL_SLOTS):
+        if slot < len(coverages):
+            first, last = engine.get_skill_window(slot, SUMMARY_SKILL_TIME)
+            summary[f'coverage_{slot + 1}'] = float(coverages[slot])
+            summary[f'window_notes_{slot + 1}'] = last - first
+        else:
+            summary[f'coverage_{slot + 1}'] = None
+            summary[f'window_notes_{slot + 1}'] = None
+    summary['max_window_notes'] = max((summary[f'window_notes_{slot + 1}'] or 0 for slot in range(SUMMARY_SKILL_SLOTS)), default=0)
+    return summary
+
+
+def summarize_chart(score_kwargs, content):
+
+    # Runs inside the worker process; returns (score_kwargs, summary or None, error)
+    try:
+        score = Score(**score_kwargs, content=content).run_stages()
+        return score_kwargs, get_summary(score), None
+    except Exception as e:
+        return score_kwargs, None, describe_exception(e)
+
+
+def iter_summaries(score_kwargs_list, contents, num_workers=None):
+
+    # Yields summarize_chart results in the same order as score_kwargs_list
+    if num_workers == 1 or not score_kwargs_list:
+        yield from map(summarize_chart, score_kwargs_list, contents)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        yield from executor.map(summarize_chart, score_kwargs_list, contents)
+
+
+def parse_condition(condition):
+
+    # 'play_level >= 30' or ('play_level', '>=', 30) -> ('play_level >= ?', 30)
+    if isinstance(condition, str):
+        match = CONDITION_PATTERN.match(condition)
+        if match is None:
+            raise ValueError(f'Condition {condition!r} is not "<column> <op> <value>"')
+        column, op, value = match.groups()
+    else:
+        column, op, value = condition
+    if column not in INDEX_COLUMNS:
+        raise ValueError(f'Unknown column {column!r}')
+    if op not in ['<=', '>=', '!=', '=', '<', '>']:
+        raise ValueError(f'Unknown operator {op!r}')
+    if isinstance(value, str):
+        if INDEX_COLUMNS[column] == 'INTEGER':
+            value = int(value)
+        elif INDEX_COLUMNS[column] == 'REAL':
+            value = float(value)
+    return f'{column} {op} ?', value
+
+
+def get_where_clause(where=(), any_of=()):
+
+    # Every where condition holds, and at least one any_of condition if any are given
+    clauses, params = [], []
+    for condition in where:
+        clause, value = parse_condition(condition)
+        clauses.append(clause)
+        params.append(value)
+    if any_of:
+        any_clauses = []
+        for condition in any_of:
+            clause, value = parse_condition(condition)
+            any_clauses.append(clause)
+            params.append(value)
+        clauses.append('(' + ' OR '.join(any_clauses) + ')')
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+class CatalogueIndex:
+
+    # Per-chart summary columns of a whole catalogue in one SQLite file, so filters and aggregates
+    # over every chart need no parsing. update only rebuilds the rows whose .sus file or metadata changed.
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        if self.connection.execute('PRAGMA user_version').fetchone()[0] != INDEX_VERSION:
+            # Rows of another layout are of no use, they are all rebuilt on the next update
+            with self.connection:
+                self.connection.execute('DROP TABLE IF EXISTS charts')
+                self.connection.execute(f'PRAGMA user_version = {INDEX_VERSION}')
+        columns = ', '.join(f'{column} {column_type}' for column, column_type in INDEX_COLUMNS.items())
+        with self.connection:
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS charts ({columns}, PRIMARY KEY (music_id, music_difficulty))')
+
+    def __len__(self):
+
+        return self.connection.execute('SELECT count(*) FROM charts').fetchone()[0]
+
+    def close(self):
+
+        self.connection.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+    def update(self, score_kwargs_list, num_workers=None, num_threads=8):
+
+        # Brings the index in line with score_kwargs_list: new or changed charts are summarised on worker
+        # processes, charts no longer listed are deleted. Returns (counts, [(key, error)] of failed charts)
+        source_keys = {(music_id, music_difficulty): source_key for music_id, music_difficulty, source_key in
+                       self.connection.execute('SELECT music_id, music_difficulty, source_key FROM charts')}
+        counts = {'unchanged': 0, 'updated': 0, 'removed': 0, 'failed': 0}
+        errors = []
+
+        pending = []
+        contents = iter_prefetched_contents([score_kwargs['filename'] for score_kwargs in score_kwargs_list], num_threads)
+        for score_kwargs, (content, error) in zip(score_kwargs_list, contents):
+            key = (score_kwargs['music_id'], score_kwargs['music_difficulty'])
+            if error is not None:
+                errors.append((key, error))
+                continue
+            source_key = get_source_key(content, score_kwargs['play_level'], score_kwargs['note_count'])
+            if source_keys.get(key) == source_key:
+                counts['unchanged'] += 1
+            else:
+                pending.append((score_kwargs, content, source_key))
+
+        results = iter_summaries([score_kwargs for score_kwargs, _, _ in pending], [content for _, content, _ in pending], num_workers)
+        insert = f'INSERT OR REPLACE INTO charts ({", ".join(INDEX_COLUMNS)}) VALUES ({", ".join("?" * len(INDEX_COLUMNS))})'
+        with self.connection:
+            for (_, _, source_key), (score_kwargs, summary, error) in zip(pending, results):
+                if summary is None:
+                    errors.append(((score_kwargs['music_id'], score_kwargs['music_difficulty']), error))
+                    continue
+                summary['source_key'] = source_key
+                self.connection.execute(insert, [summary[column] for column in INDEX_COLUMNS])
+                counts['updated'] += 1
+
+            # A chart that failed keeps no stale row either
+            keep = {(score_kwargs['music_id'], score_kwargs['music_difficulty']) for score_kwargs in score_kwargs_list}
+            keep -= {key for key, _ in errors}
+            for key in source_keys.keys() - keep:
+                self.connection.execute('DELETE FROM charts WHERE music_id = ? AND music_difficulty = ?', key)
+                counts['removed'] += 1
+        counts['failed'] = len(errors)
+        return counts, errors
+
+    def select(self, where=(), any_of=(), columns=None, order_by=None, descending=False, limit=None):
+
+        # Rows as dicts, where / any_of conditions are 'column op value' strings or (column, op, value)
+        columns = list(INDEX_COLUMNS) if columns is None else columns
+        for column in columns:
+            if column not in INDEX_COLUMNS:
+                raise ValueError(f'Unknown column {column!r}')
+        where_clause, params = get_where_clause(where, any_of)
+        query = f'SELECT {", ".join(columns)} FROM charts{where_clause}'
+        if order_by is not None:
+            if order_by not in INDEX_COLUMNS:
+                raise ValueError(f'Unknown column {order_by!r}')
+            query += f' ORDER BY {order_by}' + (' DESC' if descending else '')
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def aggregate(self, function, column='*', where=(), any_of=(), group_by=None):
+
+        # function over the rows matching the conditions, e.g. aggregate('avg', 'base_score', ['play_level >= 30']).
+        # Returns the value, or {group value: value} with group_by
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f'function must be one of {", ".join(AGGREGATE_FUNCTIONS)}')
+        if column != '*' and column not in INDEX_COLUMNS:
+            raise ValueError(f'Unknown column {column!r}')
+        if group_by is not None and group_by not in INDEX_COLUMNS:
+            raise ValueError(f'Unknown column {group_by!r}')
+        where_clause, params = get_where_clause(where, any_of)
+        if group_by is None:
+            return self.connection.execute(f'SELECT {function}({column}) FROM charts{where_clause}', params).fetchone()[0]
+        query = f'SELECT {group_by}, {function}({column}) FROM charts{where_clause} GROUP BY {group_by} ORDER BY {group_by}'
+        return {group: value for group, value in self.connection.execute(query, params)}
@@ -0,0 +1,115 @@
+import time
+
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from util_batch import ScoreResult, build_score, describe_exception
+
+
+class IngestStats:
+
+    # Where the time of an iter_ingested_scores run went
+    #   read_seconds: time reader threads spent reading files, overlapped with parsing
+    #   io_wait_seconds: time the run sat waiting for a file that was not read yet, i.e. I/O that was not hidden
+    #   cpu_seconds: CPU time spent building Scores, summed over the workers
+    def __init__(self):
+
+        self.files = 0
+        self.read_bytes = 0
+        self.read_seconds = 0.0
+        self.io_wait_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def __repr__(self):
+
+        return f"IngestStats(files={self.files}, read={self.read_bytes / 2**20:.1f} MB in {self.read_seconds:.3f}s, " + \
+               f"io_wait={self.io_wait_seconds:.3f}s, cpu={self.cpu_seconds:.3f}s, wall={self.wall_seconds:.3f}s)"
+
+
+def read_content(filename):
+
+    # Runs on a reader thread
+    start_time = time.perf_counter()
+    try:
+        with open(filename, 'rb') as f:
+            content = f.read()
+        error = None
+    except OSError as e:
+        content = None
+        error = describe_exception(e)
+    return content, error, time.perf_counter() - start_time
+
+
+def iter_prefetched_contents(filenames, num_threads=8, queue_size=64, stats=None):
+
+    # Yields (content, error) per filename, in order. Up to queue_size files are read ahead
+    # by num_threads threads while the caller works on the earlier ones.
+    stats = IngestStats() if stats is None else stats
+    filenames = iter(filenames)
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        pending = deque(executor.submit(read_content, filename) for filename in islice(filenames, queue_size))
+        while pending:
+            future = pending.popleft()
+            wait_start_time = time.perf_counter()
+            content, error, read_seconds = future.result()
+            stats.io_wait_seconds += time.perf_counter() - wait_start_time
+
+            stats.files += 1
+            stats.read_seconds += read_seconds
+            stats.read_bytes += len(content) if content is not None else 0
+            for filename in islice(filenames, 1):
+                pending.append(executor.submit(read_content, filename))
+            yield content, error
+
+
+def build_score_from_content(score_kwargs, content, cache_dir=None):
+
+    # Runs inside the worker process, returns the ScoreResult and the CPU time it took
+    cpu_start_time = time.process_time()
+    result = build_score(score_kwargs, cache_dir=cache_dir, content=content)
+    return result, time.process_time() - cpu_start_time
+
+
+def iter_ingested_scores(score_kwargs_list, num_workers=None, num_threads=8, queue_size=64, cache_dir=None, stats=None):
+
+    # Same results as util_batch.iter_scores, but the .sus files are read by a pool of threads,
+    # ahead of and alongside the worker processes parsing them. Pass an IngestStats to get the I/O / CPU split.
+    stats = IngestStats() if stats is None else stats
+    start_time = time.perf_counter()
+    contents = iter_prefetched_contents([score_kwargs['filename'] for score_kwargs in score_kwargs_list], num_threads, queue_size, stats)
+
+    def get_result(future):
+
+        result, cpu_seconds = future.result()
+        stats.cpu_seconds += cpu_seconds
+        return result
+
+    def submit(executor, score_kwargs, content, error):
+
+        if error is not None:
+            # Nothing to parse, the result is known already
+            future = Future()
+            future.set_result((ScoreResult(score_kwargs, None, 0.0, error), 0.0))
+            return future
+        if executor is None:
+            future = Future()
+            future.set_result(build_score_from_content(score_kwargs, content, cache_dir))
+            return future
+        return executor.submit(build_score_from_content, score_kwargs, content, cache_dir)
+
+    if num_workers == 1:
+        for score_kwargs, (content, error) in zip(score_kwargs_list, contents):
+            yield get_result(submit(None, score_kwargs, content, error))
+    else:
+        # At most queue_size charts are in the workers at once, so contents are not read far ahead of the parsing
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            pending = deque()
+            for score_kwargs, (content, error) in zip(score_kwargs_list, contents):
+                pending.append(submit(executor, score_kwargs, content, error))
+                if len(pending) >= queue_size:
+                    yield get_result(pending.popleft())
+            while pending:
+                yield get_result(pending.popleft())
+    stats.wall_seconds = time.perf_counter() - start_time
@@ -0,0 +1,201 @@
+import math
+
+from collections import Counter
+
+# Geometry of the sus.js images, so a renderer can draw the tiles of this layout into the same picture
+MEASURES_PER_TILE = 4
+# The parser does not read measure lengths (#mmm02), every chart is laid out as 4/4
+BEATS_PER_MEASURE = 4
+LANE_COUNT = 12
+# .sus lanes 2 to 13 are the playable ones
+FIRST_LANE = 2
+# Pixels per beat at the most frequent BPM: 80 / 140 * bpm
+PIXELS_PER_BEAT_PER_BPM = 80 / 140
+# Hold path edges sit this much of a lane inside the note, and a curve pulls its control point this far along
+HOLD_PATH_SHRINK = 1 / 16
+CURVE_EASE_RATIO = 0.5
+# A combo label every this many combo
+COMBO_LABEL_INTERVAL = 50
+
+
+def get_most_frequent_bpm(score, end_tick):
+
+    # BPM in effect over the most ticks up to end_tick
+    bpm_ticks = Counter()
+    bpm_events = sorted(score.bpm_events, key=lambda x: x.tick)
+    for i, bpm_event in enumerate(bpm_events):
+        next_tick = bpm_events[i+1].tick if i + 1 < len(bpm_events) else max(end_tick, bpm_event.tick)
+        bpm_ticks[bpm_event.bpm] += next_tick - bpm_event.tick
+    return bpm_ticks.most_common(1)[0][0] if bpm_ticks else 120
+
+
+class TileGeometry:
+
+    # Pixel geometry shared by every tile of a chart. y grows downwards as in SVG, a tile's first
+    # measure starts at its bottom and tile i covers ticks [i * tile_ticks, (i + 1) * tile_ticks].
+    def __init__(self, ticks_per_measure, pixels_per_beat):
+
+        self.ticks_per_measure = ticks_per_measure
+        self.tile_ticks = ticks_per_measure * MEASURES_PER_TILE
+        self.pixels_per_beat = pixels_per_beat
+        self.measure_height = pixels_per_beat * BEATS_PER_MEASURE
+        self.top_margin = self.bottom_margin = math.ceil(pixels_per_beat / 8)
+        self.left_margin = self.right_margin = math.ceil(pixels_per_beat / 2.5)
+        self.lane_width = math.ceil(pixels_per_beat * 1.2 / LANE_COUNT)
+        self.width = self.left_margin + self.lane_width * LANE_COUNT + self.right_margin
+        self.height = self.top_margin + self.measure_height * MEASURES_PER_TILE + self.bottom_margin
+
+    def get_x(self, start_pos):
+
+        # Left edge of a .sus lane
+        return self.left_margin + (start_pos - FIRST_LANE) * self.lane_width
+
+    def get_y(self, tile, tick):
+
+        return self.top_margin + ((tile + 1) * self.tile_ticks - tick) * self.measure_height / self.ticks_per_measure
+
+    def get_tiles(self, tick):
+
+        # A tick on the border between two tiles is drawn on both
+        tile = tick // self.tile_ticks
+        return [tile - 1, tile] if tile > 0 and tick % self.tile_ticks == 0 else [tile]
+
+    def get_span_tiles(self, start_tick, end_tick):
+
+        # Tiles a path from start_tick to end_tick passes through
+        return list(range(start_tick // self.tile_ticks, max(start_tick, end_tick - 1) // self.tile_ticks + 1))
+
+    def to_json(self):
+
+        return {
+            'measures_per_tile': MEASURES_PER_TILE,
+            'beats_per_measure': BEATS_PER_MEASURE,
+            'width': self.width,
+            'height': self.height,
+            'pixels_per_beat': self.pixels_per_beat,
+            'measure_height': self.measure_height,
+            'lane_width': self.lane_width,
+            'margins': {'top': self.top_margin, 'bottom': self.bottom_margin, 'left': self.left_margin, 'right': self.right_margin},
+            # x-range of every playable lane, left to right
+            'lanes': [[self.get_x(lane), self.get_x(lane) + self.lane_width] for lane in range(FIRST_LANE, FIRST_LANE + LANE_COUNT)]
+        }
+
+
+def get_note_sprites(note, flick_direction):
+
+    # Sprites of one playable note, as sus.js names its images: the note itself and the flick arrow
+    width_lanes = min(6, note.width)
+    if note.is_long_mid:
+        return [('notes_long_among' + ('_crtcl' if note.is_critical else ''), 'diamond')]
+    if note.is_critical:
+        sprites = [('notes_crtcl', 'note')]
+    elif note.is_flick:
+        sprites = [('notes_flick', 'note')]
+    elif note.is_long_start or note.is_long_end:
+        sprites = [('notes_long', 'note')]
+    else:
+        sprites = [('notes_normal', 'note')]
+    if note.is_flick:
+        sprites.append((f'notes_flick_arrow{"_crtcl" if note.is_critical else ""}_{width_lanes:02d}' +
+                        (f'_diagonal_{flick_direction}' if flick_direction in ['left', 'right'] else ''), 'arrow'))
+    return sprites
+
+
+def get_hold_path_segments(hold, geometry):
+
+    # One segment per pair of consecutive hold points: its left and right edges as cubic Bezier curves,
+    # [[x, tick], control point, control point, [x, tick]], the ticks turned into y per tile by the caller
+    shrink = geometry.lane_width * HOLD_PATH_SHRINK
+    segments = []
+    for i in range(len(hold.ticks) - 1):
+        (from_start_pos, from_width), (to_start_pos, to_width) = hold.positions[i], hold.positions[i+1]
+        from_tick, to_tick = hold.ticks[i], hold.ticks[i+1]
+        ease_in = CURVE_EASE_RATIO if hold.curves[i] == 'in' else 0
+        ease_out = CURVE_EASE_RATIO if hold.curves[i] == 'out' else 0
+        edges = []
+        for from_x, to_x in [(geometry.get_x(from_start_pos) + shrink, geometry.get_x(to_start_pos) + shrink),
+                             (geometry.get_x(from_start_pos + from_width) - shrink, geometry.get_x(to_start_pos + to_width) - shrink)]:
+            edges.append([(from_x, from_tick), (from_x, from_tick + (to_tick - from_tick) * ease_in),
+                          (to_x, to_tick - (to_tick - from_tick) * ease_out), (to_x, to_tick)])
+        segments.append((from_tick, to_tick, edges))
+    return segments
+
+
+def get_render_layout(score, pixels_per_beat=None, digits=2):
+
+    # Everything sus.js draws for a chart, already placed in fixed-height tiles of MEASURES_PER_TILE measures,
+    # so a renderer can draw each tile on its own. Works on compacted Scores too, nothing here needs the raw notes.
+    playable_notes = score.playable_notes
+    timebase = score.timebase
+    end_tick = max([note.tick for note in list(playable_notes) + list(score.skill_notes) + list(score.prepare_notes)] +
+                   [bpm_event.tick for bpm_event in score.bpm_events] + [0])
+    if pixels_per_beat is None:
+        pixels_per_beat = PIXELS_PER_BEAT_PER_BPM * get_most_frequent_bpm(score, end_tick)
+    geometry = TileGeometry(timebase.ticks_per_measure, pixels_per_beat)
+    tile_count = end_tick // geometry.tile_ticks + 1
+
+    def get_y(tile, tick):
+        return round(geometry.get_y(tile, tick), digits)
+
+    def get_x(x):
+        return round(x, digits)
+
+    tiles = [{
+        'index': tile,
+        'first_measure': tile * MEASURES_PER_TILE,
+        'measure_lines': [], 'beat_lines': [], 'bpm_markers': [], 'notes': [], 'hold_paths': [],
+        'combo_labels': [], 'skill_markers': [], 'fever_markers': []
+    } for tile in range(tile_count)]
+
+    for tile in tiles:
+        for i in range(MEASURES_PER_TILE + 1):
+            measure = tile['first_measure'] + i
+            tile['measure_lines'].append({'measure': measure, 'y': get_y(tile['index'], measure * timebase.ticks_per_measure)})
+            if i < MEASURES_PER_TILE:
+                tile['beat_lines'].extend(get_y(tile['index'], measure * timebase.ticks_per_measure + beat * timebase.ticks_per_measure // BEATS_PER_MEASURE)
+                                          for beat in range(1, BEATS_PER_MEASURE))
+
+    for bpm_event in score.bpm_events:
+        for tile in geometry.get_tiles(bpm_event.tick):
+            tiles[tile]['bpm_markers'].append({'y': get_y(tile, bpm_event.tick), 'bpm': bpm_event.bpm})
+
+    for note in playable_notes:
+        if note.combo_number % COMBO_LABEL_INTERVAL == 0:
+            for tile in geometry.get_tiles(note.tick):
+                tiles[tile]['combo_labels'].append({'y': get_y(tile, note.tick), 'combo': note.combo_number})
+        if note.is_long_auto:
+            continue
+        sprites = get_note_sprites(note, note.flick_direction)
+        x = geometry.get_x(note.start_pos)
+        for tile in geometry.get_tiles(note.tick):
+            for sprite, sprite_type in sprites:
+                tiles[tile]['notes'].append({
+                    'sprite': sprite,
+                    'type': sprite_type,
+                    'x': get_x(x),
+                    'width': note.width * geometry.lane_width,
+                    'y': get_y(tile, note.tick),
+                    'combo': note.combo_number
+                })
+
+    for hold in score.holds:
+        for from_tick, to_tick, edges in get_hold_path_segments(hold, geometry):
+            for tile in geometry.get_span_tiles(from_tick, to_tick):
+                tiles[tile]['hold_paths'].append({
+                    'critical': hold.is_critical,
+                    'edges': [[[get_x(x), get_y(tile, tick)] for x, tick in edge] for edge in edges]
+                })
+
+    for skill_note in score.skill_notes:
+        for tile in geometry.get_tiles(skill_note.tick):
+            tiles[tile]['skill_markers'].append({'y': get_y(tile, skill_note.tick)})
+    for prepare_note in score.prepare_notes:
+        for tile in geometry.get_tiles(prepare_note.tick):
+            tiles[tile]['fever_markers'].append({'y': get_y(tile, prepare_note.tick), 'type': 'feverPrepare' if prepare_note.is_start else 'feverStart'})
+
+    return {
+        'music_id': score.music_id,
+        'music_difficulty': score.music_difficulty,
+        'geometry': geometry.to_json(),
+        'tiles': tiles
+    }
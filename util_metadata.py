@@ -0,0 +1,185 @@
+import glob
+import json
+import os
+import threading
+import time
+
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+DEFAULT_BASE_URL = 'https://raw.githubusercontent.com/Sekai-World/sekai-master-db-diff/master'
+
+
+class MetadataProvider:
+
+    # Serves the master db tables (musics, musicDifficulties, ...) from, in order:
+    #   1. snapshot_dir/<name>.json, never touching the network
+    #   2. base_url/<name>.json, revalidated against cache_dir with ETag / Last-Modified
+    #   3. cache_dir/<name>.json as is, when offline or when every request failed
+    def __init__(self, snapshot_dir=None, cache_dir=None, base_url=DEFAULT_BASE_URL, timeout=10, retries=3, offline=False):
+
+        self.snapshot_dir = snapshot_dir
+        self.cache_dir = cache_dir
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.offline = offline
+        self.tables = {}
+        self.indexes = {}
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_cache_paths(self, name):
+
+        return os.path.join(self.cache_dir, f'{name}.json'), os.path.join(self.cache_dir, f'{name}.json.headers')
+
+    def read_cache(self, name):
+
+        if self.cache_dir is None:
+            return None, {}
+        path, headers_path = self.get_cache_paths(name)
+        if not os.path.exists(path):
+            return None, {}
+        with open(path, 'rb') as f:
+            content = f.read()
+        try:
+            with open(headers_path, 'r') as f:
+                headers = json.load(f)
+        except (FileNotFoundError, ValueError):
+            headers = {}
+        return content, headers
+
+    def write_cache(self, name, content, headers):
+
+        if self.cache_dir is None:
+            return
+        path, headers_path = self.get_cache_paths(name)
+        for target, data in [(path, content), (headers_path, json.dumps(headers).encode('utf-8'))]:
+            temp_path = f'{target}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, target)
+
+    def fetch(self, name, cached_content, cached_headers):
+
+        request_headers = {}
+        if cached_content is not None:
+            if 'ETag' in cached_headers:
+                request_headers['If-None-Match'] = cached_headers['ETag']
+            if 'Last-Modified' in cached_headers:
+                request_headers['If-Modified-Since'] = cached_headers['Last-Modified']
+
+        for attempt in range(max(1, self.retries)):
+            try:
+                response = requests.get(f'{self.base_url}/{name}.json', headers=request_headers, timeout=self.timeout)
+                if response.status_code == 304 and cached_content is not None:
+                    return cached_content
+                response.raise_for_status()
+                headers = {key: response.headers[key] for key in ['ETag', 'Last-Modified'] if key in response.headers}
+                self.write_cache(name, response.content, headers)
+                return response.content
+            except requests.RequestException as e:
+                error = e
+                if attempt + 1 < self.retries:
+                    time.sleep(0.5 * 2 ** attempt)
+
+        if cached_content is not None:
+            print(f'Warning: Fetching {name}.json Failed ({error}), Using Cached Copy')
+            return cached_content
+        raise error
+
+    def load(self, name):
+
+        if name in self.tables:
+            return self.tables[name]
+
+        snapshot_path = os.path.join(self.snapshot_dir, f'{name}.json') if self.snapshot_dir is not None else None
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            with open(snapshot_path, 'rb') as f:
+                content = f.read()
+        else:
+            cached_content, cached_headers = self.read_cache(name)
+            if self.offline:
+                if cached_content is None:
+                    raise FileNotFoundError(f'{name}.json is neither in the snapshot nor in the cache')
+                content = cached_content
+            else:
+                content = self.fetch(name, cached_content, cached_headers)
+
+        self.tables[name] = json.loads(content)
+        return self.tables[name]
+
+    @property
+    def musics(self):
+
+        return self.load('musics')
+
+    @property
+    def music_difficulties(self):
+
+        return self.load('musicDifficulties')
+
+    @property
+    def musics_by_id(self):
+
+        if 'musics_by_id' not in self.indexes:
+            self.indexes['musics_by_id'] = {music['id']: music for music in self.musics}
+        return self.indexes['musics_by_id']
+
+    @property
+    def music_difficulties_by_key(self):
+
+        # (musicId, musicDifficulty) -> metadata
+        if 'music_difficulties_by_key' not in self.indexes:
+            self.indexes['music_difficulties_by_key'] = {
+                (music_difficulty['musicId'], music_difficulty['musicDifficulty']): music_difficulty
+                for music_difficulty in self.music_difficulties
+            }
+        return self.indexes['music_difficulties_by_key']
+
+
+def get_score_kwargs_list(folders, metadata_provider=None):
+
+    # Every chart of the metadata, or every .sus file in folders without it
+    score_kwargs_list = []
+    if metadata_provider is None:
+        for filename in sorted(glob.glob(os.path.join(folders, '*', '*.sus'))):
+            score_kwargs_list.append({
+                'filename': filename,
+                'music_id': int(os.path.basename(os.path.dirname(filename))),
+                'music_difficulty': os.path.splitext(os.path.basename(filename))[0],
+                'play_level': 0,
+                'note_count': 0
+            })
+        return score_kwargs_list
+
+    for music_difficulties_metadata in metadata_provider.music_difficulties:
+        music_id = music_difficulties_metadata['musicId']
+        music_difficulty = music_difficulties_metadata['musicDifficulty']
+        score_kwargs_list.append({
+            'filename': os.path.join(folders, f'{music_id:04d}', f'{music_difficulty}.sus'),
+            'music_id': music_id,
+            'music_difficulty': music_difficulty,
+            'play_level': music_difficulties_metadata['playLevel'],
+            'note_count': music_difficulties_metadata['noteCount']
+        })
+    return score_kwargs_list
+
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+
+        pass
+
+
+def serve_snapshot(directory, port=0):
+
+    # Stub of the master db for tests: serves directory over HTTP from a daemon thread,
+    # with Last-Modified / If-Modified-Since support. Returns (server, base_url), stop with server.shutdown().
+    server = ThreadingHTTPServer(('127.0.0.1', port), partial(QuietHTTPRequestHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
@@ -1,16 +1,77 @@
-import glob
-import json
+import io
 import math
-import os
 import re
-import requests
 
-from collections import OrderedDict, defaultdict, Counter
+from array import array
+from bisect import bisect_left, bisect_right
 from fractions import Fraction
+from itertools import groupby
+from operator import attrgetter
+
+from util_profile import ScoreProfile
+from util_tokenizer import decode_sus, read_sus, tokenize_sus
+
+# Bump whenever a change to the parser alters what a Score contains,
+# so results cached from an older parser are rebuilt
+PARSER_VERSION = 10
+
+# note_class_code -> (note property flags, note_description, weight)
+# flags are is_critical, is_flick, is_long_start, is_long_end, is_long_auto, is_long_mid
+PLAYABLE_NOTE_CLASSES = [
+    ("000000", "Normal", 10),
+    ("100000", "Normal Critical", 20),
+    ("010000", "Flick", 10),
+    ("110000", "Flick Critical", 30),
+    ("001000", "Long Start", 10),
+    ("101000", "Long Start Critical", 20),
+    ("000100", "Long End", 10),
+    ("100100", "Long End Critical", 20),
+    ("010100", "Long End Flick", 10),
+    ("110100", "Long End Flick Critical", 30),
+    ("000010", "Long Auto", 1),
+    ("100010", "Long Auto Critical", 1),
+    ("000001", "Long Mid", 1),
+    ("100001", "Long Mid Critical", 2)
+]
+PLAYABLE_NOTE_CLASS_CODES = {note_property_string: code for code, (note_property_string, _, _) in enumerate(PLAYABLE_NOTE_CLASSES)}
+# code -> (is_critical, is_flick, is_long_start, is_long_end, is_long_auto, is_long_mid)
+PLAYABLE_NOTE_CLASS_FLAGS = [tuple(p == '1' for p in note_property_string) for note_property_string, _, _ in PLAYABLE_NOTE_CLASSES]
+
+# Long auto notes fall on every eighth of a measure
+LONG_AUTO_NOTES_PER_MEASURE = 8
+
+# Curve note -> how the hold path leaves the point it is put on: 'in' eases in, 'out' eases out
+CURVE_EASES = {'Down Curve': 'in', 'Left Curve': 'out', 'Right Curve': 'out'}
+
+# Flick note -> direction of its arrow; FLICK_DIRECTION_CODES[i] is stored as i in NoteColumns
+FLICK_DIRECTIONS = {'Up Flick': 'up', 'Left Flick': 'left', 'Right Flick': 'right'}
+FLICK_DIRECTION_CODES = [None, 'up', 'left', 'right']
+
+class Timebase:
+    
+    # Integer timebase shared by all notes of a chart
+    # A measure offset is stored as tick = offset * ticks_per_measure, where ticks_per_measure is
+    # the LCM of every scaling in the chart (and 8, for long auto notes), so every offset is whole.
+    # A time offset is stored as time_tick = seconds * time_ticks_per_second, where
+    # time_ticks_per_second = ticks_per_measure * LCM of every BPM, so every time offset is whole too.
+    # Sorting and time conversion are then plain int arithmetic; offset / time_offset give the exact
+    # Fractions back, and int / int true division rounds exactly like float(Fraction) in to_json.
+    __slots__ = ('ticks_per_measure', 'time_ticks_per_second')
+    
+    def __init__(self, ticks_per_measure=None, time_ticks_per_second=None):
+        
+        self.ticks_per_measure = ticks_per_measure
+        self.time_ticks_per_second = time_ticks_per_second
+    
+    def __repr__(self):
+        
+        return f"Timebase(ticks_per_measure={self.ticks_per_measure}, time_ticks_per_second={self.time_ticks_per_second})"
 
 class RawNote:
     
-    def __init__(self, measure, note_class, start_pos, note_property, width, scaling, note_order, long_note_id):
+    __slots__ = ('measure', 'note_class', 'start_pos', 'note_property', 'width', 'scaling', 'note_order', 'long_note_id', 'tick', 'note_description')
+    
+    def __init__(self, measure, note_class, start_pos, note_property, width, scaling, note_order, long_note_id, timebase=None):
         
         self.measure = measure
         self.note_class = note_class
@@ -20,7 +81,8 @@ class RawNote:
         self.scaling = scaling
         self.note_order = note_order
         self.long_note_id = long_note_id
-        self.offset = measure + Fraction(note_order, scaling)
+        if timebase is not None:
+            self.set_timebase(timebase)
         
         # Handle Different Note Classes
         if note_class == 1:
@@ -73,6 +135,15 @@ class RawNote:
             self.note_description = None
             assert False
     
+    @property
+    def offset(self):
+        
+        return self.measure + Fraction(self.note_order, self.scaling)
+    
+    def set_timebase(self, timebase):
+        
+        self.tick = self.measure * timebase.ticks_per_measure + self.note_order * (timebase.ticks_per_measure // self.scaling)
+    
     def __repr__(self):
 
         return f"RawNote(measure={self.measure:>3d}, " + \
@@ -82,33 +153,43 @@ class RawNote:
 
 class BaseNote:
     
-    def __init__(self, start_pos, width, offset):
+    __slots__ = ('start_pos', 'width', 'tick', 'timebase', 'time_tick')
+    
+    def __init__(self, start_pos, width, tick, timebase):
         
         self.start_pos = start_pos
         self.width = width
-        self.offset = offset
+        self.tick = tick
+        self.timebase = timebase
+    
+    @property
+    def offset(self):
+        
+        return Fraction(self.tick, self.timebase.ticks_per_measure)
+    
+    @property
+    def time_offset(self):
+        
+        return Fraction(self.time_tick, self.timebase.time_ticks_per_second)
+    
+    def get_measure_offset_float(self):
+        
+        return self.tick / self.timebase.ticks_per_measure
+    
+    def get_time_offset_float(self):
+        
+        return self.time_tick / self.timebase.time_ticks_per_second
         
     def __repr__(self):
         
         return f"BaseNote(note_range={self.start_pos:02d}-{self.start_pos+self.width-1:02d}, " + \
                f"offset={float(self.offset):>7.3f})"
-    
-    def set_time_offset(self, bpm_events):
-
-        time_offset = 0
-        for bpm_event, next_bpm_event in zip(bpm_events[:-1], bpm_events[1:]):
-            if self.offset < next_bpm_event.offset:
-                time_offset += (self.offset - bpm_event.offset) * Fraction(60, bpm_event.bpm) * 4
-                break
-            else:
-                time_offset += (next_bpm_event.offset - bpm_event.offset) * Fraction(60, bpm_event.bpm) * 4
-        else:
-            time_offset += (self.offset - bpm_events[-1].offset) * Fraction(60, bpm_events[-1].bpm) * 4
-        self.time_offset = time_offset
             
         
 class SkillNote(BaseNote):
     
+    __slots__ = ()
+    
     def __repr__(self):
         
         return f"SkillNote(offset={float(self.offset):>7.3f})"
@@ -117,15 +198,17 @@ class SkillNote(BaseNote):
         
         return {
             'type': 'skill_note',
-            'measure_offset': float(self.offset),
-            'time_offset': float(self.time_offset)
+            'measure_offset': self.get_measure_offset_float(),
+            'time_offset': self.get_time_offset_float()
         }
 
 class PrepareNote(BaseNote):
     
-    def __init__(self, start_pos, width, offset, is_start):
+    __slots__ = ('is_start',)
+    
+    def __init__(self, start_pos, width, tick, timebase, is_start):
         
-        super().__init__(start_pos, width, offset)
+        super().__init__(start_pos, width, tick, timebase)
         self.is_start = is_start
     
     def __repr__(self):
@@ -137,18 +220,21 @@ class PrepareNote(BaseNote):
         
         return {
             'type': 'prepare_note',
-            'measure_offset': float(self.offset),
-            'time_offset': float(self.time_offset),
+            'measure_offset': self.get_measure_offset_float(),
+            'time_offset': self.get_time_offset_float(),
             'is_start': self.is_start
         }
 
 class PlayableNote(BaseNote):
     
-    def __init__(self, start_pos, width, offset, is_critical=False, is_flick=False, is_long_start=False, is_long_end=False, is_long_auto=False, is_long_mid=False):
+    __slots__ = ('is_critical', 'is_flick', 'is_long_start', 'is_long_end', 'is_long_auto', 'is_long_mid', 'note_class_code', 'note_description', 'weight', 'combo_number', 'flick_direction')
+    
+    def __init__(self, start_pos, width, tick, timebase, is_critical=False, is_flick=False, is_long_start=False, is_long_end=False, is_long_auto=False, is_long_mid=False, flick_direction=None):
         
         self.start_pos = start_pos
         self.width = width
-        self.offset = offset
+        self.tick = tick
+        self.timebase = timebase
         
         self.is_critical = is_critical
         self.is_flick = is_flick
@@ -156,32 +242,33 @@ class PlayableNote(BaseNote):
         self.is_long_end = is_long_end
         self.is_long_auto = is_long_auto
         self.is_long_mid = is_long_mid
+        # A FLICK_DIRECTIONS value for flicks, None otherwise; only used to draw the arrow
+        self.flick_direction = flick_direction
         
         self.set_note_property()
+    
+    @classmethod
+    def from_note_class_code(cls, start_pos, width, tick, timebase, note_class_code, flick_direction=None):
+        
+        # The code already gives every flag, so set_note_property is skipped
+        note = cls.__new__(cls)
+        note.start_pos = start_pos
+        note.width = width
+        note.tick = tick
+        note.timebase = timebase
+        note.is_critical, note.is_flick, note.is_long_start, note.is_long_end, note.is_long_auto, note.is_long_mid = PLAYABLE_NOTE_CLASS_FLAGS[note_class_code]
+        note.flick_direction = flick_direction
+        note.note_class_code = note_class_code
+        _, note.note_description, note.weight = PLAYABLE_NOTE_CLASSES[note_class_code]
+        return note
         
     def set_note_property(self):
         
         note_property = [self.is_critical, self.is_flick, self.is_long_start, self.is_long_end, self.is_long_auto, self.is_long_mid]
         note_property_string = ''.join([str(int(p)) for p in note_property])
         
-        note_property_lookup = {
-            "000000": ("Normal", 10),
-            "100000": ("Normal Critical", 20),
-            "010000": ("Flick", 10),
-            "110000": ("Flick Critical", 30),
-            "001000": ("Long Start", 10),
-            "101000": ("Long Start Critical", 20),
-            "000100": ("Long End", 10),
-            "100100": ("Long End Critical", 20),
-            "010100": ("Long End Flick", 10),
-            "110100": ("Long End Flick Critical", 30),
-            "000010": ("Long Auto", 1),
-            "100010": ("Long Auto Critical", 1),
-            "000001": ("Long Mid", 1),
-            "100001": ("Long Mid Critical", 2)
-        }
-        
-        self.note_description, self.weight = note_property_lookup[note_property_string]
+        self.note_class_code = PLAYABLE_NOTE_CLASS_CODES[note_property_string]
+        _, self.note_description, self.weight = PLAYABLE_NOTE_CLASSES[self.note_class_code]
     
     def set_combo_number(self, combo_number):
         
@@ -201,21 +288,129 @@ class PlayableNote(BaseNote):
             'type': 'playable_note',
             'note_class': self.note_description,
             'note_range': [self.start_pos, self.start_pos+self.width-1],
-            'measure_offset': float(self.offset),
-            'time_offset': float(self.time_offset),
+            'measure_offset': self.get_measure_offset_float(),
+            'time_offset': self.get_time_offset_float(),
             'combo_num': self.combo_number
         }
 
+class Hold:
+    
+    # One long note from its start to its end, kept by convert_raw_notes
+    # Points in tick order: ticks[0] is the start, ticks[-1] the end, the ones between are Long Mid notes
+    # or Long Dummy waypoints that only shape the path. kinds[i] is 'start', 'mid', 'waypoint' or 'end',
+    # positions[i] = (start_pos, width), curves[i] a CURVE_EASES value or None, time_ticks[i] the time of ticks[i].
+    # is_critical is the flag of the start, long_note_id the .sus channel (later long notes may reuse it)
+    __slots__ = ('long_note_id', 'is_critical', 'ticks', 'kinds', 'positions', 'curves', 'timebase', 'time_ticks')
+    
+    def __init__(self, long_note_id, is_critical, tick, start_pos, width, timebase, curve=None):
+        
+        self.long_note_id = long_note_id
+        self.is_critical = is_critical
+        self.ticks = [tick]
+        self.kinds = ['start']
+        self.positions = [(start_pos, width)]
+        self.curves = [curve]
+        self.timebase = timebase
+        self.time_ticks = None
+    
+    def add_point(self, tick, start_pos, width, kind, curve=None):
+        
+        self.ticks.append(tick)
+        self.kinds.append(kind)
+        self.positions.append((start_pos, width))
+        self.curves.append(curve)
+    
+    @property
+    def start_tick(self):
+        
+        return self.ticks[0]
+    
+    @property
+    def end_tick(self):
+        
+        return self.ticks[-1]
+    
+    @property
+    def mid_ticks(self):
+        
+        return [tick for tick, kind in zip(self.ticks, self.kinds) if kind == 'mid']
+    
+    @property
+    def start_time_tick(self):
+        
+        return self.time_ticks[0]
+    
+    @property
+    def end_time_tick(self):
+        
+        return self.time_ticks[-1]
+    
+    @property
+    def lane_range(self):
+        
+        # (leftmost start_pos, rightmost end_pos) the hold touches
+        return min(start_pos for start_pos, _ in self.positions), max(start_pos + width - 1 for start_pos, width in self.positions)
+    
+    def get_long_auto_ticks(self):
+        
+        # Every long auto step strictly after the start and before the end
+        long_auto_step = self.timebase.ticks_per_measure // LONG_AUTO_NOTES_PER_MEASURE
+        return range((self.start_tick // long_auto_step + 1) * long_auto_step, self.end_tick, long_auto_step)
+    
+    @property
+    def long_auto_count(self):
+        
+        # Closed form of len(get_long_auto_ticks())
+        long_auto_step = self.timebase.ticks_per_measure // LONG_AUTO_NOTES_PER_MEASURE
+        return max(0, (self.end_tick - 1) // long_auto_step - self.start_tick // long_auto_step)
+    
+    def __repr__(self):
+        
+        start_pos, end_pos = self.lane_range
+        return f"Hold(long_note_id={self.long_note_id}, note_range={start_pos:02d}-{end_pos:02d}, " + \
+               f"offset={self.start_tick / self.timebase.ticks_per_measure:>7.3f}-{self.end_tick / self.timebase.ticks_per_measure:>7.3f}, " + \
+               f"mids={self.kinds.count('mid')}, is_critical={self.is_critical})"
+    
+    def to_json(self):
+        
+        return {
+            'type': 'hold',
+            'is_critical': self.is_critical,
+            'kinds': self.kinds,
+            'measure_offsets': [tick / self.timebase.ticks_per_measure for tick in self.ticks],
+            'time_offsets': [time_tick / self.timebase.time_ticks_per_second for time_tick in self.time_ticks],
+            'note_ranges': [[start_pos, start_pos + width - 1] for start_pos, width in self.positions],
+            'curves': self.curves
+        }
+
 class BPMChangeEvent:
     
-    def __init__(self, measure, scaling, event_order, bpm_key):
+    __slots__ = ('measure', 'scaling', 'event_order', 'bpm_key', 'bpm', 'tick', 'timebase', 'time_tick')
+    
+    def __init__(self, measure, scaling, event_order, bpm_key, timebase=None):
         
         self.measure = measure
         self.scaling = scaling
         self.event_order = event_order
-        self.offset = measure + Fraction(event_order, scaling)
         self.bpm_key = bpm_key
         self.bpm = None
+        if timebase is not None:
+            self.set_timebase(timebase)
+    
+    @property
+    def offset(self):
+        
+        return self.measure + Fraction(self.event_order, self.scaling)
+    
+    @property
+    def time_offset(self):
+        
+        return Fraction(self.time_tick, self.timebase.time_ticks_per_second)
+    
+    def set_timebase(self, timebase):
+        
+        self.timebase = timebase
+        self.tick = self.measure * timebase.ticks_per_measure + self.event_order * (timebase.ticks_per_measure // self.scaling)
     
     def __repr__(self):
         
@@ -236,38 +431,212 @@ class BPMChangeEvent:
         
         return {
             'type': 'bpm_change_event',
-            'measure_offset': float(self.offset),
+            'measure_offset': self.tick / self.timebase.ticks_per_measure,
             'bpm': self.bpm
         }
 
+class NoteColumns:
+    
+    # Columnar copy of one of a Score's note lists, one typed array per field.
+    # Indexing or iterating rebuilds note objects on the fly, so code written
+    # against the plain lists keeps working after Score.compact().
+    __slots__ = ('note_type', 'score', 'ticks', 'is_sorted', 'start_positions', 'widths', 'note_class_codes', 'combo_numbers', 'flick_directions')
+    
+    def __init__(self, note_type, notes, score):
+        
+        self.note_type = note_type
+        # Time ticks are recomputed from the score's BPM segment table, they may not fit in 64 bits
+        self.score = score
+        self.set_notes(notes)
+    
+    def set_notes(self, notes):
+        
+        self.ticks = array('q', [note.tick for note in notes])
+        # Sorted ticks are turned into time ticks in one pass when iterating
+        self.is_sorted = all(self.ticks[i] <= self.ticks[i+1] for i in range(len(self.ticks) - 1))
+        self.start_positions = array('B', [note.start_pos for note in notes])
+        self.widths = array('B', [note.width for note in notes])
+        if self.note_type is PlayableNote:
+            self.note_class_codes = array('B', [note.note_class_code for note in notes])
+            self.combo_numbers = array('l', [note.combo_number for note in notes])
+            self.flick_directions = array('B', [FLICK_DIRECTION_CODES.index(note.flick_direction) for note in notes])
+        elif self.note_type is PrepareNote:
+            self.note_class_codes = array('B', [note.is_start for note in notes])
+            self.combo_numbers = array('l')
+            self.flick_directions = array('B')
+        else:
+            self.note_class_codes = array('B')
+            self.combo_numbers = array('l')
+            self.flick_directions = array('B')
+    
+    def get_note(self, i, time_tick=None):
+        
+        timebase = self.score.timebase
+        tick = self.ticks[i]
+        if self.note_type is PlayableNote:
+            note = PlayableNote.from_note_class_code(self.start_positions[i], self.widths[i], tick, timebase, self.note_class_codes[i],
+                                                     FLICK_DIRECTION_CODES[self.flick_directions[i]])
+            note.combo_number = self.combo_numbers[i]
+        elif self.note_type is PrepareNote:
+            note = PrepareNote(self.start_positions[i], self.widths[i], tick, timebase, is_start=bool(self.note_class_codes[i]))
+        else:
+            note = self.note_type(self.start_positions[i], self.widths[i], tick, timebase)
+        note.time_tick = self.score.tick_to_time_tick(tick) if time_tick is None else time_tick
+        return note
+    
+    def get_time_ticks(self):
+        
+        # Time tick of every note, without building the notes
+        if self.is_sorted:
+            return self.score.ticks_to_time_ticks(self.ticks)
+        return [self.score.tick_to_time_tick(tick) for tick in self.ticks]
+    
+    def sort(self, key=None, reverse=False):
+        
+        self.set_notes(sorted(self, key=key, reverse=reverse))
+    
+    def __len__(self):
+        
+        return len(self.ticks)
+    
+    def __getitem__(self, i):
+        
+        if isinstance(i, slice):
+            return [self.get_note(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('note index out of range')
+        return self.get_note(i)
+    
+    def __iter__(self):
+        
+        if not self.is_sorted:
+            for i in range(len(self)):
+                yield self.get_note(i)
+            return
+        for i, time_tick in enumerate(self.score.ticks_to_time_ticks(self.ticks)):
+            yield self.get_note(i, time_tick)
+    
+    def __repr__(self):
+        
+        return f"NoteColumns(note_type={self.note_type.__name__}, notes={len(self)})"
+
 class Score(object):
     
-    def __init__(self, filename, music_id, music_difficulty, play_level, note_count):
+    # Pipeline stages in order. Each stage runs once, the first time something needs it:
+    #   parse_lines          -> bpm_lookup_table, raw_notes, raw_notes_pool
+    #   convert_bpm_events   -> bpm_events, bpm_segment_* (tick_to_time_tick, measure_to_seconds)
+    #   convert_raw_notes    -> playable_note_count
+    #   assign_combo_numbers
+    #   assign_time_offsets  -> playable_notes, skill_notes, prepare_notes, holds
+    STAGES = ['parse_lines', 'convert_bpm_events', 'convert_raw_notes', 'assign_combo_numbers', 'assign_time_offsets']
+    
+    def __init__(self, filename, music_id, music_difficulty, play_level, note_count, lazy=True, profile=False, content=None):
         
         self.filename = filename
+        # .sus content (str or bytes) already in memory, parsed instead of reading filename
+        self.content = content
         self.music_id = music_id
         self.music_difficulty = music_difficulty
         self.play_level = play_level
         self.note_count = note_count
+        # Stage timings and object counts, see util_profile
+        self.profile = ScoreProfile() if profile else None
         
-        self.bpm_lookup_table = {}
-        self.bpm_events = []
+        self.reset_stages()
+        if not lazy:
+            self.run_stages()
         
-        self.raw_notes = []
-        self.raw_notes_pool = set()
+        # assert len(self.playable_notes) == note_count
+    
+    def reset_stages(self):
         
-        self.playable_notes = []
-        self.skill_notes = []
-        self.prepare_notes = []
+        self.completed_stages = set()
         
-        self.parse_lines()
-        self.convert_bpm_events()
-        self.convert_raw_notes()
+        # Filled in by parse_lines (ticks_per_measure) and convert_bpm_events (time_ticks_per_second)
+        self.timebase = Timebase()
         
-        self.assign_combo_numbers()
-        self.assign_time_offsets()
+        self._bpm_lookup_table = {}
+        self._bpm_events = []
+        self.bpm_segment_ticks = []
+        self.bpm_segment_time_ticks = []
+        self.bpm_segment_time_ticks_per_tick = []
         
-        # assert len(self.playable_notes) == note_count
+        self._raw_notes = []
+        self._raw_notes_pool = set()
+        
+        self._playable_notes = []
+        self._skill_notes = []
+        self._prepare_notes = []
+        self._holds = []
+    
+    def run_stages(self, until=None):
+        
+        # Run every stage up to and including until (the whole pipeline by default) that has not run yet
+        stages = self.STAGES if until is None else self.STAGES[:self.STAGES.index(until)+1]
+        for stage in stages:
+            if stage not in self.completed_stages:
+                if self.profile is None:
+                    getattr(self, stage)()
+                else:
+                    self.profile.run_stage(self, stage)
+        return self
+    
+    @property
+    def bpm_lookup_table(self):
+        
+        self.run_stages('parse_lines')
+        return self._bpm_lookup_table
+    
+    @property
+    def raw_notes(self):
+        
+        self.run_stages('parse_lines')
+        return self._raw_notes
+    
+    @property
+    def raw_notes_pool(self):
+        
+        self.run_stages('parse_lines')
+        return self._raw_notes_pool
+    
+    @property
+    def bpm_events(self):
+        
+        self.run_stages('convert_bpm_events')
+        return self._bpm_events
+    
+    @property
+    def playable_note_count(self):
+        
+        # Only needs the notes converted, not their combo numbers or time offsets
+        self.run_stages('convert_raw_notes')
+        return len(self._playable_notes)
+    
+    @property
+    def playable_notes(self):
+        
+        self.run_stages()
+        return self._playable_notes
+    
+    @property
+    def skill_notes(self):
+        
+        self.run_stages()
+        return self._skill_notes
+    
+    @property
+    def prepare_notes(self):
+        
+        self.run_stages()
+        return self._prepare_notes
+    
+    @property
+    def holds(self):
+        
+        self.run_stages('assign_time_offsets')
+        return self._holds
     
     def parse_objects(self, line):
         result = re.match('#([0-9a-f]{5,6}):\ *([0-9a-f]*)$', line)
@@ -277,14 +646,41 @@ class Score(object):
         result = re.match('#BPM([0-9a-f]*):\ ([0-9]*)$', line)
         return result
     
+    def set_ticks_per_measure(self, scalings):
+        
+        # Eighth notes are needed for long auto notes even if no line of the chart uses them
+        self.timebase.ticks_per_measure = math.lcm(8, *scalings)
+    
+    def read_text(self):
+        
+        # content is only held until it is parsed, so cached and pickled Scores do not carry the .sus text;
+        # parsing again after reset_stages reads filename
+        text = read_sus(self.filename) if self.content is None else decode_sus(self.content)
+        self.content = None
+        return text
+    
     def parse_lines(self):
         
-        with open(self.filename, 'r', encoding='utf-8') as f:
+        raw_note_tuples, bpm_event_tuples, self._bpm_lookup_table = tokenize_sus(self.read_text())
+        self.set_ticks_per_measure({t[5] for t in raw_note_tuples} | {t[1] for t in bpm_event_tuples})
+        self._raw_notes_pool = set(raw_note_tuples)
+        self._raw_notes = [RawNote(*raw_note_tuple, self.timebase) for raw_note_tuple in raw_note_tuples]
+        self._bpm_events = [BPMChangeEvent(*bpm_event_tuple, self.timebase) for bpm_event_tuple in bpm_event_tuples]
+        self.completed_stages.add('parse_lines')
+    
+    def parse_lines_reference(self):
+        
+        # Line by line regex parser that util_tokenizer replaced, kept to check it against
+        with io.StringIO(self.read_text()) as f:
             for line in f:
                 if result := self.parse_objects(line):
                     self.add_parsed_objects(result.group(1), result.group(2))
                 elif result := self.parse_bpm(line):
                     self.add_parsed_bpms(result.group(1), result.group(2))
+        self.set_ticks_per_measure({note.scaling for note in self._raw_notes} | {event.scaling for event in self._bpm_events})
+        for note in self._raw_notes + self._bpm_events:
+            note.set_timebase(self.timebase)
+        self.completed_stages.add('parse_lines')
         
     
     def add_parsed_objects(self, group_1, group_2):
@@ -324,7 +720,7 @@ class Score(object):
             elif note_class == 0 and start_pos == 8:
                 # bpm change events
                 if group_2[i*2:i*2+2] != '00':
-                    self.bpm_events.append(BPMChangeEvent(**{
+                    self._bpm_events.append(BPMChangeEvent(**{
                         'measure': measure,
                         'scaling': note_scaling,
                         'event_order': i,
@@ -339,12 +735,12 @@ class Score(object):
                     continue
                 
                 note_pool_key = (measure, note_class, start_pos, note_property, note_width, note_scaling, i, long_note_id)
-                if note_pool_key in self.raw_notes_pool:
+                if note_pool_key in self._raw_notes_pool:
                     continue
                 else:
-                    self.raw_notes_pool.add(note_pool_key)
+                    self._raw_notes_pool.add(note_pool_key)
                 
-                self.raw_notes.append(RawNote(**{
+                self._raw_notes.append(RawNote(**{
                     'measure': measure,
                     'note_class': note_class,
                     'start_pos': start_pos,
@@ -358,75 +754,86 @@ class Score(object):
         
     def add_parsed_bpms(self, group_1, group_2):
         
-        self.bpm_lookup_table[group_1] = int(group_2)
+        self._bpm_lookup_table[group_1] = int(group_2)
         
     def convert_bpm_events(self):
         
         # Use BPM lookup table to convert BPM change events
-        self.bpm_events.sort(key=lambda x: x.offset)
-        for event in self.bpm_events:
-            event.update_bpm_value(self.bpm_lookup_table)
+        self._bpm_events.sort(key=attrgetter('tick'))
+        for event in self._bpm_events:
+            event.update_bpm_value(self._bpm_lookup_table)
+        self.timebase.time_ticks_per_second = self.timebase.ticks_per_measure * math.lcm(*[event.bpm for event in self._bpm_events])
+        self.build_bpm_segments()
+        self.completed_stages.add('convert_bpm_events')
     
-    def convert_raw_notes(self):
+    def iter_note_groups(self):
         
         # Sort by offset and position
-        self.raw_notes.sort(key=lambda x: (x.offset, x.start_pos))
+        self._raw_notes.sort(key=lambda x: (x.tick, x.start_pos))
         
-        # Collect notes with same position and offset together
+        # Collect notes with same position and offset together, sweeping the sorted notes once
         # Additionally, merge notes like (start=2, end=3) and (start=1, end=4) together
         # (i.e. one note is covered by another note fully)
-
-        # Merge all the position pairs
-        time_to_known_positions = defaultdict(set)
-        for raw_note in self.raw_notes:
-            time_to_known_positions[raw_note.offset].add((raw_note.start_pos, raw_note.width))
-        
-        covered_by = dict()
-        for time_offset, positions in time_to_known_positions.items():
+        # Yields ((tick, start_pos, width), notes) in order of first appearance
+        for tick, notes in groupby(self._raw_notes, key=attrgetter('tick')):
+            notes = list(notes)
+            
             # sort with start pos and then end pos (left start first, right end first)
-            positions = sorted(positions, key=lambda x: (x[0], -(x[0]+x[1])))
+            positions = sorted({(note.start_pos, note.width) for note in notes}, key=lambda x: (x[0], -(x[0]+x[1])))
             valid_positions = []
+            # valid_end_maxima[i] = rightmost end among valid_positions[:i+1], so it never decreases
+            valid_end_maxima = []
+            covered_by = {}
             for start_pos, width in positions:
-                # if new range is covered by existed notes, ignore
-                for valid_start_pos, valid_width in valid_positions:
-                    if start_pos >= valid_start_pos and \
-                       start_pos + width <= valid_start_pos + valid_width:
-                        # record the note is covered by what note
-                        covered_by[(time_offset, start_pos, width)] = (time_offset, valid_start_pos, valid_width)
-                        break
+                # Every valid range starts at or before start_pos, so the first one that reaches
+                # start_pos + width covers the new range
+                i = bisect_left(valid_end_maxima, start_pos + width)
+                if i < len(valid_positions):
+                    # record the note is covered by what note
+                    covered_by[(start_pos, width)] = valid_positions[i]
                 else: # append if not covered
                     valid_positions.append((start_pos, width))
+                    valid_end_maxima.append(start_pos + width)
                     # record the note is covered by itself
-                    covered_by[(time_offset, start_pos, width)] = (time_offset, start_pos, width)
-
-        time_position_to_notes = OrderedDict()
-        for raw_note in self.raw_notes:
-            time_position = (raw_note.offset, raw_note.start_pos, raw_note.width)
-            time_position = covered_by[time_position]
-            if time_position not in time_position_to_notes:
-                time_position_to_notes[time_position] = [raw_note]
-            else:
-                time_position_to_notes[time_position].append(raw_note)
-                
-        # Debugging
-#         self.time_position_to_notes = time_position_to_notes
-
+                    covered_by[(start_pos, width)] = (start_pos, width)
+            
+            position_to_notes = {}
+            for note in notes:
+                position = covered_by[(note.start_pos, note.width)]
+                if position not in position_to_notes:
+                    position_to_notes[position] = [note]
+                else:
+                    position_to_notes[position].append(note)
+            
+            for (start_pos, width), position_notes in position_to_notes.items():
+                yield (tick, start_pos, width), position_notes
+    
+    def convert_raw_notes(self):
+        
         # Aggregate Several Notes with Same Position and Offset
         holding_period_status = {}
-        for (offset, start_pos, width), notes in time_position_to_notes.items():
+        timebase = self.timebase
+        for (tick, start_pos, width), notes in self.iter_note_groups():
             has_normal, is_critical, is_flick, is_long_start, is_long_end, is_long_auto, is_long_mid = [False] * 7
             long_note_id = None
+            # Only used for the shape of hold paths
+            curve = next((CURVE_EASES[note.note_description] for note in notes if note.note_description in CURVE_EASES), None)
+            # The last flick put exactly on the note, else the first one on a range it covers
+            flick_notes = [note for note in notes if note.note_description in FLICK_DIRECTIONS]
+            exact_flick_notes = [note for note in flick_notes if (note.start_pos, note.width) == (start_pos, width)]
+            flick_notes = exact_flick_notes[-1:] or flick_notes[:1]
+            flick_direction = FLICK_DIRECTIONS[flick_notes[0].note_description] if flick_notes else None
             for note in notes:
                 if note.note_description == 'Skill':
-                    self.skill_notes.append(SkillNote(start_pos=start_pos, width=width, offset=offset))
+                    self._skill_notes.append(SkillNote(start_pos=start_pos, width=width, tick=tick, timebase=timebase))
                     assert len(notes) == 1
                     break
                 elif note.note_description == 'Prepare Start':
-                    self.prepare_notes.append(PrepareNote(start_pos=start_pos, width=width, offset=offset, is_start=True))
+                    self._prepare_notes.append(PrepareNote(start_pos=start_pos, width=width, tick=tick, timebase=timebase, is_start=True))
                     assert len(notes) == 1
                     break
                 elif note.note_description == 'Prepare End':
-                    self.prepare_notes.append(PrepareNote(start_pos=start_pos, width=width, offset=offset, is_start=False))
+                    self._prepare_notes.append(PrepareNote(start_pos=start_pos, width=width, tick=tick, timebase=timebase, is_start=False))
                     assert len(notes) == 1
                     break
                 elif note.note_description == 'Long Start':
@@ -440,11 +847,13 @@ class Score(object):
                 elif note.note_description == 'Long Mid':
                     is_long_mid = True
                     long_note_id = note.long_note_id
-                elif note.note_description in ['Left Flick', 'Right Flick', 'Up Flick']:
+                elif note.note_description in FLICK_DIRECTIONS:
                     is_flick = True
                 elif note.note_description in ['Long Dummy']:
                     # Long Dummy : Note to fix the shape of long note
                     # It needs a fake normal note.
+                    if note.long_note_id in holding_period_status:
+                        holding_period_status[note.long_note_id].add_point(tick, start_pos, width, 'waypoint', curve)
                     break
                 elif note.note_description in ['Flick Dummy', 'Left Curve', 'Down Curve', 'Right Curve']:
                     # Flick Dummy : Base note to put flicks on it. (Air note in Chunithm cannot be put alone)
@@ -459,26 +868,25 @@ class Score(object):
                     
                 # If a long start is critical, it will make the notes during the holding period all critical
                 if is_long_start:
-                    # Save offset and is_critical of long_start
+                    # Save the hold, with tick and is_critical of long_start
                     assert long_note_id is not None
-                    holding_period_status[long_note_id] = (offset, is_critical)
+                    holding_period_status[long_note_id] = Hold(long_note_id, is_critical, tick, start_pos, width, timebase, curve)
 
                 elif is_long_end:
                     # Use is_critical of corresponding long_start
                     assert long_note_id is not None
-                    start_offset, start_is_critical = holding_period_status[long_note_id]
-                    is_critical = is_critical or start_is_critical
-                    end_offset = offset
+                    hold = holding_period_status.pop(long_note_id)
+                    hold.add_point(tick, start_pos, width, 'end')
+                    is_critical = is_critical or hold.is_critical
                     
-                    # Add long_auto eighth note
-                    # First long_auto offset
-                    long_auto_offset = Fraction(math.floor(start_offset * 8) + 1, 8)
-                    while long_auto_offset < end_offset:
-                        self.playable_notes.append(
+                    # Add long_auto eighth notes
+                    for long_auto_tick in hold.get_long_auto_ticks():
+                        self._playable_notes.append(
                             PlayableNote(
                                 start_pos=0, 
                                 width=1, 
-                                offset=long_auto_offset, 
+                                tick=long_auto_tick, 
+                                timebase=timebase, 
                                 is_critical=is_critical, 
                                 is_flick=False, 
                                 is_long_start=False,
@@ -487,41 +895,120 @@ class Score(object):
                                 is_long_mid=False
                             )
                         )
-                        # Next long_auto offset
-                        long_auto_offset += Fraction(1, 8)
-                    del holding_period_status[long_note_id]
+                    self._holds.append(hold)
 
                 elif is_long_mid:
                     # Use is_critical of corresponding long_start
                     assert long_note_id is not None
-                    _, is_critical = holding_period_status[long_note_id]
+                    hold = holding_period_status[long_note_id]
+                    hold.add_point(tick, start_pos, width, 'mid', curve)
+                    is_critical = hold.is_critical
 
-                self.playable_notes.append(
+                self._playable_notes.append(
                     PlayableNote(
                         start_pos=start_pos, 
                         width=width, 
-                        offset=offset, 
+                        tick=tick, 
+                        timebase=timebase, 
                         is_critical=is_critical, 
                         is_flick=is_flick, 
                         is_long_start=is_long_start, 
                         is_long_end=is_long_end, 
                         is_long_auto=is_long_auto, 
-                        is_long_mid=is_long_mid
+                        is_long_mid=is_long_mid,
+                        flick_direction=flick_direction
                     )
                 )
+        if self.profile is not None:
+            self.profile.count('long_auto_notes', sum(note.is_long_auto for note in self._playable_notes))
+        self.completed_stages.add('convert_raw_notes')
         
     def assign_combo_numbers(self):
         
-        self.playable_notes.sort(key=lambda x: (x.offset, x.weight, x.start_pos))
-        for combo_num, playable_note in enumerate(self.playable_notes, 1):
+        self._playable_notes.sort(key=lambda x: (x.tick, x.weight, x.start_pos))
+        for combo_num, playable_note in enumerate(self._playable_notes, 1):
             playable_note.set_combo_number(combo_num)
+        self.completed_stages.add('assign_combo_numbers')
             
+    def build_bpm_segments(self):
+        
+        # Segment i starts at bpm_events[i] and lasts until bpm_events[i+1], which are sorted by tick
+        # bpm_segment_time_ticks[i] is the time at which segment i starts
+        # A measure lasts 240 / bpm seconds, i.e. 240 * lcm(bpms) / bpm time ticks per tick
+        bpm_lcm = self.timebase.time_ticks_per_second // self.timebase.ticks_per_measure
+        self.bpm_segment_ticks = [bpm_event.tick for bpm_event in self._bpm_events]
+        self.bpm_segment_time_ticks_per_tick = [240 * bpm_lcm // bpm_event.bpm for bpm_event in self._bpm_events]
+        self.bpm_segment_time_ticks = [0] * len(self._bpm_events)
+        for i in range(1, len(self._bpm_events)):
+            self.bpm_segment_time_ticks[i] = self.bpm_segment_time_ticks[i-1] + \
+                (self.bpm_segment_ticks[i] - self.bpm_segment_ticks[i-1]) * self.bpm_segment_time_ticks_per_tick[i-1]
+        for bpm_event, time_tick in zip(self._bpm_events, self.bpm_segment_time_ticks):
+            bpm_event.time_tick = time_tick
+    
+    def tick_to_time_tick(self, tick):
+        
+        # Ticks before the first BPM event are extrapolated with the first segment
+        self.run_stages('convert_bpm_events')
+        i = max(0, bisect_right(self.bpm_segment_ticks, tick) - 1)
+        return self.bpm_segment_time_ticks[i] + (tick - self.bpm_segment_ticks[i]) * self.bpm_segment_time_ticks_per_tick[i]
+    
+    def ticks_to_time_ticks(self, ticks):
+        
+        # ticks must be sorted, the segment pointer only moves forward
+        self.run_stages('convert_bpm_events')
+        time_ticks = []
+        i = 0
+        last_segment = len(self.bpm_segment_ticks) - 1
+        for tick in ticks:
+            while i < last_segment and self.bpm_segment_ticks[i+1] <= tick:
+                i += 1
+            time_ticks.append(self.bpm_segment_time_ticks[i] + (tick - self.bpm_segment_ticks[i]) * self.bpm_segment_time_ticks_per_tick[i])
+        return time_ticks
+    
+    def measure_to_seconds(self, offset):
+        
+        # Exact Fraction wrapper of tick_to_time_tick, offset may fall between ticks
+        self.run_stages('convert_bpm_events')
+        timebase = self.timebase
+        i = max(0, bisect_right(self.bpm_segment_ticks, offset * timebase.ticks_per_measure) - 1)
+        time_tick = self.bpm_segment_time_ticks[i] + \
+            (offset * timebase.ticks_per_measure - self.bpm_segment_ticks[i]) * self.bpm_segment_time_ticks_per_tick[i]
+        return Fraction(time_tick, timebase.time_ticks_per_second)
+    
+    def measures_to_seconds(self, offsets):
+        
+        # offsets must be sorted, see ticks_to_time_ticks
+        self.run_stages('convert_bpm_events')
+        timebase = self.timebase
+        ticks = [offset * timebase.ticks_per_measure for offset in offsets]
+        return [Fraction(time_tick, timebase.time_ticks_per_second) for time_tick in self.ticks_to_time_ticks(ticks)]
+    
     def assign_time_offsets(self):
         
-        self.bpm_events.sort(key=lambda x: x.offset)
-        for note in self.playable_notes + self.skill_notes + self.prepare_notes:
-            note.set_time_offset(self.bpm_events)
+        notes = sorted(self._playable_notes + self._skill_notes + self._prepare_notes, key=attrgetter('tick'))
+        for note, time_tick in zip(notes, self.ticks_to_time_ticks([note.tick for note in notes])):
+            note.time_tick = time_tick
+        for hold in self._holds:
+            hold.time_ticks = [self.tick_to_time_tick(tick) for tick in hold.ticks]
+        self.completed_stages.add('assign_time_offsets')
             
+    def drop_parse_intermediates(self):
+        
+        # raw_notes and raw_notes_pool are only needed until the notes are converted
+        self.run_stages()
+        self._raw_notes = []
+        self._raw_notes_pool = set()
+        return self
+    
+    def compact(self):
+        
+        # Replace the note lists with NoteColumns and drop the parsing intermediates
+        self.drop_parse_intermediates()
+        self._playable_notes = NoteColumns(PlayableNote, self._playable_notes, self)
+        self._skill_notes = NoteColumns(SkillNote, self._skill_notes, self)
+        self._prepare_notes = NoteColumns(PrepareNote, self._prepare_notes, self)
+        return self
+    
     def get_solo_base_scores(self):
         
         weight_sum = sum(note.weight for note in self.playable_notes)
@@ -538,18 +1025,51 @@ class Score(object):
         weight_sum = sum(note.weight for note in self.playable_notes)
         play_level_multiplier = Fraction(max(0, self.play_level - 5) + 200, 200)
         
-        self.skill_notes.sort(key=lambda x: x.offset)
+        self.skill_notes.sort(key=attrgetter('tick'))
         scores_coverages = []
         for skill_time, skill_note in zip(skill_times, self.skill_notes):
+            # if skill_note.time_offset = 10, skill_time = 5 => cover notes in [10, 15)
+            # time ticks are whole, so note.time_tick < start + skill_time * D  <=>  note.time_tick < start + ceil(skill_time * D)
+            window_start = skill_note.time_tick
+            window_end = window_start + math.ceil(Fraction(skill_time) * self.timebase.time_ticks_per_second)
             scores_coverage = 0
             for note in self.playable_notes:
-                # if skill_note.time_offset = 10, skill_time = 5 => cover notes in [10, 15)
-                if skill_note.time_offset <= note.time_offset < skill_note.time_offset + skill_time:
+                if window_start <= note.time_tick < window_end:
                     scores_coverage += note.weight * Fraction(min(10, math.floor((note.combo_number - 1) / 100)) + 100, 100)
             scores_coverages.append(scores_coverage / weight_sum * play_level_multiplier)
                     
         return scores_coverages
     
+    def get_score_arrays(self):
+        
+        # Array-backed view for repeated skill window queries, needs numpy
+        from util_array import ScoreArrays
+        return ScoreArrays(self)
+    
+    def get_hold_index(self):
+        
+        # Stabbing / overlap queries over the holds, see util_hold
+        from util_hold import HoldIndex
+        return HoldIndex(self.holds)
+    
+    def get_event_stream(self, start_seconds=0):
+        
+        # Every note and BPM change lazily merged into one time-ordered stream, see util_stream
+        from util_stream import ScoreEventStream
+        return ScoreEventStream(self, start_seconds)
+    
+    def get_render_layout(self, pixels_per_beat=None):
+        
+        # Tiles of note sprites, hold paths and markers for the image renderer, see util_layout
+        from util_layout import get_render_layout
+        return get_render_layout(self, pixels_per_beat)
+    
+    def get_scoring_engine(self):
+        
+        # Exact scores of every live mode from shared aggregates, see util_scoring
+        from util_scoring import ScoringEngine
+        return ScoringEngine(self)
+    
     def to_json(self):
         
         playable_note_json_strs = [playable_note.to_json() for playable_note in self.playable_notes]
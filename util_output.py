@@ -0,0 +1,86 @@
+import json
+
+
+class NDJSONWriter:
+
+    # Writes one compact Score.to_json() record per line as soon as it is given, and on close
+    # an index of [music_id, music_difficulty, byte offset, byte length] for every record
+    def __init__(self, filename, index_filename=None):
+
+        self.filename = filename
+        self.index_filename = index_filename if index_filename is not None else f'{filename}.index.json'
+        self.index = []
+        self.f = open(filename, 'wb')
+
+    def write(self, score_json):
+
+        line = json.dumps(score_json, separators=(',', ':')).encode('utf-8') + b'\n'
+        self.index.append([score_json['music_id'], score_json['music_difficulty'], self.f.tell(), len(line)])
+        self.f.write(line)
+
+    def close(self):
+
+        self.f.close()
+        with open(self.index_filename, 'w') as f:
+            json.dump(self.index, f, separators=(',', ':'))
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+
+class PrettyJSONWriter:
+
+    # Streams the same indented list that json.dump(score_jsons, f, indent=4) produces
+    def __init__(self, filename, indent=4):
+
+        self.filename = filename
+        self.indent = indent
+        self.count = 0
+        self.f = open(filename, 'w+')
+
+    def write(self, score_json):
+
+        lines = json.dumps(score_json, indent=self.indent).split('\n')
+        self.f.write((',\n' if self.count else '[\n') + '\n'.join(' ' * self.indent + line for line in lines))
+        self.count += 1
+
+    def close(self):
+
+        self.f.write('\n]' if self.count else '[]')
+        self.f.close()
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *exc_info):
+
+        self.close()
+
+
+def load_ndjson_index(index_filename):
+
+    # (music_id, music_difficulty) -> (byte offset, byte length)
+    with open(index_filename, 'r') as f:
+        return {(music_id, music_difficulty): (offset, length) for music_id, music_difficulty, offset, length in json.load(f)}
+
+
+def read_ndjson_record(filename, index, music_id, music_difficulty):
+
+    # Reads a single chart without parsing the rest of the file
+    offset, length = index[(music_id, music_difficulty)]
+    with open(filename, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+
+def iter_ndjson_records(filename):
+
+    with open(filename, 'rb') as f:
+        for line in f:
+            yield json.loads(line)
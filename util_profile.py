@@ -0,0 +1,133 @@
+import os
+import time
+
+# Per-stage instrumentation of Score, only active for a Score built with profile=True.
+# Score.run_stages hands each stage to ScoreProfile.run_stage instead of calling it,
+# so a Score without a profile pays one attribute check per stage and nothing else.
+
+# stage -> number of objects the stage leaves behind
+STAGE_OBJECT_COUNTERS = {
+    'parse_lines': lambda score: len(score._raw_notes) + len(score._bpm_events),
+    'convert_bpm_events': lambda score: len(score._bpm_events),
+    'convert_raw_notes': lambda score: len(score._playable_notes) + len(score._skill_notes) + len(score._prepare_notes),
+    'assign_combo_numbers': lambda score: len(score._playable_notes),
+    'assign_time_offsets': lambda score: len(score._playable_notes) + len(score._skill_notes) + len(score._prepare_notes)
+}
+
+# Called as hook(score, stage, seconds, objects) after every profiled stage, in the process that ran it
+profile_hooks = []
+
+
+def add_profile_hook(hook):
+
+    profile_hooks.append(hook)
+
+
+def remove_profile_hook(hook):
+
+    profile_hooks.remove(hook)
+
+
+class ScoreProfile:
+
+    # stages: stage -> {'seconds', 'calls', 'objects'}, in the order the stages ran
+    # counters: name -> count, e.g. long_auto_notes made by convert_raw_notes
+    def __init__(self):
+
+        self.stages = {}
+        self.counters = {}
+
+    def run_stage(self, score, stage):
+
+        start_time = time.perf_counter()
+        getattr(score, stage)()
+        seconds = time.perf_counter() - start_time
+
+        objects = STAGE_OBJECT_COUNTERS[stage](score) if stage in STAGE_OBJECT_COUNTERS else 0
+        if stage not in self.stages:
+            self.stages[stage] = {'seconds': 0.0, 'calls': 0, 'objects': 0}
+        self.stages[stage]['seconds'] += seconds
+        self.stages[stage]['calls'] += 1
+        self.stages[stage]['objects'] = objects
+        for hook in profile_hooks:
+            hook(score, stage, seconds, objects)
+
+    def count(self, name, value=1):
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def seconds(self):
+
+        return sum(record['seconds'] for record in self.stages.values())
+
+    def get_breakdown(self):
+
+        # e.g. 'parse_lines 0.012s, convert_raw_notes 0.034s, ..., long_auto_notes 120'
+        return ', '.join([f'{stage} {record["seconds"]:.3f}s' for stage, record in self.stages.items()] + \
+                         [f'{name} {value}' for name, value in self.counters.items()])
+
+    def to_json(self):
+
+        return {'stages': self.stages, 'counters': self.counters}
+
+
+class PrometheusTextSink:
+
+    # Sums profiles into Prometheus text exposition format, e.g. for node_exporter's textfile collector.
+    # Feed it whole profiles with observe(profile) or register it with add_profile_hook, then write().
+    def __init__(self, filename, prefix='sekai_score'):
+
+        self.filename = filename
+        self.prefix = prefix
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.stage_objects = {}
+        self.counters = {}
+        self.charts = 0
+
+    def __call__(self, score, stage, seconds, objects):
+
+        self.add_stage(stage, seconds, 1, objects)
+
+    def add_stage(self, stage, seconds, calls, objects):
+
+        self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+        self.stage_calls[stage] = self.stage_calls.get(stage, 0) + calls
+        self.stage_objects[stage] = self.stage_objects.get(stage, 0) + objects
+
+    def observe(self, profile):
+
+        for stage, record in profile.stages.items():
+            self.add_stage(stage, record['seconds'], record['calls'], record['objects'])
+        for name, value in profile.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.charts += 1
+
+    def get_lines(self):
+
+        lines = []
+        for name, help_text, values in [
+            ('stage_seconds_total', 'Wall time spent in each Score pipeline stage', self.stage_seconds),
+            ('stage_calls_total', 'Number of times each Score pipeline stage ran', self.stage_calls),
+            ('stage_objects_total', 'Objects left behind by each Score pipeline stage', self.stage_objects)
+        ]:
+            lines.append(f'# HELP {self.prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {self.prefix}_{name} counter')
+            for stage, value in values.items():
+                lines.append(f'{self.prefix}_{name}{{stage="{stage}"}} {value}')
+        for name, value in self.counters.items():
+            lines.append(f'# TYPE {self.prefix}_{name}_total counter')
+            lines.append(f'{self.prefix}_{name}_total {value}')
+        lines.append(f'# HELP {self.prefix}_charts_total Charts whose profile was observed')
+        lines.append(f'# TYPE {self.prefix}_charts_total counter')
+        lines.append(f'{self.prefix}_charts_total {self.charts}')
+        return lines
+
+    def write(self):
+
+        # Written to a temporary file first, so a collector never reads half a file
+        temp_path = f'{self.filename}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write('\n'.join(self.get_lines()) + '\n')
+        os.replace(temp_path, self.filename)
@@ -0,0 +1,144 @@
+import math
+
+from bisect import bisect_left
+from fractions import Fraction
+from itertools import accumulate
+
+from util_object import PLAYABLE_NOTE_CLASSES
+
+
+class ScoringMode:
+
+    # How a live mode scores a chart's playable notes:
+    #   weights: note_class_code -> weight (PLAYABLE_NOTE_CLASSES order)
+    #   combo_bonus: whether +1% per 100 combo (up to +10%) applies
+    #   fever_multiplier: multiplier of notes inside the fever (prepare start to prepare end), None for no fever
+    def __init__(self, name, weights, combo_bonus=True, fever_multiplier=None):
+
+        self.name = name
+        self.weights = [Fraction(weight) for weight in weights]
+        self.combo_bonus = combo_bonus
+        self.fever_multiplier = None if fever_multiplier is None else Fraction(fever_multiplier)
+
+    def __repr__(self):
+
+        return f"ScoringMode(name={self.name}, combo_bonus={self.combo_bonus}, fever_multiplier={self.fever_multiplier})"
+
+
+SOLO_WEIGHTS = [weight for _, _, weight in PLAYABLE_NOTE_CLASSES]
+
+# name -> ScoringMode, extend with register_scoring_mode. Only solo is built in.
+# Multi live and auto live are still missing: their per-note weight tables, combo rule and fever
+# multiplier are not in this repository nor in the master db tables it reads (musics, musicDifficulties),
+# and guessed values would give wrong scores without any warning. Once the figures are known, register them:
+#   register_scoring_mode(ScoringMode('multi', multi_weights, fever_multiplier=multi_fever_multiplier))
+SCORING_MODES = {}
+
+
+def register_scoring_mode(mode):
+
+    SCORING_MODES[mode.name] = mode
+    return mode
+
+
+# Same as Score.get_solo_base_scores and Score.get_solo_skill_scores_coverages
+register_scoring_mode(ScoringMode('solo', SOLO_WEIGHTS))
+
+
+class ScoringEngine:
+
+    # Scores one chart in any ScoringMode, exactly.
+    # The per-note aggregates every mode needs (time ticks, note classes, combo bonuses, fever flags)
+    # are collected once; each mode then costs one integer prefix sum over them, built on first use,
+    # and a skill window is two bisects and a subtraction on that prefix sum.
+    def __init__(self, score):
+
+        self.music_id = score.music_id
+        self.music_difficulty = score.music_difficulty
+
+        notes = sorted(score.playable_notes, key=lambda x: x.time_tick)
+        self.time_ticks_per_second = score.timebase.time_ticks_per_second
+        self.play_level_multiplier = Fraction(max(0, score.play_level - 5) + 200, 200)
+
+        self.note_time_ticks = [note.time_tick for note in notes]
+        self.note_class_codes = [note.note_class_code for note in notes]
+        # Combo multiplier in percent minus 100
+        self.combo_bonuses = [min(10, (note.combo_number - 1) // 100) for note in notes]
+
+        # Fever from the prepare start to the prepare end, notes in [start, end)
+        prepare_notes = sorted(score.prepare_notes, key=lambda x: x.time_tick)
+        fever_starts = [note.time_tick for note in prepare_notes if note.is_start]
+        fever_ends = [note.time_tick for note in prepare_notes if not note.is_start]
+        if fever_starts and fever_ends:
+            fever_first = bisect_left(self.note_time_ticks, fever_starts[0])
+            fever_last = bisect_left(self.note_time_ticks, fever_ends[-1])
+        else:
+            fever_first = fever_last = 0
+        self.fever_flags = [fever_first <= i < fever_last for i in range(len(notes))]
+
+        self.skill_note_time_ticks = sorted(note.time_tick for note in score.skill_notes)
+
+        # mode name -> (prefix, denominator), see get_mode_table
+        self.mode_tables = {}
+
+    def get_mode(self, mode):
+
+        return SCORING_MODES[mode] if isinstance(mode, str) else mode
+
+    def get_mode_table(self, mode):
+
+        # prefix[i] * play_level_multiplier / denominator is the score of the first i notes,
+        # normalised by the mode's weight sum
+        mode = self.get_mode(mode)
+        if mode.name in self.mode_tables:
+            return self.mode_tables[mode.name]
+
+        weight_scale = math.lcm(*[weight.denominator for weight in mode.weights])
+        weights = [int(weight * weight_scale) for weight in mode.weights]
+        if mode.fever_multiplier is None:
+            fever_numerator = fever_denominator = 1
+        else:
+            fever_numerator, fever_denominator = mode.fever_multiplier.numerator, mode.fever_multiplier.denominator
+
+        prefix = [0] + list(accumulate(
+            weights[code] * (100 + combo_bonus if mode.combo_bonus else 100) * (fever_numerator if fever else fever_denominator)
+            for code, combo_bonus, fever in zip(self.note_class_codes, self.combo_bonuses, self.fever_flags)
+        ))
+        weight_sum = sum(weights[code] for code in self.note_class_codes)
+        self.mode_tables[mode.name] = (prefix, 100 * fever_denominator * weight_sum)
+        return self.mode_tables[mode.name]
+
+    def get_skill_window(self, slot, skill_time):
+
+        # Note indices [first, last) covered by the slot-th skill note lasting skill_time seconds
+        window_start = self.skill_note_time_ticks[slot]
+        window_end = window_start + math.ceil(Fraction(skill_time) * self.time_ticks_per_second)
+        first = bisect_left(self.note_time_ticks, window_start)
+        return first, bisect_left(self.note_time_ticks, window_end, first)
+
+    def get_skill_window_numerator(self, mode, slot, skill_time):
+
+        prefix, _ = self.get_mode_table(mode)
+        first, last = self.get_skill_window(slot, skill_time)
+        return prefix[last] - prefix[first]
+
+    def get_base_score(self, mode='solo'):
+
+        prefix, denominator = self.get_mode_table(mode)
+        return Fraction(prefix[-1], denominator) * self.play_level_multiplier
+
+    def get_skill_coverages(self, mode='solo', skill_times=(5, 5, 5, 5, 5, 5)):
+
+        # As in Score.get_solo_skill_scores_coverages, the k-th duration goes to the k-th skill note
+        prefix, denominator = self.get_mode_table(mode)
+        scores_coverages = []
+        for slot, skill_time in zip(range(len(self.skill_note_time_ticks)), skill_times):
+            first, last = self.get_skill_window(slot, skill_time)
+            scores_coverages.append(Fraction(prefix[last] - prefix[first], denominator) * self.play_level_multiplier)
+        return scores_coverages
+
+    def get_scores(self, modes=None, skill_times=(5, 5, 5, 5, 5, 5)):
+
+        # mode name -> (base score, skill coverages), every registered mode by default
+        modes = list(SCORING_MODES) if modes is None else modes
+        return {self.get_mode(mode).name: (self.get_base_score(mode), self.get_skill_coverages(mode, skill_times)) for mode in modes}
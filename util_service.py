@@ -0,0 +1,174 @@
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from collections import OrderedDict, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from util_batch import describe_exception
+from util_object import Score
+from util_scoring import SCORING_MODES, ScoringEngine
+
+# mtime_ns: modification time of the .sus file the Score was built from
+# size: approximate bytes held by the Score, see get_score_size
+StoreEntry = namedtuple('StoreEntry', ['mtime_ns', 'size', 'score', 'engine'])
+
+
+def get_score_size(score):
+
+    # Shallow sizes of the Score, its note lists and their notes; close enough to enforce a memory cap
+    size = sys.getsizeof(score)
+    for notes in [score.playable_notes, score.skill_notes, score.prepare_notes, score.bpm_events, score.holds]:
+        size += sys.getsizeof(notes) + sum(sys.getsizeof(note) for note in notes)
+    return size
+
+
+class ScoreStore:
+
+    # Built Scores in least recently used order, evicted once their total size passes max_bytes.
+    # Every get checks the .sus file's mtime, so an edited chart is rebuilt on its next request.
+    def __init__(self, folders, max_bytes, metadata_provider=None):
+
+        self.folders = folders
+        self.max_bytes = max_bytes
+        self.metadata_provider = metadata_provider
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'evictions': 0}
+        self.lock = threading.Lock()
+
+    def get_score_kwargs(self, music_id, music_difficulty):
+
+        score_kwargs = {
+            'filename': os.path.join(self.folders, f'{music_id:04d}', f'{music_difficulty}.sus'),
+            'music_id': music_id,
+            'music_difficulty': music_difficulty,
+            'play_level': 0,
+            'note_count': 0
+        }
+        if self.metadata_provider is not None:
+            metadata = self.metadata_provider.music_difficulties_by_key.get((music_id, music_difficulty))
+            if metadata is not None:
+                score_kwargs['play_level'] = metadata['playLevel']
+                score_kwargs['note_count'] = metadata['noteCount']
+        return score_kwargs
+
+    def get(self, music_id, music_difficulty):
+
+        # Raises FileNotFoundError if the chart has no .sus file
+        key = (music_id, music_difficulty)
+        score_kwargs = self.get_score_kwargs(music_id, music_difficulty)
+        mtime_ns = os.stat(score_kwargs['filename']).st_mtime_ns
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.mtime_ns == mtime_ns:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return entry
+
+        # Built outside the lock, so one slow chart does not hold up the others
+        score = Score(**score_kwargs).drop_parse_intermediates()
+        entry = StoreEntry(mtime_ns, get_score_size(score), score, ScoringEngine(score))
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key).size
+                self.stats['reloads'] += 1
+            else:
+                self.stats['misses'] += 1
+            self.entries[key] = entry
+            self.total_bytes += entry.size
+            # The newest entry always stays, even alone over the cap
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+                self.stats['evictions'] += 1
+        return entry
+
+    def get_stats(self):
+
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.total_bytes, max_bytes=self.max_bytes)
+
+
+class ScoreRequestHandler(BaseHTTPRequestHandler):
+
+    # GET /scores/<music_id>/<music_difficulty>                 -> Score.to_json()
+    # GET /scores/<music_id>/<music_difficulty>/coverages       -> base score and skill coverages
+    #     ?skill_times=5,5,5,5,5,5&mode=solo                       (both optional, as shown by default)
+    # GET /stats                                                -> ScoreStore counters
+    def do_GET(self):
+
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        try:
+            if parts == ['stats']:
+                self.send_json(200, self.server.store.get_stats())
+            elif len(parts) in [3, 4] and parts[0] == 'scores':
+                entry = self.server.store.get(int(parts[1]), parts[2])
+                if len(parts) == 3:
+                    self.send_json(200, entry.score.to_json())
+                elif parts[3] == 'coverages':
+                    self.send_json(200, self.get_coverages(entry, parse_qs(url.query)))
+                else:
+                    self.send_json(404, {'error': f'Unknown path {url.path}'})
+            else:
+                self.send_json(404, {'error': f'Unknown path {url.path}'})
+        except FileNotFoundError:
+            self.send_json(404, {'error': f'No chart for {url.path}'})
+        except (ValueError, KeyError) as e:
+            self.send_json(400, {'error': describe_exception(e)})
+        except Exception as e:
+            self.send_json(500, {'error': describe_exception(e)})
+
+    def get_coverages(self, entry, query):
+
+        mode = query.get('mode', ['solo'])[0]
+        if mode not in SCORING_MODES:
+            raise ValueError(f'mode must be one of {", ".join(SCORING_MODES)}')
+        skill_times = [float(skill_time) for skill_time in query.get('skill_times', ['5,5,5,5,5,5'])[0].split(',')]
+        return {
+            'music_id': entry.score.music_id,
+            'music_difficulty': entry.score.music_difficulty,
+            'mode': mode,
+            'skill_times': skill_times,
+            'base_score': float(entry.engine.get_base_score(mode)),
+            'skill_scores_coverages': [float(coverage) for coverage in entry.engine.get_skill_coverages(mode, skill_times)]
+        }
+
+    def send_json(self, status, body):
+
+        content = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+
+    # ScoreRequestHandler over a Unix socket, e.g. curl --unix-socket PATH http://localhost/stats
+    daemon_threads = True
+
+    def get_request(self):
+
+        # BaseHTTPRequestHandler logs client_address[0], which a Unix socket does not have
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+
+def make_server(store, host='127.0.0.1', port=8000, unix_socket=None):
+
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, ScoreRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), ScoreRequestHandler)
+    server.store = store
+    return server
@@ -0,0 +1,138 @@
+import time
+import zlib
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from util_batch import build_score, describe_exception
+from util_scoring import SOLO_WEIGHTS, ScoringEngine
+
+JUDGEMENTS = ['perfect', 'great', 'good', 'bad', 'miss']
+# Score of a note per judgement, as a fraction of a PERFECT
+JUDGEMENT_MULTIPLIERS = np.array([1.0, 0.9, 0.5, 0.0, 0.0])
+# Judgements after which the combo starts again from 0
+COMBO_BREAKING = np.array([False, False, True, True, True])
+PERFECT, MISS = JUDGEMENTS.index('perfect'), JUDGEMENTS.index('miss')
+
+DEFAULT_RATES = [0.9, 0.07, 0.015, 0.005, 0.01]
+DEFAULT_PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+
+# kwargs: keyword arguments the Score was built from
+# trials: number of simulated plays
+# summary: {'base_score': stats, 'coverages': [stats per skill note], 'skill_bonus': stats or None},
+#          stats being {'mean': value, 'p<N>': N-th percentile for every percentile asked for}
+# elapsed: seconds spent on this chart inside the worker
+# error: short description of the failure, or None
+SimulationResult = namedtuple('SimulationResult', ['kwargs', 'trials', 'summary', 'elapsed', 'error'])
+
+
+def get_seed_sequence(seed, music_id, music_difficulty):
+
+    # Per chart, so a chart draws the same plays whichever charts, order or worker count it is run with
+    return np.random.SeedSequence([seed, music_id, zlib.crc32(music_difficulty.encode('utf-8'))])
+
+
+def get_stats(values, percentiles=DEFAULT_PERCENTILES):
+
+    stats = {'mean': float(np.mean(values))}
+    for percentile, value in zip(percentiles, np.percentile(values, percentiles)):
+        stats[f'p{percentile:g}'] = float(value)
+    return stats
+
+
+class JudgementSimulator:
+
+    # Simulated plays of one chart, scored like get_solo_base_scores / get_solo_skill_scores_coverages but with
+    # every note judged at random. Judgements of a batch of trials are one random matrix (trials x notes);
+    # combos restart after every combo breaking judgement, found with a running maximum of the break positions.
+    # Long Auto and Long Mid notes are only PERFECT or MISS, at the MISS rate.
+    def __init__(self, score, skill_times=(5, 5, 5, 5, 5, 5)):
+
+        engine = ScoringEngine(score)
+        self.music_id = score.music_id
+        self.music_difficulty = score.music_difficulty
+        # Notes by time, which is also their combo order
+        note_class_codes = np.array(engine.note_class_codes, dtype=np.int64)
+        self.weights = np.array([float(weight) for weight in SOLO_WEIGHTS])[note_class_codes]
+        self.is_tick = np.array([note.is_long_auto or note.is_long_mid for note in sorted(score.playable_notes, key=lambda x: x.time_tick)], dtype=bool)
+        if len(self.weights) == 0:
+            raise ValueError(f'Score {(score.music_id, score.music_difficulty)} has no playable notes to judge')
+        self.scale = float(engine.play_level_multiplier) / self.weights.sum()
+
+        windows = [engine.get_skill_window(slot, skill_time) for slot, skill_time in zip(range(len(engine.skill_note_time_ticks)), skill_times)]
+        self.window_firsts = np.array([first for first, _ in windows], dtype=np.int64)
+        self.window_lasts = np.array([last for _, last in windows], dtype=np.int64)
+
+    def simulate(self, rates, trials, rng, batch_size=1024):
+
+        # rates: probability of every JUDGEMENTS entry, normalised to sum to 1
+        # Returns (base scores, skill coverages), arrays of shape (trials,) and (trials, skill notes)
+        rates = np.asarray(rates, dtype=np.float64) / np.sum(rates)
+        cumulative_rates = np.cumsum(rates)[:-1]
+        note_count = len(self.weights)
+        positions = np.arange(note_count)
+
+        base_scores = np.empty(trials)
+        coverages = np.empty((trials, len(self.window_firsts)))
+        for first_trial in range(0, trials, batch_size):
+            rows = min(batch_size, trials - first_trial)
+            draws = rng.random((rows, note_count))
+            judgements = np.searchsorted(cumulative_rates, draws, side='right')
+            judgements[:, self.is_tick] = np.where(draws[:, self.is_tick] >= 1 - rates[MISS], MISS, PERFECT)
+
+            # combo of a note = notes since the last break, itself included; 0 on a break
+            breaks = COMBO_BREAKING[judgements]
+            last_breaks = np.maximum.accumulate(np.where(breaks, positions, -1), axis=1)
+            combos = np.where(breaks, 0, positions - last_breaks)
+            combo_multipliers = (100 + np.clip((combos - 1) // 100, 0, 10)) / 100
+
+            note_scores = self.weights * JUDGEMENT_MULTIPLIERS[judgements] * combo_multipliers
+            prefix = np.zeros((rows, note_count + 1))
+            np.cumsum(note_scores, axis=1, out=prefix[:, 1:])
+            base_scores[first_trial:first_trial + rows] = prefix[:, -1] * self.scale
+            coverages[first_trial:first_trial + rows] = (prefix[:, self.window_lasts] - prefix[:, self.window_firsts]) * self.scale
+        return base_scores, coverages
+
+
+def simulate_chart(score_kwargs, rates, trials, seed=0, skill_times=(5, 5, 5, 5, 5, 5), score_ups=None,
+                   percentiles=DEFAULT_PERCENTILES, batch_size=1024, cache_dir=None):
+
+    # Runs inside the worker process, only the summary is sent back
+    start_time = time.perf_counter()
+    result = build_score(score_kwargs, cache_dir=cache_dir)
+    if result.score is None:
+        return SimulationResult(score_kwargs, trials, None, time.perf_counter() - start_time, result.error)
+    try:
+        rng = np.random.default_rng(get_seed_sequence(seed, score_kwargs['music_id'], score_kwargs['music_difficulty']))
+        base_scores, coverages = JudgementSimulator(result.score, skill_times).simulate(rates, trials, rng, batch_size)
+        summary = {
+            'base_score': get_stats(base_scores, percentiles),
+            'coverages': [get_stats(coverages[:, slot], percentiles) for slot in range(coverages.shape[1])],
+            'skill_bonus': None
+        }
+        if score_ups is not None:
+            # Score up of the k-th skill on the k-th skill note, in percent
+            score_ups = np.array(score_ups[:coverages.shape[1]], dtype=np.float64) / 100
+            summary['skill_bonus'] = get_stats(coverages[:, :len(score_ups)] @ score_ups, percentiles)
+        error = None
+    except Exception as e:
+        summary = None
+        error = describe_exception(e)
+    return SimulationResult(score_kwargs, trials, summary, time.perf_counter() - start_time, error)
+
+
+def iter_simulations(score_kwargs_list, rates, trials=10000, seed=0, skill_times=(5, 5, 5, 5, 5, 5), score_ups=None,
+                     percentiles=DEFAULT_PERCENTILES, batch_size=1024, num_workers=None, cache_dir=None):
+
+    # Yields a SimulationResult per entry, in the same order as score_kwargs_list
+    simulate = partial(simulate_chart, rates=rates, trials=trials, seed=seed, skill_times=skill_times, score_ups=score_ups,
+                       percentiles=percentiles, batch_size=batch_size, cache_dir=cache_dir)
+    if num_workers == 1:
+        yield from map(simulate, score_kwargs_list)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        yield from executor.map(simulate, score_kwargs_list)
@@ -0,0 +1,132 @@
+import math
+import time
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from functools import partial
+from itertools import permutations
+
+from util_batch import build_score, describe_exception
+from util_scoring import ScoringEngine
+
+# order: skill index used at each skill note, i.e. skill order[k] goes to the k-th skill note
+# skill_times, score_ups: the durations and score ups in that order
+# value: sum of coverage * score_up over the skill notes, exact
+SkillAssignment = namedtuple('SkillAssignment', ['order', 'skill_times', 'score_ups', 'value'])
+
+# kwargs: keyword arguments the Score was built from
+# assignments: the best SkillAssignments, best first, or None if the chart failed
+# elapsed: seconds spent on this chart inside the worker
+# error: short description of the failure, or None
+SkillOrderResult = namedtuple('SkillOrderResult', ['kwargs', 'assignments', 'elapsed', 'error'])
+
+
+def get_default_candidates(skill_count, slot_count):
+
+    # Every way of putting distinct skills on the skill notes, as Score.get_solo_skill_scores_coverages
+    # would get them: extra skills are left out, extra skill notes get no skill
+    return permutations(range(skill_count), min(skill_count, slot_count))
+
+
+class SkillOrderTable:
+
+    # Skill orders of one chart in one ScoringMode. The ScoringEngine's integer prefix sums make the
+    # coverage of a skill on a skill note two bisects and a subtraction.
+    def __init__(self, score, mode='solo'):
+
+        self.engine = ScoringEngine(score)
+        self.mode = mode
+
+    def rank(self, skill_times, score_ups, candidates=None, top=1):
+
+        # Best top assignments of the skills (skill_times[i], score_ups[i]) to the skill notes, among candidates
+        # (sequences of skill indices, all permutations by default). Ties keep the candidate order.
+        if len(skill_times) != len(score_ups):
+            raise ValueError('skill_times and score_ups must have the same length')
+        slot_count = len(self.engine.skill_note_time_ticks)
+        if candidates is None:
+            candidates = get_default_candidates(len(skill_times), slot_count)
+
+        # Score ups scaled to integers, so a candidate's value is an integer sum of table lookups
+        score_ups = [Fraction(score_up) for score_up in score_ups]
+        score_up_scale = math.lcm(*[score_up.denominator for score_up in score_ups])
+        scaled_score_ups = [int(score_up * score_up_scale) for score_up in score_ups]
+
+        # coverage_table[slot][i] = coverage numerator of skill i on the slot-th skill note
+        coverage_table = [[self.engine.get_skill_window_numerator(self.mode, slot, skill_time) for skill_time in skill_times]
+                          for slot in range(slot_count)]
+
+        ranked = []
+        for candidate in candidates:
+            candidate = tuple(candidate)
+            value = 0
+            for slot_coverages, i in zip(coverage_table, candidate):
+                value += slot_coverages[i] * scaled_score_ups[i]
+            ranked.append((value, candidate))
+        ranked.sort(key=lambda x: x[0], reverse=True)
+
+        _, denominator = self.engine.get_mode_table(self.mode)
+        denominator *= score_up_scale
+        return [
+            SkillAssignment(
+                order=candidate,
+                skill_times=tuple(skill_times[i] for i in candidate),
+                score_ups=tuple(score_ups[i] for i in candidate),
+                value=Fraction(value, denominator) * self.engine.play_level_multiplier
+            )
+            for value, candidate in ranked[:top]
+        ]
+
+
+def rank_skill_orders(score, skill_times, score_ups, candidates=None, top=1, mode='solo'):
+
+    return SkillOrderTable(score, mode).rank(skill_times, score_ups, candidates, top)
+
+
+def rank_skill_orders_brute_force(score, skill_times, score_ups, candidates=None, top=1):
+
+    # One Score.get_solo_skill_scores_coverages call per candidate, the reference for rank_skill_orders in solo mode
+    if candidates is None:
+        candidates = get_default_candidates(len(skill_times), len(score.skill_notes))
+    ranked = []
+    for candidate in candidates:
+        candidate = tuple(candidate)
+        candidate_skill_times = tuple(skill_times[i] for i in candidate)
+        candidate_score_ups = tuple(Fraction(score_ups[i]) for i in candidate)
+        # An empty window's coverage is the float 0.0, which would turn the whole sum into a float
+        coverages = [Fraction(coverage) for coverage in score.get_solo_skill_scores_coverages(candidate_skill_times)]
+        value = sum(coverage * score_up for coverage, score_up in zip(coverages, candidate_score_ups))
+        ranked.append(SkillAssignment(candidate, candidate_skill_times, candidate_score_ups, Fraction(value)))
+    ranked.sort(key=lambda x: x.value, reverse=True)
+    return ranked[:top]
+
+
+def rank_chart(score_kwargs, skill_times, score_ups, candidates=None, top=1, mode='solo', cache_dir=None):
+
+    # Runs inside the worker process, only the ranking is sent back
+    start_time = time.perf_counter()
+    result = build_score(score_kwargs, cache_dir=cache_dir)
+    if result.score is None:
+        return SkillOrderResult(score_kwargs, None, time.perf_counter() - start_time, result.error)
+    try:
+        assignments = rank_skill_orders(result.score, skill_times, score_ups, candidates, top, mode)
+        error = None
+    except Exception as e:
+        assignments = None
+        error = describe_exception(e)
+    return SkillOrderResult(score_kwargs, assignments, time.perf_counter() - start_time, error)
+
+
+def iter_skill_orders(score_kwargs_list, skill_times, score_ups, candidates=None, top=1, mode='solo', num_workers=None, chunksize=1, cache_dir=None):
+
+    # Yields a SkillOrderResult per entry, in the same order as score_kwargs_list
+    if candidates is not None:
+        candidates = [tuple(candidate) for candidate in candidates]
+    rank = partial(rank_chart, skill_times=skill_times, score_ups=score_ups, candidates=candidates, top=top, mode=mode, cache_dir=cache_dir)
+    if num_workers == 1:
+        yield from map(rank, score_kwargs_list)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        yield from executor.map(rank, score_kwargs_list, chunksize=chunksize)
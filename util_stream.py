@@ -0,0 +1,102 @@
+import heapq
+import math
+
+from bisect import bisect_left
+from collections import deque, namedtuple
+from fractions import Fraction
+from operator import attrgetter
+
+from util_object import NoteColumns
+
+# time_tick: exact time of the event, see Timebase
+# seconds: the same time as a float
+# kind: 'bpm', 'prepare', 'skill' or 'note'; events at the same time come in this order
+# event: the BPMChangeEvent, PrepareNote, SkillNote or PlayableNote itself
+ScoreEvent = namedtuple('ScoreEvent', ['time_tick', 'seconds', 'kind', 'event'])
+
+EVENT_KINDS = ['bpm', 'prepare', 'skill', 'note']
+
+
+class ScoreEventStream:
+
+    # Every event of a Score as one time-ordered stream, merged lazily from the four note lists, which
+    # are each sorted by time already. Only the time ticks of every list, the heap of the next event of
+    # every list and the look-ahead window are held, so a seek is one bisect per list, however long the chart.
+    #   for event in score.get_event_stream(start_seconds=30): ...
+    #   stream.poll(t) returns the events before t, stream.lookahead(2) the next 2 seconds without consuming them
+    def __init__(self, score, start_seconds=0):
+
+        self.sources = [score.bpm_events, score.prepare_notes, score.skill_notes, score.playable_notes]
+        self.time_ticks_per_second = score.timebase.time_ticks_per_second
+        # Bisected by seek, as bisect only takes a key from Python 3.10
+        self.source_time_ticks = [source.get_time_ticks() if isinstance(source, NoteColumns) else [event.time_tick for event in source]
+                                  for source in self.sources]
+        self.seek(start_seconds)
+
+    def get_time_tick(self, seconds):
+
+        # Smallest time tick at or after seconds, so event.time_tick < get_time_tick(t) <=> event time < t
+        return math.ceil(Fraction(seconds) * self.time_ticks_per_second)
+
+    def iter_source(self, kind, source, first):
+
+        for i in range(first, len(source)):
+            event = source[i]
+            yield ScoreEvent(event.time_tick, event.time_tick / self.time_ticks_per_second, kind, event)
+
+    def seek(self, seconds):
+
+        # Restart the stream at the first event at or after seconds, one bisect per list
+        self.time_tick = self.get_time_tick(seconds)
+        self.position = seconds
+        iterators = [self.iter_source(kind, source, bisect_left(time_ticks, self.time_tick))
+                     for kind, source, time_ticks in zip(EVENT_KINDS, self.sources, self.source_time_ticks)]
+        # heapq.merge is stable, so events at the same time come in EVENT_KINDS order
+        self.merged = heapq.merge(*iterators, key=attrgetter('time_tick'))
+        # Events already taken from merged for a lookahead, but not consumed yet
+        self.buffer = deque()
+        return self
+
+    def __iter__(self):
+
+        return self
+
+    def __next__(self):
+
+        event = self.buffer.popleft() if self.buffer else next(self.merged)
+        self.position = max(self.position, event.seconds)
+        return event
+
+    def peek(self):
+
+        # Next event without consuming it, None at the end of the chart
+        if not self.buffer:
+            event = next(self.merged, None)
+            if event is None:
+                return None
+            self.buffer.append(event)
+        return self.buffer[0]
+
+    def lookahead(self, seconds):
+
+        # Events in [position, position + seconds) without consuming them, for scheduling ahead of playback
+        window_end = self.get_time_tick(Fraction(self.position) + Fraction(seconds))
+        while not self.buffer or self.buffer[-1].time_tick < window_end:
+            event = next(self.merged, None)
+            if event is None:
+                break
+            self.buffer.append(event)
+        return [event for event in self.buffer if event.time_tick < window_end]
+
+    def poll(self, seconds):
+
+        # Consume and return the events before seconds, e.g. the current audio time, and move the position there
+        until = self.get_time_tick(seconds)
+        events = []
+        while True:
+            event = self.peek()
+            if event is None or event.time_tick >= until:
+                break
+            events.append(self.buffer.popleft())
+        self.position = max(self.position, seconds)
+        return events
@@ -0,0 +1,88 @@
+import os
+import random
+
+# Deterministic .sus charts for benchmarks, shaped like the heaviest real charts:
+# thousands of notes on many different line scalings, holds with mid points and
+# flicks, and hundreds of BPM changes. The same arguments always give the same file.
+
+# name -> (measures, taps per measure, BPM changes)
+SYNTHETIC_CHARTS = {
+    'typical': (120, 8, 3),
+    'dense': (200, 48, 8),
+    'bpm_changes': (200, 12, 400),
+    'worst_case': (300, 64, 800)
+}
+# Real charts use a handful of BPM values, so hundreds of changes switch between these
+SYNTHETIC_BPMS = [60, 75, 90, 100, 120, 128, 130, 140, 145, 150, 155, 160, 170, 175, 180, 190, 200, 210, 222, 240]
+LINE_SCALINGS = [4, 8, 12, 16, 24, 32, 48]
+# Music id the synthetic charts are written under, one difficulty per SYNTHETIC_CHARTS entry
+SYNTHETIC_MUSIC_ID = 9999
+
+
+def get_pairs(scaling, values):
+
+    # values: note_order -> two character pair
+    return ''.join(values.get(i, '00') for i in range(scaling))
+
+
+def get_synthetic_chart(measures, taps_per_measure, bpm_changes, seed=0):
+
+    rng = random.Random(seed)
+    lines = ['#00002: 4']
+
+    # BPM changes, the first one at the very start
+    for i, bpm in enumerate(SYNTHETIC_BPMS, 1):
+        lines.append(f'#BPM{i:02d}: {bpm}')
+    lines.append('#00008: 01')
+    for _ in range(bpm_changes):
+        scaling = rng.choice(LINE_SCALINGS)
+        bpm_key = f'{rng.randrange(1, len(SYNTHETIC_BPMS) + 1):02d}'
+        lines.append(f'#{rng.randrange(1, measures):03d}08: ' + get_pairs(scaling, {rng.randrange(scaling): bpm_key}))
+
+    # Six skills and the fever
+    for i in range(6):
+        lines.append(f'#{(i + 1) * measures // 8:03d}10:40')
+    lines.append(f'#{measures // 2:03d}1f:10')
+    lines.append(f'#{measures * 3 // 4:03d}1f:20')
+
+    for measure in range(1, measures):
+        # Taps on lanes 8-13, some critical, some with flicks on top
+        for _ in range(max(1, taps_per_measure // 4)):
+            start_pos = rng.randrange(8, 14)
+            width = rng.randint(1, 14 - start_pos)
+            scaling = rng.choice(LINE_SCALINGS)
+            orders = rng.sample(range(scaling), min(4, scaling))
+            lines.append(f'#{measure:03d}1{start_pos:x}:' + get_pairs(scaling, {i: f'{rng.choice("112")}{width:x}' for i in orders}))
+            flicks = {i: f'{rng.choice("134")}{width:x}' for i in orders if rng.random() < 0.2}
+            if flicks:
+                lines.append(f'#{measure:03d}5{start_pos:x}:' + get_pairs(scaling, flicks))
+
+        # A hold on lanes 2-4 or 5-7 every other measure, with a mid point, a curve and long auto notes
+        if measure % 2 == 1 and measure + 1 < measures:
+            start_pos = 2 + 3 * (measure // 2 % 2)
+            long_note_id = measure // 2 % 10
+            lines.append(f'#{measure:03d}3{start_pos:x}{long_note_id}:' + get_pairs(4, {1: '13', 3: '33'}))
+            lines.append(f'#{measure:03d}5{start_pos:x}:' + get_pairs(4, {1: '53'}))
+            lines.append(f'#{measure + 1:03d}3{start_pos:x}{long_note_id}:' + get_pairs(4, {1: '23'}))
+            if rng.random() < 0.3:
+                lines.append(f'#{measure:03d}1{start_pos:x}:' + get_pairs(4, {1: '23'}))
+            if rng.random() < 0.3:
+                lines.append(f'#{measure + 1:03d}5{start_pos:x}:' + get_pairs(4, {1: '13'}))
+
+    # The parser must not depend on line order
+    rng.shuffle(lines)
+    return '#TITLE "synthetic"\n' + '\n'.join(lines) + '\n'
+
+
+def write_synthetic_corpus(folders, seed=0):
+
+    # Writes folders/<SYNTHETIC_MUSIC_ID>/<name>.sus for every SYNTHETIC_CHARTS entry, returns the filenames
+    directory = os.path.join(folders, f'{SYNTHETIC_MUSIC_ID:04d}')
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for name, (measures, taps_per_measure, bpm_changes) in SYNTHETIC_CHARTS.items():
+        filename = os.path.join(directory, f'{name}.sus')
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(get_synthetic_chart(measures, taps_per_measure, bpm_changes, seed))
+        filenames.append(filename)
+    return filenames
@@ -0,0 +1,74 @@
+import re
+
+# One pass over the whole file. A line is either
+#   #mmmCL:  pairs   (#mmmCLi: for long notes) -> groups 1, 2
+#   #BPMxx: value                               -> groups 3, 4
+# and everything else is ignored, as in Score.parse_lines_reference
+LINE_PATTERN = re.compile(r'^#(?:([0-9a-f]{5,6}):\ *([0-9a-f]*)|BPM([0-9a-f]*):\ ([0-9]*))$', re.MULTILINE)
+
+
+def read_sus(filename):
+
+    # Text mode turns \r\n and \r into \n, like iterating over the file did
+    with open(filename, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def decode_sus(content):
+
+    # In-memory .sus content (str or bytes) as read_sus would have read it from a file
+    if isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def tokenize_sus(text):
+
+    # Returns
+    #   raw_note_tuples: deduplicated (measure, note_class, start_pos, note_property, width, scaling, note_order, long_note_id)
+    #                    in file order, i.e. the RawNote arguments
+    #   bpm_event_tuples: (measure, scaling, event_order, bpm_key), i.e. the BPMChangeEvent arguments
+    #   bpm_lookup_table: bpm_key -> bpm
+    raw_note_tuples = []
+    raw_notes_pool = set()
+    bpm_event_tuples = []
+    bpm_lookup_table = {}
+
+    for group_1, group_2, bpm_key, bpm in LINE_PATTERN.findall(text):
+
+        if not group_1:
+            bpm_lookup_table[bpm_key] = int(bpm)
+            continue
+
+        measure = int(group_1[:3])
+        note_class = int(group_1[3])
+        start_pos = int(group_1[4], 16)
+        long_note_id = int(group_1[5]) if len(group_1) == 6 else None
+        note_scaling = len(group_2) // 2
+
+        if note_class == 0 and start_pos == 2:
+            # shorten measures
+            continue
+
+        if note_class == 0 and start_pos == 8:
+            # bpm change events
+            for i in range(note_scaling):
+                event_key = group_2[i*2:i*2+2]
+                if event_key != '00':
+                    bpm_event_tuples.append((measure, note_scaling, i, event_key))
+            continue
+
+        # Each byte is one (note_property, width) pair, blank notes are 0
+        for i, pair in enumerate(bytes.fromhex(group_2[:note_scaling*2])):
+            if not pair:
+                continue
+            note_property, note_width = pair >> 4, pair & 15
+            if note_property > 9:
+                raise ValueError(f'invalid note property {note_property:x} in #{group_1}')
+
+            raw_note_tuple = (measure, note_class, start_pos, note_property, note_width, note_scaling, i, long_note_id)
+            if raw_note_tuple not in raw_notes_pool:
+                raw_notes_pool.add(raw_note_tuple)
+                raw_note_tuples.append(raw_note_tuple)
+
+    return raw_note_tuples, bpm_event_tuples, bpm_lookup_table